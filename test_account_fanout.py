@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from trading_bot import paper_client
+from trading_bot.account_fanout import AccountFanout
+from trading_bot.paper_client import PaperClient
+from trading_bot.position_journal import PositionJournal
+from trading_bot.position_manager import PositionManager
+
+
+class StubMarket:
+    def get_instruments_info(self, **params):
+        return {"result": {"list": [{
+            "symbol": params["symbol"],
+            "priceFilter": {"tickSize": "0.1"},
+            "lotSizeFilter": {"qtyStep": "0.001", "minOrderQty": "0.001"},
+        }]}}
+
+    def get_tickers(self, **params):
+        return {"result": {"list": [{"symbol": params["symbol"], "lastPrice": "100"}]}}
+
+
+@pytest.fixture
+def paper_fanout(tmp_path, monkeypatch):
+    # журналы и статистика по умолчанию пишутся в рабочий каталог
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(paper_client, "_market", StubMarket())
+    primary = PositionManager(journal=PositionJournal("positions_paper.log"),
+                              client=PaperClient("paper"))
+    fanout = AccountFanout(primary, [{"name": "alpha", "api_key": None, "api_secret": None}],
+                           paper=True)
+    for manager in fanout.managers():
+        manager._notify = lambda message: None
+        manager.wait_for_order_filled = lambda order_id, symbol: True
+    return fanout
+
+
+def open_position(manager, direction="long"):
+    http = manager.client.http_client
+    http.place_order(category="linear", symbol="BTCUSDT", side="Buy", orderType="Market",
+                     qty="1")
+    manager._register({"order_id": f"entry-{manager.client.name}", "signal_ts": 1,
+                       "direction": direction, "entry": 100.0, "sl": 95.0, "tp1": 105.0,
+                       "tp2": 110.0, "qty": 1.0, "tp1_hit": False, "symbol": "BTCUSDT",
+                       "notified_open": True, "closed": False, "active_orders": []})
+
+
+def test_paper_mode_makes_sub_accounts_paper_without_keys(paper_fanout):
+    [account] = paper_fanout.accounts
+    assert isinstance(account["manager"].client, PaperClient)
+    assert account["manager"].journal.path == "positions_paper_alpha.log"
+
+
+def test_live_sub_account_without_keys_is_skipped():
+    primary = object()
+    assert AccountFanout(primary, [{"name": "beta"}]).accounts == []
+
+
+def test_close_closes_every_account_with_a_position(paper_fanout):
+    alpha = paper_fanout.accounts[0]["manager"]
+    assert not paper_fanout.has_positions()
+    open_position(paper_fanout.primary)
+    open_position(alpha)
+    assert paper_fanout.has_positions()
+
+    async def scenario():
+        for manager in paper_fanout.managers():
+            manager.bridge.start(asyncio.get_running_loop())
+        return await paper_fanout.close()
+    outcome = asyncio.run(scenario())
+
+    assert set(outcome) == {"main", "alpha"}
+    assert all(closed["close_reason"] == "ManualClose" for closed in outcome.values())
+    assert not paper_fanout.has_positions()
+    for manager in paper_fanout.managers():
+        assert manager.client.exchange.positions["BTCUSDT"]["size"] == 0.0
@@ -0,0 +1,96 @@
+import time
+from concurrent.futures import Future
+
+from trading_bot.account_state import AccountState
+
+
+class StubHttp:
+    def __init__(self, positions=(), equity="1000"):
+        self.positions = list(positions)
+        self.equity = equity
+
+    def get_positions(self, **params):
+        return {"result": {"list": list(self.positions)}}
+
+    def get_wallet_balance(self, **params):
+        return {"result": {"list": [{"totalEquity": self.equity,
+                                     "totalAvailableBalance": self.equity}]}}
+
+
+class ImmediateBridge:
+    """run_blocking и order_executor исполняют сразу, в вызывающем потоке."""
+
+    def __init__(self):
+        self.order_executor = self
+
+    def submit(self, func, *args):
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+    def run_blocking(self, func, *args):
+        return self.submit(func, *args)
+
+
+def position(symbol="BTCUSDT", size="1", updated=1, **extra):
+    return {"symbol": symbol, "side": "Buy" if float(size) else "", "size": size,
+            "avgPrice": "100", "leverage": "10", "updatedTime": str(updated), **extra}
+
+
+def make_state(http=None):
+    state = AccountState(http or StubHttp())
+    state._bridge = ImmediateBridge()
+    closed = []
+    state.close_listeners.append(closed.append)
+    return state, closed
+
+
+def test_ws_updates_mirror_and_ignore_stale_pushes():
+    state, _ = make_state()
+    state.apply_ws_message({"topic": "position", "data": [position(size="2", updated=20)]})
+    state.apply_ws_message({"topic": "position", "data": [position(size="1", updated=10)]})
+    assert state.position_size("BTCUSDT") == 2.0 and state.leverage("BTCUSDT") == 10.0
+    state.apply_ws_message({"topic": "wallet", "data": [
+        {"accountType": "UNIFIED", "totalEquity": "1234.5"}]})
+    assert state.equity == 1234.5
+
+
+def test_executions_aggregate_per_order_without_duplicates():
+    state, _ = make_state()
+    execution = {"orderId": "o1", "execId": "e1", "execQty": "1", "execPrice": "100",
+                 "execFee": "0.1", "execTime": "5"}
+    for e in (execution, execution, {**execution, "execId": "e2", "execPrice": "102"}):
+        state.apply_ws_message({"topic": "execution", "data": [e]})
+    assert state.fills["o1"]["qty"] == 2.0
+    assert state.avg_fill_price("o1") == 101.0
+
+
+def test_close_from_ws_and_from_snapshot_fire_the_same_hook():
+    state, closed = make_state()
+    state.apply_ws_message({"topic": "position", "data": [position("BTCUSDT", updated=1)]})
+    state.apply_ws_message({"topic": "position", "data": [position("BTCUSDT", "0", 2)]})
+    assert closed == ["BTCUSDT"]
+
+    # закрытие пропущено в WS: REST больше не видит позицию
+    state.apply_ws_message({"topic": "position", "data": [position("ETHUSDT", updated=1)]})
+    snapshot = {"started": time.time(), "positions": [], "wallet": []}
+    state.apply_snapshot(snapshot)
+    assert closed == ["BTCUSDT", "ETHUSDT"]
+    assert state.position_size("ETHUSDT") == 0.0
+    # повторная сверка закрытие не дублирует
+    state.apply_snapshot(snapshot)
+    assert closed == ["BTCUSDT", "ETHUSDT"]
+
+
+def test_snapshot_keeps_newer_ws_wallet():
+    state, _ = make_state(StubHttp(equity="900"))
+    snapshot = state.fetch_snapshot()
+    state.apply_ws_message({"topic": "wallet", "data": [{"totalEquity": "1000"}]})
+    state.apply_snapshot(snapshot)
+    assert state.equity == 1000.0 and state.synced
+
+
+def test_refresh_wallet_before_start():
+    state = AccountState(StubHttp(equity="500"))
+    state.refresh_wallet()
+    assert state.equity == 500.0
@@ -0,0 +1,80 @@
+import time
+
+from trading_bot.candle_sequencer import CandleSequencer, interval_to_ms, KLINE_PAGE_LIMIT
+
+MIN = 60_000
+
+
+def candle(ts):
+    return {"timestamp": ts, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0,
+            "volume": 1.0}
+
+
+class FakeKlines:
+    """REST /v5/market/kline: самые свежие свечи диапазона, не больше limit."""
+
+    def __init__(self, timestamps):
+        self.timestamps = sorted(timestamps)
+        self.calls = 0
+
+    def __call__(self, symbol, interval, start, end, limit):
+        self.calls += 1
+        rows = [candle(ts) for ts in self.timestamps if start <= ts <= end]
+        return list(reversed(rows[-limit:]))
+
+
+def primed(fetch=None, last=10 * MIN):
+    seq = CandleSequencer("BTCUSDT", "1", fetch or FakeKlines([]))
+    seq.prime([candle(last)])
+    return seq
+
+
+def test_interval_to_ms():
+    assert interval_to_ms("5") == 5 * MIN
+    assert interval_to_ms("D") == 86_400_000
+
+
+def test_prime_drops_unclosed_candle_and_sorts():
+    now = int(time.time() * 1000) // MIN * MIN
+    seq = CandleSequencer("BTCUSDT", "1", FakeKlines([]))
+    closed = seq.prime([candle(now), candle(now - 2 * MIN), candle(now - MIN)])
+    assert [c["timestamp"] for c in closed] == [now - 2 * MIN, now - MIN]
+    assert seq.next_open == now
+
+
+def test_next_and_duplicates():
+    seq = primed()
+    assert seq.accept(candle(11 * MIN))[0]["timestamp"] == 11 * MIN
+    assert seq.accept(candle(11 * MIN)) == []
+    assert seq.accept(candle(5 * MIN)) == []
+    assert seq.stats()["duplicates_dropped"] == 2
+
+
+def test_gap_is_backfilled_in_order():
+    fetch = FakeKlines(range(11 * MIN, 15 * MIN, MIN))
+    seq = primed(fetch)
+    assert seq.classify(candle(15 * MIN)) == "gap"
+    batch = seq.accept(candle(15 * MIN))
+    assert [c["timestamp"] for c in batch] == [11 * MIN, 12 * MIN, 13 * MIN, 14 * MIN, 15 * MIN]
+    assert batch[0]["symbol"] == "BTCUSDT"
+    assert seq.next_open == 16 * MIN
+    assert seq.stats()["gaps_filled"] == 4
+
+
+def test_long_gap_pages_backwards():
+    missing = KLINE_PAGE_LIMIT + 5
+    fetch = FakeKlines(range(11 * MIN, (11 + missing) * MIN, MIN))
+    seq = primed(fetch)
+    batch = seq.accept(candle((11 + missing) * MIN))
+    assert len(batch) == missing + 1
+    assert fetch.calls == 2
+    timestamps = [c["timestamp"] for c in batch]
+    assert timestamps == sorted(set(timestamps))
+
+
+def test_missing_candles_are_counted():
+    fetch = FakeKlines([12 * MIN])          # 11 и 13 на бирже нет
+    seq = primed(fetch)
+    batch = seq.accept(candle(14 * MIN))
+    assert [c["timestamp"] for c in batch] == [12 * MIN, 14 * MIN]
+    assert seq.stats()["missing_after_backfill"] == 2
@@ -0,0 +1,49 @@
+import numpy as np
+
+from trading_bot.chart import downsample, position_markers
+
+
+def ohlc(n):
+    ts = np.arange(n, dtype=np.int64) * 60_000
+    o = np.arange(n, dtype=float)
+    return ts, o, o + 10, o - 10, o + 1
+
+
+def test_short_series_is_untouched():
+    ts, o, h, l, c = ohlc(300)
+    out = downsample(ts, o, h, l, c, max_bars=300)
+    assert all(a is b for a, b in zip(out, (ts, o, h, l, c)))
+
+
+def test_groups_are_aggregated_as_ohlc():
+    ts, o, h, l, c = ohlc(10)
+    rts, ro, rh, rl, rc = downsample(ts, o, h, l, c, max_bars=5)
+    assert list(rts) == [0, 120_000, 240_000, 360_000, 480_000]
+    assert list(ro) == [0, 2, 4, 6, 8]
+    assert list(rh) == [11, 13, 15, 17, 19]
+    assert list(rl) == [-10, -8, -6, -4, -2]
+    assert list(rc) == [2, 4, 6, 8, 10]
+
+
+def test_partial_group_is_dropped_on_the_left():
+    ts, o, h, l, c = ohlc(11)
+    rts, ro, rh, rl, rc = downsample(ts, o, h, l, c, max_bars=5)
+    # k = 3: 11 свечей -> 3 полные группы, две самые старые отброшены
+    assert len(rts) == 3
+    assert rts[0] == 2 * 60_000
+    assert rc[-1] == 11
+
+
+def test_position_markers_use_opened_at_and_initial_sl():
+    positions = [
+        {"symbol": "BTCUSDT", "opened_at": 2000, "entry": 100, "sl": 101,
+         "initial_sl": 95, "tp1": 105, "tp2": 110},
+        {"symbol": "BTCUSDT", "entry": 100, "sl": 95},             # старый журнал
+        {"symbol": "ETHUSDT", "opened_at": 1000, "entry": 10, "sl": 9},
+        {"symbol": "BTCUSDT", "opened_at": 1000, "entry": 99, "sl": 97,
+         "tp1": 101, "tp2": 103},
+    ]
+    assert position_markers(positions, "BTCUSDT") == [
+        {"timestamp": 1000, "entry": 99, "sl": 97, "tp1": 101, "tp2": 103},
+        {"timestamp": 2000, "entry": 100, "sl": 95, "tp1": 105, "tp2": 110},
+    ]
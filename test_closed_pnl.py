@@ -0,0 +1,71 @@
+import time
+
+from trading_bot.closed_pnl import WINDOW_MS, RecentIds, fetch_paged, sync_closed_pnl
+from trading_bot.pnl_aggregate import PnlAggregate, month_start_ms
+from trading_bot.trade_store import TradeStore
+
+
+class StubHttp:
+    def __init__(self, records=(), page_size=2):
+        self.records = list(records)
+        self.page_size = page_size
+        self.calls = []
+
+    def get_closed_pnl(self, **params):
+        self.calls.append(params)
+        rows = [r for r in self.records
+                if params["startTime"] <= int(r["updatedTime"]) <= params["endTime"]]
+        offset = int(params.get("cursor") or 0)
+        page = rows[offset:offset + self.page_size]
+        more = offset + self.page_size < len(rows)
+        return {"result": {"list": page,
+                           "nextPageCursor": str(offset + self.page_size) if more else ""}}
+
+
+def record(order_id, ts, pnl="1"):
+    return {"orderId": order_id, "closedPnl": pnl, "updatedTime": str(ts)}
+
+
+def test_fetch_paged_walks_windows_and_pages():
+    http = StubHttp([record(str(i), 1000 + i) for i in range(5)]
+                    + [record("late", 1000 + WINDOW_MS + 10)])
+    rows = fetch_paged(http.get_closed_pnl, "BTCUSDT", 1000, 1000 + WINDOW_MS + 100)
+    assert [r["orderId"] for r in rows] == ["0", "1", "2", "3", "4", "late"]
+    # три страницы в первом окне, одна во втором
+    assert len(http.calls) == 4
+
+
+def test_one_fetch_feeds_both_consumers(tmp_path):
+    now = int(time.time() * 1000)
+    http = StubHttp([record("before-start", now - 5000, "3"),
+                     record("a", now - 1000, "2"),
+                     record("b", now - 500, "-1")], page_size=100)
+    aggregate = PnlAggregate(http, path=str(tmp_path / "pnl_state.json"))
+    store = TradeStore(http, "BTCUSDT")
+    store.reset_pnl(now - 2000)
+
+    added = sync_closed_pnl(http, "BTCUSDT", [aggregate, store])
+    # один проход окнами от начала месяца, без второй выборки под TradeStore
+    assert http.calls[0]["startTime"] == month_start_ms(now)
+    assert all(nxt["startTime"] == prev["endTime"] + 1
+               for prev, nxt in zip(http.calls, http.calls[1:]))
+    # PnL за месяц — все сделки, отчёты — только с начала торговли
+    assert added == [3, 2]
+    assert aggregate.month_to_date("BTCUSDT") == (4.0, 3)
+    assert store.trade_statistics()["total_pnl"] == 1.0
+
+
+def test_consumer_without_start_is_skipped(tmp_path):
+    http = StubHttp()
+    store = TradeStore(http, "BTCUSDT")     # торговля не запущена
+    assert sync_closed_pnl(http, "BTCUSDT", [store]) == [None]
+    assert http.calls == []
+
+
+def test_recent_ids_evict_oldest():
+    ids = RecentIds(2)
+    assert ids.add("a") and ids.add("b")
+    assert not ids.add("a")
+    assert ids.add("c")
+    assert "a" not in ids and list(ids) == ["b", "c"]
+    assert ids.add("a")
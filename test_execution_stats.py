@@ -0,0 +1,42 @@
+from trading_bot.execution_stats import ExecutionStats
+
+
+def make_stats(tmp_path):
+    return ExecutionStats(account="t", path=str(tmp_path / "executions.csv"))
+
+
+def test_slippage_is_positive_against_us():
+    assert ExecutionStats.slippage_bps("Buy", 100.0, 100.1) == 10.0
+    assert ExecutionStats.slippage_bps("Sell", 100.0, 100.1) == -10.0
+    assert ExecutionStats.slippage_bps("Sell", 100.0, 100.0) == 0.0
+    assert ExecutionStats.slippage_bps("Buy", None, 100.0) is None
+
+
+def test_summary_groups_by_symbol_and_role(tmp_path):
+    stats = make_stats(tmp_path)
+    btc = {"symbol": "BTCUSDT", "order_id": "p1"}
+    eth = {"symbol": "ETHUSDT", "order_id": "p2"}
+    stats.record(btc, "entry", "Buy", 0.01, 100.0, 100.2, send_time=1000, fill_time=1040)
+    stats.record(btc, "entry", "Buy", 0.01, 100.0, 100.0, send_time=2000, fill_time=2020)
+    stats.record(btc, "sl", "Sell", 0.01, 99.0, 98.9)
+    stats.record(eth, "entry", "Sell", 1.0, 10.0, 10.0, send_time=3000, fill_time=3010)
+
+    entries = stats.summary(role="entry")
+    assert entries["BTCUSDT"]["count"] == 2
+    assert entries["BTCUSDT"]["slippage_bps"]["max"] == 20.0
+    assert entries["BTCUSDT"]["send_to_fill_ms"]["mean"] == 30.0
+    exits = stats.summary(role="exit")
+    assert list(exits) == ["BTCUSDT"]
+    assert exits["BTCUSDT"]["send_to_fill_ms"] is None
+
+
+def test_records_reload_from_csv(tmp_path):
+    stats = make_stats(tmp_path)
+    stats.record({"symbol": "BTCUSDT", "order_id": "p1"}, "entry", "Buy", 0.01,
+                 100.0, 100.1, send_time=1000, fill_time=1050)
+
+    reloaded = make_stats(tmp_path)
+    assert len(reloaded.records) == 1
+    assert reloaded.records[0]["send_to_fill_ms"] == 50.0
+    other = ExecutionStats(account="other", path=str(tmp_path / "executions.csv"))
+    assert len(other.records) == 0
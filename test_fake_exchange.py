@@ -0,0 +1,107 @@
+import asyncio
+import itertools
+import json
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+from trading_bot.fake_exchange import (
+    FakeExchange, FaultModel, drive_market, make_rest_handler, random_walk, _now_ms)
+
+
+def make_exchange(price=100.0):
+    exchange = FakeExchange(balance=1000.0, taker_fee=0.001, maker_fee=0.0)
+    exchange.set_price("BTCUSDT", price)
+    return exchange
+
+
+def order(exchange, **params):
+    resp = exchange.place_order({"symbol": "BTCUSDT", **params})
+    assert resp["retCode"] == 0, resp
+    return exchange.orders[resp["result"]["orderId"]]
+
+
+def test_market_order_fills_with_taker_fee():
+    exchange = make_exchange()
+    events = []
+    exchange.listeners.append(lambda topic, data: events.append(topic))
+    entry = order(exchange, side="Buy", orderType="Market", qty="2")
+    assert entry["orderStatus"] == "Filled"
+    assert exchange.positions["BTCUSDT"]["size"] == 2.0
+    assert exchange.balance == 1000.0 - 2 * 100.0 * 0.001
+    assert "execution" in events and "wallet" in events
+
+
+def test_limit_and_conditional_orders_fill_on_price():
+    exchange = make_exchange()
+    order(exchange, side="Buy", orderType="Market", qty="1")
+    tp = order(exchange, side="Sell", orderType="Limit", qty="1", price="110",
+               reduceOnly=True)
+    sl = order(exchange, side="Sell", orderType="Market", qty="1", triggerPrice="95",
+               triggerDirection=2, reduceOnly=True)
+    assert (tp["orderStatus"], sl["orderStatus"]) == ("New", "Untriggered")
+
+    exchange.set_price("BTCUSDT", 94.0)
+    assert sl["orderStatus"] == "Filled"
+    assert exchange.positions["BTCUSDT"]["size"] == 0.0
+    # позиции нет — reduce-only TP не может открыть новую
+    exchange.set_price("BTCUSDT", 111.0)
+    assert tp["orderStatus"] == "Deactivated"
+    assert float(exchange.closed_pnl[-1]["closedPnl"]) == -6.0
+
+
+def test_duplicate_link_id_and_cancel_all():
+    exchange = make_exchange()
+    order(exchange, side="Buy", orderType="Limit", qty="1", price="90", orderLinkId="x")
+    dup = exchange.place_order({"symbol": "BTCUSDT", "side": "Buy", "orderType": "Limit",
+                                "qty": "1", "price": "90", "orderLinkId": "x"})
+    assert dup["retCode"] == 110072
+    cancelled = exchange.cancel_all({"symbol": "BTCUSDT"})["result"]["list"]
+    assert len(cancelled) == 1
+    assert exchange.query_orders({"symbol": "BTCUSDT"}, True)["result"]["list"] == []
+
+
+def test_random_walk_history_ends_at_now():
+    interval_ms = 60_000
+    candles = random_walk(100.0, interval_ms, seed=1, history=50)
+    history = [next(candles) for _ in range(50)]
+    now_bucket = _now_ms() // interval_ms * interval_ms
+    assert history[-1]["timestamp"] == now_bucket - interval_ms
+    assert next(candles)["timestamp"] == now_bucket
+
+
+class RecordingHub:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, data):
+        if topic.startswith("kline"):
+            self.published.append(data[0]["close"])
+
+
+def run_market(seed):
+    hub = RecordingHub()
+    candles = list(itertools.islice(random_walk(100.0, 60_000, seed=7), 3))
+    asyncio.run(drive_market(make_exchange(), hub, "BTCUSDT", "1", candles,
+                             speed=1000.0, ticks=4, history=0, seed=seed))
+    return hub.published
+
+
+def test_drive_market_is_reproducible_with_seed():
+    assert run_market(3) == run_market(3)
+    assert run_market(3) != run_market(4)
+
+
+def test_rest_routes_and_rate_limit():
+    exchange = make_exchange()
+    faults = FaultModel(rate_limit=1.0, seed=1)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_rest_handler(exchange, faults))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v5/market/tickers?symbol=BTCUSDT"
+    try:
+        first = json.load(urllib.request.urlopen(url))
+        second = json.load(urllib.request.urlopen(url))
+    finally:
+        server.shutdown()
+    assert first["result"]["list"][0]["lastPrice"] == "100.0"
+    assert second["retCode"] == 10006
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from trading_bot.kline_decoder import KlineDecoder, _LOADERS
+
+
+def frame(confirm, spaced=False, close="60010.5"):
+    msg = {"topic": "kline.5.BTCUSDT", "ts": 1700000300123, "type": "snapshot",
+           "data": [{"start": 1700000000000, "end": 1700000299999, "interval": "5",
+                     "open": "60000", "close": close, "high": "60020", "low": "59990",
+                     "volume": "12.5", "turnover": "750000", "confirm": confirm,
+                     "timestamp": 1700000300100}]}
+    return json.dumps(msg) if spaced else json.dumps(msg, separators=(",", ":"))
+
+
+@pytest.mark.parametrize("backend", sorted(_LOADERS))
+def test_confirmed_frame_decodes_to_candle(backend):
+    decoder = KlineDecoder(backend=backend)
+    [candle] = decoder.decode(frame(True))
+    assert candle == {"symbol": "BTCUSDT", "interval": "5", "timestamp": 1700000000000,
+                      "open": 60000.0, "high": 60020.0, "low": 59990.0,
+                      "close": 60010.5, "volume": 12.5, "confirm": True,
+                      "ts": 1700000300123}
+
+
+@pytest.mark.parametrize("spaced", [False, True])
+def test_unconfirmed_frame_skipped_without_parsing(spaced):
+    decoder = KlineDecoder()
+    assert decoder.decode(frame(False, spaced=spaced)) == []
+    assert decoder.decode(frame(False, spaced=spaced).encode()) == []
+    assert decoder.stats()["skipped_unconfirmed"] == 2
+    assert decoder.stats()["decoded"] == 0
+
+
+def test_unconfirmed_frames_kept_when_not_closed_only():
+    decoder = KlineDecoder(closed_only=False)
+    [candle] = decoder.decode(frame(False, close="60001"))
+    assert candle["confirm"] is False
+    assert candle["close"] == 60001.0
+
+
+def test_service_messages_are_ignored():
+    decoder = KlineDecoder()
+    assert decoder.decode('{"success":true,"op":"subscribe"}') == []
+    assert decoder.stats()["frames"] == 1
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        KlineDecoder(backend="nope")
@@ -0,0 +1,45 @@
+from trading_bot.latency_monitor import MIN_SAMPLES, LatencyMonitor, RollingWindow
+
+
+def test_percentile_interpolates_between_ranks():
+    window = RollingWindow()
+    for v in range(1, 21):
+        window.add(float(v))
+    # 20 замеров: p95 лежит между 19 и 20, а не равен максимуму
+    assert window.percentile(0.95) == 19.05
+    assert window.percentile(0.5) == 10.5
+    assert window.percentile(1.0) == 20.0
+
+
+def test_single_outlier_does_not_trip_threshold():
+    monitor = LatencyMonitor("test", clock=lambda: 0.0)
+    for _ in range(MIN_SAMPLES - 1):
+        monitor.exchange_lag.add(0.1)
+    monitor.exchange_lag.add(10.0)
+    assert monitor.check() is None
+
+
+def test_too_few_samples_are_ignored():
+    monitor = LatencyMonitor("test", clock=lambda: 0.0)
+    for _ in range(MIN_SAMPLES - 1):
+        monitor.rtt.add(10.0)
+    assert monitor.check() is None
+    monitor.rtt.add(10.0)
+    assert "RTT" in monitor.check()
+
+
+def test_processing_lag_alerts_without_reconnect():
+    now = [100.0]
+    monitor = LatencyMonitor("test", clock=lambda: now[0])
+    for _ in range(MIN_SAMPLES):
+        monitor.on_processed(received_at=90.0)
+    assert monitor.check() is None
+    assert "обработка" in monitor.check_processing()
+
+
+def test_missed_pongs_force_reconnect():
+    monitor = LatencyMonitor("test", clock=lambda: 0.0)
+    monitor.next_ping()
+    monitor.next_ping()
+    monitor.next_ping()
+    assert "pong" in monitor.check()
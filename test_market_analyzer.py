@@ -0,0 +1,78 @@
+import copy
+import random
+
+import pytest
+
+from trading_bot.market_analyzer import MarketAnalyzer, PatternDetector, ZoneBuilder
+
+CONFIG = {"rsi_period": 5, "volume_window": 5, "atr_period": 5,
+          "zone_tolerance": 0.01, "provisional_min_interval": 60.0}
+
+
+def candle_direction(self):
+    """Детерминированный паттерн для теста: направление последней свечи."""
+    if len(self.candles) < 2:
+        return None
+    last = self.candles[-1]
+    direction = "bullish" if last["close"] > last["open"] else "bearish"
+    return {"direction": direction, "name": f"test_{direction}"}
+
+
+def make_candles(count, seed=7):
+    rng = random.Random(seed)
+    price, candles = 100.0, []
+    for i in range(count):
+        close = price * (1 + rng.uniform(-0.01, 0.01))
+        candles.append({"timestamp": 1_000 * i, "open": price, "close": close,
+                        "high": max(price, close) * 1.002, "low": min(price, close) * 0.998,
+                        "volume": rng.choice([10.0, 12.0, 40.0])})
+        price = close
+    return candles
+
+
+def indicator_state(analyzer):
+    return copy.deepcopy({
+        "rsi": vars(analyzer.rsi_indicator), "volume": vars(analyzer.volume_analyzer),
+        "atr": vars(analyzer.atr_indicator), "trend": vars(analyzer.trend_filter),
+        "zones": (analyzer.zone_builder._support_zones, analyzer.zone_builder._resistance_zones),
+        "pattern": analyzer.pattern_detector.candles,
+    })
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    # заглушки базовой версии: паттерн и фильтрация уровней
+    monkeypatch.setattr(PatternDetector, "detect_pattern", candle_direction)
+    monkeypatch.setattr(ZoneBuilder, "_filter_close_levels",
+                        lambda self, zones: zones, raising=False)
+    return MarketAnalyzer(CONFIG, position_manager=object())
+
+
+def test_preview_has_no_side_effects_and_matches_committed_candle(analyzer):
+    signals = 0
+    for candle in make_candles(120):
+        before = indicator_state(analyzer)
+        preview = analyzer.preview_signal(dict(candle))
+        assert indicator_state(analyzer) == before
+
+        analyzer.generate_signal(dict(candle))
+        committed = analyzer.signal_validator.validate(
+            analyzer.pattern_detector.detect_pattern(), candle, analyzer.prev_candle)
+        if not committed:
+            assert preview == {}
+            continue
+        signals += 1
+        assert {k: preview[k] for k in committed} == committed
+        assert preview["atr"] == pytest.approx(analyzer.atr_indicator.last_atr)
+    assert signals > 0
+
+
+def test_throttle_is_per_candle(analyzer, monkeypatch):
+    calls = []
+    monkeypatch.setattr(PatternDetector, "preview",
+                        lambda self, candle: calls.append(candle["timestamp"]))
+    first, second = make_candles(2)
+    analyzer.preview_signal(first)
+    analyzer.preview_signal(first)           # та же свеча раньше интервала
+    analyzer.preview_signal(second)          # первый пуш новой свечи
+    assert calls == [first["timestamp"], second["timestamp"]]
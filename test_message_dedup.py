@@ -0,0 +1,46 @@
+import pytest
+
+from trading_bot.message_dedup import MessageDeduplicator
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_second_sighting_is_duplicate():
+    dedup = MessageDeduplicator(max_size=10, ttl=60, clock=FakeClock())
+    assert dedup.seen("a") is False
+    assert dedup.seen("a") is True
+    assert dedup.stats()["hits"] == 1
+
+
+def test_oldest_key_evicted_by_size():
+    dedup = MessageDeduplicator(max_size=2, ttl=60, clock=FakeClock())
+    for key in ("a", "b", "c"):
+        dedup.seen(key)
+    assert len(dedup) == 2
+    assert "a" not in dedup
+    assert dedup.seen("a") is False
+    assert dedup.stats()["evicted_by_size"] == 2
+
+
+def test_keys_expire_after_ttl():
+    clock = FakeClock()
+    dedup = MessageDeduplicator(max_size=10, ttl=60, clock=clock)
+    dedup.seen("a")
+    clock.now = 30
+    dedup.seen("b")
+    clock.now = 61
+    assert "a" not in dedup
+    assert "b" in dedup
+    assert dedup.seen("a") is False
+    assert dedup.stats()["expired"] == 1
+
+
+def test_max_size_must_be_positive():
+    with pytest.raises(ValueError):
+        MessageDeduplicator(max_size=0)
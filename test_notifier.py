@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from trading_bot.notifier import TelegramNotifier, MAX_TEXT_LENGTH, RETRY_BACKOFF
+
+
+class StubBotApi:
+    """Локальная заглушка Bot API: запоминает sendMessage, умеет отвечать 429 и 5xx."""
+
+    def __init__(self, rate_limited: int = 0, server_errors: int = 0):
+        self.messages = []
+        self.rate_limited = rate_limited
+        self.server_errors = server_errors
+        self.connections = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.connections.add(self.client_address)
+                if stub.rate_limited:
+                    stub.rate_limited -= 1
+                    self._reply(429, {"ok": False, "error_code": 429,
+                                      "parameters": {"retry_after": 0.2}})
+                    return
+                if stub.server_errors:
+                    stub.server_errors -= 1
+                    self._reply(502, {"ok": False, "error_code": 502})
+                    return
+                stub.messages.append((time.monotonic(), body))
+                self._reply(200, {"ok": True, "result": {}})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class GatedSession(requests.Session):
+    """Сессия, чей первый POST ждёт release — отправитель заведомо занят."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def post(self, *args, **kwargs):
+        self.entered.set()
+        self.release.wait(5)
+        return super().post(*args, **kwargs)
+
+
+def make_notifier(stub, **kwargs):
+    return TelegramNotifier("TOKEN", 42, api_url=stub.url, **kwargs)
+
+
+def test_notify_does_not_block_and_keeps_order():
+    stub = StubBotApi()
+    session = GatedSession()
+    notifier = make_notifier(stub, chat_interval=0.2, session=session)
+    notifier.notify("msg 0")
+    assert session.entered.wait(5)
+    # отправитель висит на первом запросе, а notify всё равно возвращается
+    for i in range(1, 50):
+        notifier.notify(f"msg {i}")
+    assert notifier.stats()["queued"] == 49
+    session.release.set()
+
+    assert notifier.flush(5)
+    texts = "\n\n".join(body["text"] for _, body in stub.messages)
+    assert texts.split("\n\n") == [f"msg {i}" for i in range(50)]
+    assert all(body["chat_id"] == 42 for _, body in stub.messages)
+    # первый уходит сразу, остальные склеиваются, пока ждём лимит чата
+    assert len(stub.messages) < 5
+    notifier.close()
+    stub.close()
+
+
+def test_chat_interval_and_session_reuse():
+    stub = StubBotApi()
+    notifier = make_notifier(stub, chat_interval=0.3)
+    for i in range(3):
+        notifier.notify(f"msg {i}")
+        time.sleep(0.35)
+    assert notifier.flush(5)
+    times = [t for t, _ in stub.messages]
+    assert len(times) == 3
+    assert all(b - a >= 0.29 for a, b in zip(times, times[1:]))
+    assert len(stub.connections) == 1
+    notifier.close()
+    stub.close()
+
+
+def test_identical_messages_collapse():
+    stub = StubBotApi()
+    notifier = make_notifier(stub, chat_interval=0.3)
+    notifier.notify("start")
+    for _ in range(4):
+        notifier.notify("Ошибка сети")
+    notifier.notify("done")
+    assert notifier.flush(5)
+    texts = [body["text"] for _, body in stub.messages]
+    assert texts == ["start", "Ошибка сети (×4)\n\ndone"]
+    notifier.close()
+    stub.close()
+
+
+def test_long_batches_are_split():
+    stub = StubBotApi()
+    notifier = make_notifier(stub, chat_interval=0.2)
+    notifier.notify("first")
+    for i in range(5):
+        notifier.notify(f"{i}" * 1500)
+    assert notifier.flush(5)
+    assert all(len(body["text"]) <= MAX_TEXT_LENGTH for _, body in stub.messages)
+    assert "".join(body["text"] for _, body in stub.messages).replace("\n", "") == \
+        "first" + "".join(f"{i}" * 1500 for i in range(5))
+    notifier.close()
+    stub.close()
+
+
+def test_retry_after_429():
+    stub = StubBotApi(rate_limited=1)
+    sleeps = []
+    notifier = make_notifier(stub, chat_interval=0.1, sleep=sleeps.append)
+    notifier.notify("hello")
+    assert notifier.flush(5)
+    assert [body["text"] for _, body in stub.messages] == ["hello"]
+    assert notifier.stats()["failed"] == 0
+    assert notifier.stats()["requests"] == 2
+    assert sleeps == [0.2]
+    notifier.close()
+    stub.close()
+
+
+def test_server_errors_back_off():
+    stub = StubBotApi(server_errors=2)
+    sleeps = []
+    notifier = make_notifier(stub, chat_interval=0.1, sleep=sleeps.append)
+    notifier.notify("hello")
+    assert notifier.flush(5)
+    assert [body["text"] for _, body in stub.messages] == ["hello"]
+    assert notifier.stats()["requests"] == 3
+    assert sleeps == [RETRY_BACKOFF, RETRY_BACKOFF * 2]
+    notifier.close()
+    stub.close()
+
+
+def test_sender_survives_unexpected_error():
+    class BrokenSession(requests.Session):
+        calls = 0
+
+        def post(self, *args, **kwargs):
+            BrokenSession.calls += 1
+            if BrokenSession.calls == 1:
+                raise ValueError("boom")
+            return super().post(*args, **kwargs)
+
+    stub = StubBotApi()
+    notifier = make_notifier(stub, chat_interval=0.1, session=BrokenSession())
+    notifier.notify("lost")
+    assert notifier.flush(5)
+    notifier.notify("delivered")
+    assert notifier.flush(5)
+    assert [body["text"] for _, body in stub.messages] == ["delivered"]
+    assert notifier.stats()["failed"] == 1
+    notifier.close()
+    stub.close()
@@ -0,0 +1,135 @@
+import csv
+
+import pytest
+from pybit.exceptions import InvalidRequestError
+
+from trading_bot.bybit_client import BybitClient
+from trading_bot.paper_client import PaperClient
+
+
+class StubMarket:
+    """Публичный рынок без сети; считает запросы."""
+
+    def __init__(self, price="100"):
+        self.price = price
+        self.instrument_calls = 0
+        self.ticker_calls = 0
+
+    def get_instruments_info(self, **params):
+        self.instrument_calls += 1
+        return {"result": {"list": [{
+            "symbol": params["symbol"],
+            "priceFilter": {"tickSize": "0.1"},
+            "lotSizeFilter": {"qtyStep": "0.001", "minOrderQty": "0.001"},
+        }]}}
+
+    def get_tickers(self, **params):
+        self.ticker_calls += 1
+        return {"result": {"list": [{"symbol": params["symbol"], "lastPrice": self.price}]}}
+
+
+def make_client(tmp_path, market=None, **kwargs):
+    return PaperClient(name="paper-test", latency_ms=0, jitter_ms=0,
+                       market=market or StubMarket(),
+                       journal_path=str(tmp_path / "trade_journal.csv"), **kwargs)
+
+
+def test_market_order_fills_at_ticker_price_and_charges_fee(tmp_path):
+    client = make_client(tmp_path, balance=1000.0, taker_fee=0.001)
+    http = client.http_client
+    resp = http.place_order(category="linear", symbol="BTCUSDT", side="Buy",
+                            orderType="Market", qty="2", orderLinkId="tb-1")
+    order_id = resp["result"]["orderId"]
+    [order] = http.get_order_history(category="linear", orderId=order_id)["result"]["list"]
+    assert order["orderStatus"] == "Filled"
+    [execution] = http.get_executions(category="linear", symbol="BTCUSDT")["result"]["list"]
+    assert float(execution["execPrice"]) == 100.0
+    wallet = http.get_wallet_balance(accountType="UNIFIED")["result"]["list"][0]
+    assert float(wallet["totalEquity"]) == pytest.approx(1000.0 - 0.2)
+    [position] = http.get_positions(category="linear", symbol="BTCUSDT")["result"]["list"]
+    assert (position["side"], float(position["size"])) == ("Buy", 2.0)
+
+
+def test_errors_raise_like_pybit(tmp_path):
+    http = make_client(tmp_path).http_client
+    params = dict(category="linear", symbol="BTCUSDT", side="Buy", orderType="Limit",
+                  qty="1", price="90", orderLinkId="dup")
+    http.place_order(**params)
+    with pytest.raises(InvalidRequestError) as err:
+        http.place_order(**params)
+    assert err.value.status_code == 110072
+
+
+def test_stream_price_triggers_conditional_orders(tmp_path):
+    client = make_client(tmp_path)
+    http = client.http_client
+    http.place_order(category="linear", symbol="BTCUSDT", side="Buy",
+                     orderType="Market", qty="1")
+    sl = http.place_order(category="linear", symbol="BTCUSDT", side="Sell",
+                          orderType="Market", qty="1", triggerPrice="95",
+                          triggerDirection=2, reduceOnly=True)["result"]["orderId"]
+    client.on_price("BTCUSDT", 96.0)
+    assert http.get_open_orders(category="linear", orderId=sl)["result"]["list"]
+    client.on_price("BTCUSDT", 94.9)
+    assert not http.get_open_orders(category="linear", orderId=sl)["result"]["list"]
+    [closed] = http.get_closed_pnl(category="linear", symbol="BTCUSDT")["result"]["list"]
+    assert float(closed["closedPnl"]) < 0
+
+
+def test_events_go_through_bridge_and_journal(tmp_path):
+    client = make_client(tmp_path)
+    statuses = []
+    client.track_order_status(lambda oid, status, data: statuses.append(status))
+    client.http_client.place_order(category="linear", symbol="BTCUSDT", side="Buy",
+                                   orderType="Market", qty="1", orderLinkId="tb-x")
+    # мост не запущен: события копятся и разбираются так же, как с приватного WS
+    pending = list(client.ws_bridge._pending)
+    topics = {m["topic"] for m in pending}
+    assert {"order", "execution", "position", "wallet"} <= topics
+    for message in pending:
+        client.handle_ws_message(message)
+    assert "Filled" in statuses
+    assert client.account_state.equity is not None
+    with open(tmp_path / "trade_journal.csv") as f:
+        [row] = list(csv.DictReader(f))
+    assert (row["account"], row["order_link_id"]) == ("paper-test", "tb-x")
+
+
+def test_instrument_and_ticker_fetched_once_per_symbol(tmp_path):
+    market = StubMarket()
+    first = make_client(tmp_path, market=market)
+    second = make_client(tmp_path, market=market)
+    for client in (first, second):
+        client.http_client.get_instruments_info(category="linear", symbol="PAPERTESTUSDT")
+    assert market.instrument_calls == 1
+    first.http_client.get_tickers(category="linear", symbol="PAPERTESTUSDT")
+    first.http_client.get_tickers(category="linear", symbol="PAPERTESTUSDT")
+    assert market.ticker_calls == 1
+
+
+def test_limit_take_profit_fills_at_limit_with_maker_fee(tmp_path):
+    client = make_client(tmp_path, balance=1000.0, taker_fee=0.001, maker_fee=0.0002)
+    http = client.http_client
+    http.place_order(category="linear", symbol="BTCUSDT", side="Buy",
+                     orderType="Market", qty="1")
+    tp = http.place_order(category="linear", symbol="BTCUSDT", side="Sell",
+                          orderType="Limit", qty="1", price="110",
+                          reduceOnly=True)["result"]["orderId"]
+    client.on_price("BTCUSDT", 109.9)
+    assert http.get_open_orders(category="linear", orderId=tp)["result"]["list"]
+    # цена прошла лимит — исполнение по лимиту, а не по цене потока
+    client.on_price("BTCUSDT", 112.0)
+    [execution] = [e for e in http.get_executions(category="linear")["result"]["list"]
+                   if e["orderId"] == tp]
+    assert float(execution["execPrice"]) == 110.0
+    assert float(execution["execFee"]) == pytest.approx(110.0 * 0.0002)
+    wallet = http.get_wallet_balance(accountType="UNIFIED")["result"]["list"][0]
+    assert float(wallet["totalEquity"]) == pytest.approx(1000.0 - 0.1 + 10.0 - 0.022)
+
+
+def test_paper_client_has_every_bybit_client_field(tmp_path):
+    client = make_client(tmp_path)
+    live = BybitClient(http_client=client.http_client)
+    assert set(vars(live)) <= set(vars(client))
+    assert client.ws is None and client.order_budget is not None
+    assert client.stats()["balance"] == 10000.0
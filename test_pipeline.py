@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from trading_bot.pipeline import SignalPipeline, Stage
+
+
+def test_drop_oldest_keeps_newest_items():
+    async def scenario():
+        stage = Stage("analysis", 2)
+        for i in range(4):
+            stage.put_drop_oldest(i)
+        return [await stage.get(), await stage.get()], stage.stats()
+    items, stats = asyncio.run(scenario())
+    assert items == [2, 3]
+    assert stats["dropped"] == 2
+    assert stats["max_depth"] == 2
+    assert stats["processed"] == 2
+    assert stats["depth"] == 0
+
+
+def test_put_waits_for_room():
+    async def scenario():
+        stage = Stage("execution", 1)
+        await stage.put("a")
+        blocked = asyncio.create_task(stage.put("b"))
+        await asyncio.sleep(0)
+        assert not blocked.done()
+        assert await stage.get() == "a"
+        await blocked
+        return await stage.get(), stage.stats()["dropped"]
+    assert asyncio.run(scenario()) == ("b", 0)
+
+
+def test_stale_signals_are_not_executed():
+    executed = []
+
+    async def execute(symbol, signal):
+        executed.append(signal)
+
+    async def scenario():
+        pipeline = SignalPipeline(execute, save_candles=False, max_signal_age=30)
+        pipeline.start()
+        now = time.time()
+        await pipeline.signals.put(("BTCUSDT", {"direction": "long", "n": 1}, now - 600))
+        await pipeline.signals.put(("BTCUSDT", {"direction": "long", "n": 2}, now - 1))
+        await asyncio.sleep(0.05)
+        await pipeline.stop()
+        return pipeline
+    pipeline = asyncio.run(scenario())
+    # свеча закрылась десять минут назад — вход по ней не делаем
+    assert pipeline.stale_signals == 1
+    assert [s["n"] for s in executed] == [2]
+
+
+def test_lag_p95_is_interpolated():
+    stage = Stage("analysis", 1)
+    for lag in range(1, 21):
+        stage.lags.add(float(lag))
+    stats = stage.stats()
+    # 19 * 0.95 = 18.05 -> между 19 и 20, а не ближайший сверху
+    assert abs(stats["lag_p95"] - 19.05) < 1e-9
+    assert stats["lag_max"] == 20.0 and stats["lag_avg"] == 10.5
+
+
+def test_stop_is_noticed_without_a_new_candle():
+    running = [True]
+
+    async def execute(symbol, signal):
+        pass
+
+    async def scenario():
+        pipeline = SignalPipeline(execute, should_run=lambda: running[0],
+                                  save_candles=False, stop_check_interval=0.01)
+        pipeline.start()
+        await asyncio.sleep(0.03)
+        assert not pipeline.stopped.is_set()
+        running[0] = False
+        # свечей нет, но конвейер останавливается по проверке should_run
+        await asyncio.wait_for(pipeline.stopped.wait(), 1.0)
+        await pipeline.stop()
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+import time
+
+from trading_bot.pnl_aggregate import PnlAggregate
+
+
+class StubHttp:
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def get_closed_pnl(self, **params):
+        self.calls.append(params)
+        rows = [r for r in self.records
+                if params["startTime"] <= int(r["updatedTime"]) <= params["endTime"]]
+        return {"result": {"list": rows, "nextPageCursor": ""}}
+
+
+def test_cursor_from_disk_is_synced_once_per_process(tmp_path):
+    path = str(tmp_path / "pnl_state.json")
+    now = int(time.time() * 1000)
+    http = StubHttp([{"orderId": "a", "closedPnl": "5", "updatedTime": str(now - 1000)}])
+    first = PnlAggregate(http, path=path)
+    assert not first.is_synced("BTCUSDT")
+    assert first.sync("BTCUSDT") == 1
+    assert first.is_synced("BTCUSDT")
+
+    # сделка закрылась, пока бот стоял
+    http.records.append({"orderId": "b", "closedPnl": "-2", "updatedTime": str(now + 1)})
+    restarted = PnlAggregate(http, path=path)
+    assert "BTCUSDT" in restarted.cursors
+    assert not restarted.is_synced("BTCUSDT")
+    time.sleep(0.002)
+    assert restarted.sync("BTCUSDT") == 1
+    assert restarted.month_to_date("BTCUSDT") == (3.0, 2)
+
+
+def test_overlap_does_not_double_count(tmp_path):
+    now = int(time.time() * 1000)
+    http = StubHttp([{"orderId": "a", "closedPnl": "1", "updatedTime": str(now - 10)}])
+    aggregate = PnlAggregate(http, path=str(tmp_path / "pnl_state.json"))
+    aggregate.sync("ETHUSDT")
+    assert aggregate.sync("ETHUSDT") == 0
+    assert aggregate.month_to_date("ETHUSDT") == (1.0, 1)
@@ -0,0 +1,49 @@
+from trading_bot.position_journal import PositionJournal
+
+
+def make_position(key, symbol="BTCUSDT"):
+    return {"order_id": key, "symbol": symbol, "qty": 0.01, "active_orders": []}
+
+
+def test_replay_put_and_delete(tmp_path):
+    path = str(tmp_path / "positions.log")
+    journal = PositionJournal(path)
+    a, b = make_position("a"), make_position("b")
+    journal.put(a)
+    journal.put(b)
+    a["active_orders"].append("sl-1")
+    a["sl_order_id"] = "sl-1"
+    journal.put(a)
+    journal.delete("b")
+    journal.close()
+
+    positions = PositionJournal(path).load()
+    assert list(positions) == ["a"]
+    assert positions["a"]["active_orders"] == ["sl-1"]
+    assert positions["a"]["sl_order_id"] == "sl-1"
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / "positions.log")
+    journal = PositionJournal(path)
+    journal.put(make_position("a"))
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"op": "put", "position": {"order_')
+
+    assert list(PositionJournal(path).load()) == ["a"]
+
+
+def test_compaction_keeps_only_live_positions(tmp_path):
+    path = str(tmp_path / "positions.log")
+    journal = PositionJournal(path, compact_every=10)
+    for i in range(12):
+        journal.put(make_position(f"p{i}"))
+        if i % 2:
+            journal.delete(f"p{i}")
+    journal.close()
+
+    with open(path) as f:
+        lines = f.readlines()
+    assert len(lines) < 12
+    assert sorted(PositionJournal(path).load()) == sorted(f"p{i}" for i in range(0, 12, 2))
@@ -0,0 +1,210 @@
+import time
+
+from trading_bot.paper_client import PaperClient
+from trading_bot.position_journal import PositionJournal
+from trading_bot.position_manager import PositionManager
+
+
+class StubMarket:
+    """Публичный рынок для PaperClient без сети."""
+
+    def get_instruments_info(self, **params):
+        return {"result": {"list": [{
+            "symbol": params["symbol"],
+            "priceFilter": {"tickSize": "0.1"},
+            "lotSizeFilter": {"qtyStep": "0.001", "minOrderQty": "0.001"},
+        }]}}
+
+    def get_tickers(self, **params):
+        return {"result": {"list": [{"symbol": params["symbol"], "lastPrice": "100"}]}}
+
+
+def make_manager(tmp_path, journal=None):
+    client = PaperClient(name="test", latency_ms=0, jitter_ms=0, market=StubMarket(),
+                         journal_path=str(tmp_path / "trade_journal.csv"))
+    journal = journal or PositionJournal(str(tmp_path / "positions.log"))
+    return PositionManager(journal=journal, client=client)
+
+
+def journal_position(symbol="BTCUSDT", direction="long", qty=1.0, **extra):
+    return {"order_id": f"entry-{symbol}", "signal_ts": 1, "direction": direction,
+            "entry": 100.0, "sl": 95.0, "tp1": 105.0, "tp2": 110.0, "qty": qty,
+            "tp1_hit": False, "symbol": symbol, "notified_open": True,
+            "closed": False, "active_orders": [], **extra}
+
+
+def test_one_position_per_symbol_and_no_opposite_entry(tmp_path):
+    manager = make_manager(tmp_path)
+    assert manager.can_open("BTCUSDT", "short")
+    manager._register(journal_position())
+    assert not manager.can_open("BTCUSDT", "long")
+    assert not manager.can_open("BTCUSDT", "short")
+    assert manager.can_open("ETHUSDT", "short")
+    assert manager.open_position({"direction": "short"}, 10, 100, "BTCUSDT") is None
+
+
+def test_recover_replaces_journal_entry_after_position_flipped(tmp_path):
+    journal = PositionJournal(str(tmp_path / "positions.log"))
+    journal.put(journal_position(direction="long"))
+    manager = make_manager(tmp_path, journal)
+    exchange = manager.client.exchange
+    exchange.set_price("BTCUSDT", 100.0)
+    exchange.place_order({"symbol": "BTCUSDT", "side": "Sell", "orderType": "Market",
+                          "qty": "2"})
+
+    summary = manager.recover()
+    assert summary["dropped"] == 1 and summary["adopted"] == 1
+    [position] = manager.positions_for("BTCUSDT")
+    assert (position["direction"], position["qty"]) == ("short", 2.0)
+    assert "entry-BTCUSDT" not in journal.load()
+
+
+def place(exchange, **params):
+    resp = exchange.place_order({"symbol": "BTCUSDT", **params})
+    assert resp["retCode"] == 0, resp
+    return resp["result"]["orderId"]
+
+
+def open_long_with_sl(manager, link_prefix="tb-BTCUSDT-1"):
+    exchange = manager.client.exchange
+    exchange.set_price("BTCUSDT", 100.0)
+    place(exchange, side="Buy", orderType="Market", qty="1")
+    return place(exchange, side="Sell", orderType="Market", qty="1", triggerPrice="95",
+                 triggerDirection=2, reduceOnly=True, orderLinkId=f"{link_prefix}-sl")
+
+
+def test_recover_drops_closed_and_cancels_stale_bot_orders(tmp_path):
+    journal = PositionJournal(str(tmp_path / "positions.log"))
+    journal.put(journal_position(symbol="ETHUSDT"))     # закрыта, пока бот стоял
+    manager = make_manager(tmp_path, journal)
+    exchange = manager.client.exchange
+    sl_id = open_long_with_sl(manager)
+    exchange.set_price("ETHUSDT", 10.0)
+    stale = place(exchange, symbol="ETHUSDT", side="Buy", orderType="Limit", qty="1",
+                  price="5", orderLinkId="tb-ETHUSDT-1-tp1")
+    foreign = place(exchange, symbol="ETHUSDT", side="Buy", orderType="Limit", qty="1",
+                    price="5", orderLinkId="manual")
+    alerts = []
+    manager._notify = alerts.append
+
+    summary = manager.recover()
+    assert summary == {"restored": 0, "adopted": 1, "dropped": 1,
+                       "cancelled": 1, "skipped": 0}
+    [position] = manager.positions_for("BTCUSDT")
+    assert position["sl_order_id"] == sl_id
+    assert manager.order_index[sl_id] is position
+    assert exchange.orders[stale]["orderStatus"] == "Cancelled"
+    assert exchange.orders[foreign]["orderStatus"] == "New"
+
+
+def test_recover_keeps_journal_orders_when_pagination_is_cut(tmp_path):
+    journal = PositionJournal(str(tmp_path / "positions.log"))
+    manager = make_manager(tmp_path, journal)
+    sl_id = open_long_with_sl(manager)
+    journal.put(journal_position(sl_order_id=sl_id, active_orders=[sl_id]))
+
+    calls = []
+
+    def first_page_only(**params):
+        # первая страница без нашего SL, дальше deadline уже истёк
+        calls.append(params)
+        time.sleep(0.1)
+        return {"result": {"list": [{"orderId": "other", "symbol": "XRPUSDT",
+                                     "orderLinkId": "manual"}],
+                           "nextPageCursor": "page2"}}
+    manager.client.http_client.get_open_orders = first_page_only
+    alerts = []
+    manager._notify = alerts.append
+
+    summary = manager.recover(timeout=0.05)
+    assert len(calls) == 1
+    assert summary["restored"] == 1
+    [position] = manager.positions_for("BTCUSDT")
+    assert position["sl_order_id"] == sl_id
+    assert position["active_orders"] == [sl_id]
+    assert alerts == []
+
+
+def test_recover_without_exchange_view_keeps_journal(tmp_path):
+    journal = PositionJournal(str(tmp_path / "positions.log"))
+    journal.put(journal_position())
+    manager = make_manager(tmp_path, journal)
+
+    def broken(**params):
+        raise ConnectionError("timeout")
+    manager.client.http_client.get_positions = broken
+
+    assert manager.recover()["restored"] == 1
+    assert manager.positions_for("BTCUSDT")[0]["order_id"] == "entry-BTCUSDT"
+    assert manager.recover() == {}
+
+
+def live_position_with_sl(tmp_path):
+    manager = make_manager(tmp_path)
+    sl_id = open_long_with_sl(manager)
+    position = journal_position(sl_order_id=sl_id, active_orders=[sl_id])
+    manager._register(position)
+    manager.order_index[sl_id] = position
+    alerts = []
+    manager._notify = alerts.append
+    return manager, position, sl_id, alerts
+
+
+def open_stops(manager):
+    orders = manager.client.exchange.query_orders({"symbol": "BTCUSDT"}, True)
+    return [o for o in orders["result"]["list"] if o["orderStatus"] == "Untriggered"]
+
+
+def test_rejected_close_restores_sl(tmp_path):
+    manager, position, old_sl, alerts = live_position_with_sl(tmp_path)
+    real_submit = manager.client.submit_order
+
+    def submit(link_id, **params):
+        if link_id.endswith("-close"):
+            return {"retCode": 110017, "retMsg": "rejected"}
+        return real_submit(link_id, **params)
+    manager.client.submit_order = submit
+
+    assert manager.market_close_active_position() is None
+    [stop] = open_stops(manager)
+    assert stop["orderId"] == position["sl_order_id"] != old_sl
+    assert stop["orderLinkId"] == "tb-BTCUSDT-1-sl_2"
+    assert float(stop["triggerPrice"]) == 95.0
+    assert manager.order_index[stop["orderId"]] is position
+    assert "не закрыта" in alerts[-1] and "SL на месте" in alerts[-1]
+
+
+def test_unfilled_close_restores_sl_with_new_link_id(tmp_path):
+    manager, position, old_sl, alerts = live_position_with_sl(tmp_path)
+    position.update(tp1_hit=True, sl=99.0)
+    manager.wait_for_order_filled = lambda order_id, symbol: False
+    submitted = []
+    real_submit = manager.client.submit_order
+
+    def submit(link_id, **params):
+        submitted.append(link_id)
+        if not link_id.endswith("-close"):
+            return real_submit(link_id, **params)
+        # закрытие "зависло": лимитный ордер вдали от цены вместо рыночного
+        return real_submit(link_id, **{**params, "orderType": "Limit", "price": "1"})
+    manager.client.submit_order = submit
+
+    assert manager.market_close_active_position() is None
+    assert submitted == ["tb-BTCUSDT-1-close", "tb-BTCUSDT-1-sl2_2"]
+    [stop] = open_stops(manager)
+    assert float(stop["triggerPrice"]) == 99.0
+    # зависший закрывающий ордер снят
+    orders = manager.client.exchange.query_orders({"symbol": "BTCUSDT"}, True)
+    assert [o["orderType"] for o in orders["result"]["list"]] == ["Market"]
+    assert "не исполнился" in alerts[-1]
+
+
+def test_link_id_without_signal_ts_uses_the_whole_key():
+    make = PositionManager._link_id
+    # записи журнала без signal_ts: общий префикс order_id не должен давать один ID
+    first = {"symbol": "BTCUSDT", "order_id": "1700000000000-aaaa-1111-2222-333344445555"}
+    second = {**first, "order_id": "1700000000000-bbbb-1111-2222-333344445555"}
+    assert make(first, "sl") != make(second, "sl")
+    assert make(first, "sl") == make(dict(first), "sl")
+    assert len(make(first, "close_2")) <= 36
+    assert make(journal_position(), "tp1") == "tb-BTCUSDT-1-tp1"
@@ -0,0 +1,29 @@
+import time
+
+from trading_bot.rate_budget import RateBudget
+
+
+def test_burst_within_budget_does_not_wait():
+    budget = RateBudget(10)
+    started = time.monotonic()
+    for _ in range(10):
+        budget.acquire()
+    assert time.monotonic() - started < 0.05
+
+
+def test_over_budget_waits_for_refill():
+    budget = RateBudget(20)
+    for _ in range(20):
+        budget.acquire()
+    started = time.monotonic()
+    budget.acquire()
+    assert time.monotonic() - started >= 0.04
+
+
+def test_hold_blocks_until_reset():
+    budget = RateBudget(100)
+    reset_ms = int((time.time() + 0.1) * 1000)
+    budget.hold({"X-Bapi-Limit-Reset-Timestamp": str(reset_ms)})
+    started = time.monotonic()
+    budget.acquire()
+    assert time.monotonic() - started >= 0.05
@@ -0,0 +1,204 @@
+from concurrent.futures import Future
+
+from trading_bot.stop_engine import BREAKEVEN_OFFSET, StopEngine
+
+TICK = 0.1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ImmediateExecutor:
+    """Исполняет сразу; функции с именами из hold оставляет незавершёнными."""
+
+    def __init__(self):
+        self.hold = set()
+        self.pending = []
+
+    def submit(self, func, *args):
+        future = Future()
+        if func.__name__ in self.hold:
+            self.pending.append((future, func, args))
+        else:
+            future.set_result(func(*args))
+        return future
+
+
+class StubManager:
+    def __init__(self, position):
+        self.position = position
+        self.active_positions = {position["order_id"]: position}
+        self.symbol_positions = {position["symbol"]: {position["order_id"]}}
+        self.amended = []
+        self.closed = []
+        self.close_result = {"closed": True}
+        self.alerts = []
+        self.bridge = type("Bridge", (), {"order_executor": ImmediateExecutor(),
+                                          "io_executor": ImmediateExecutor()})()
+        self.context = type("Context", (), {
+            "specs": {"BTCUSDT": (0, {"priceFilter": {"tickSize": str(TICK)}})}})()
+
+    def positions_for(self, symbol):
+        return [self.position]
+
+    def amend_stop(self, position, new_sl):
+        self.amended.append(new_sl)
+        position["sl"] = new_sl
+        return True
+
+    def market_close_active_position(self, key, reason):
+        self.closed.append((key, reason))
+        return self.close_result
+
+    def _notify(self, message):
+        self.alerts.append(message)
+
+
+def long_position(**extra):
+    return {"order_id": "p1", "symbol": "BTCUSDT", "direction": "long", "entry": 100.0,
+            "sl": 95.0, "initial_sl": 95.0, "sl_order_id": "sl1", "tp1_hit": False,
+            "opened_at": 1_000_000, **extra}
+
+
+def make_engine(position, atr=None, **config):
+    clock = FakeClock()
+    manager = StubManager(position)
+    engine = StopEngine(manager, {"stop_amend_interval": 2.0, **config},
+                        atr_for=lambda symbol: atr, clock=clock)
+    return engine, manager, clock
+
+
+def test_disabled_by_default():
+    engine, manager, _ = make_engine(long_position(), atr=1.0)
+    engine.on_price("BTCUSDT", 150.0)
+    assert manager.amended == [] and manager.closed == []
+
+
+def test_breakeven_after_r_multiple():
+    engine, manager, _ = make_engine(long_position(), breakeven_r=1.0)
+    engine.on_price("BTCUSDT", 104.9)
+    assert manager.amended == []
+    engine.on_price("BTCUSDT", 105.0)
+    expected = round(int(100 * (1 + BREAKEVEN_OFFSET) / TICK) * TICK, 10)
+    assert manager.amended == [expected]
+
+
+def test_trailing_ratchets_only_and_respects_tick():
+    engine, manager, clock = make_engine(long_position(), atr=1.0,
+                                         trailing_atr_multiplier=2.0)
+    engine.on_price("BTCUSDT", 100.0)
+    assert manager.amended == [98.0]
+    # откат цены стоп не опускает
+    clock.now += 10
+    engine.on_price("BTCUSDT", 99.0)
+    assert manager.amended == [98.0]
+    # сдвиг меньше тика не отправляется
+    clock.now += 10
+    engine.on_price("BTCUSDT", 100.05)
+    assert manager.amended == [98.0]
+    clock.now += 10
+    engine.on_price("BTCUSDT", 101.0)
+    assert manager.amended == [98.0, 99.0]
+
+
+def test_short_target_rounds_up_and_ratchets_down():
+    position = long_position(direction="short", sl=105.0, initial_sl=105.0)
+    engine, manager, _ = make_engine(position, atr=1.0, trailing_atr_multiplier=2.0)
+    engine._check(position, 99.95, TICK, 10.0)
+    assert manager.amended == [102.0]
+    engine._check(position, 101.0, TICK, 20.0)
+    assert manager.amended == [102.0]
+
+
+def test_amend_interval_throttles_and_pending_blocks():
+    engine, manager, clock = make_engine(long_position(), atr=1.0,
+                                         trailing_atr_multiplier=2.0)
+    engine.on_price("BTCUSDT", 100.0)
+    clock.now += 1.0
+    engine.on_price("BTCUSDT", 102.0)
+    assert manager.amended == [98.0]
+    assert engine.stats()["throttled"] == 1
+
+    manager.bridge.order_executor.hold = {"amend_stop"}
+    clock.now += 5.0
+    engine.on_price("BTCUSDT", 103.0)
+    clock.now += 5.0
+    engine.on_price("BTCUSDT", 104.0)
+    # пока первый amend в работе, второй не ставится
+    assert len(manager.bridge.order_executor.pending) == 1
+
+
+def test_prices_are_checked_on_order_state_and_coalesced():
+    engine, manager, _ = make_engine(long_position(), atr=1.0, trailing_atr_multiplier=2.0)
+    executor = manager.bridge.order_executor
+    executor.hold = {"_check_symbol"}
+    engine.on_price("ETHUSDT", 50.0)      # по символу нет позиций
+    for price in (100.0, 104.0, 103.0):
+        engine.on_price("BTCUSDT", price)
+    assert [func.__name__ for _, func, _ in executor.pending] == ["_check_symbol"]
+    assert manager.amended == []
+
+    executor.hold = set()
+    _, func, args = executor.pending.pop()
+    func(*args)
+    # лучшая цена — максимум из слитых, решение — по последней
+    assert manager.amended == [102.0]
+    engine.on_price("BTCUSDT", 103.0)
+    assert engine.stats()["throttled"] == 0 and engine._prices == {}
+
+
+def test_time_stop_closes_before_tp1():
+    engine, manager, clock = make_engine(long_position(), time_stop_minutes=1)
+    clock.now = 1000.0 + 59
+    engine.on_price("BTCUSDT", 100.0)
+    assert manager.closed == []
+    clock.now = 1000.0 + 60
+    engine.on_price("BTCUSDT", 100.0)
+    assert manager.closed == [("p1", "TimeStop")]
+
+    engine, manager, clock = make_engine(long_position(tp1_hit=True), time_stop_minutes=1)
+    clock.now += 120
+    engine.on_price("BTCUSDT", 100.0)
+    assert manager.closed == []
+
+
+def test_time_stop_fires_once_while_closing():
+    engine, manager, clock = make_engine(long_position(), time_stop_minutes=1)
+    manager.bridge.io_executor.hold = {"market_close_active_position"}
+    clock.now += 120
+    for _ in range(5):
+        clock.now += 10
+        engine.on_price("BTCUSDT", 100.0)
+    assert len(manager.bridge.io_executor.pending) == 1
+
+
+def test_time_stop_backs_off_and_gives_up():
+    engine, manager, clock = make_engine(long_position(), time_stop_minutes=1)
+    manager.close_result = None        # закрытие не проходит
+    clock.now += 120
+    engine.on_price("BTCUSDT", 100.0)
+    assert len(manager.closed) == 1
+    # повтор не раньше amend_interval·2
+    clock.now += 3.9
+    engine.on_price("BTCUSDT", 100.0)
+    assert len(manager.closed) == 1
+    clock.now += 0.1
+    engine.on_price("BTCUSDT", 100.0)
+    assert len(manager.closed) == 2
+    clock.now += 8
+    engine.on_price("BTCUSDT", 100.0)
+    assert len(manager.closed) == 3 and len(manager.alerts) == 1
+    # после TIME_STOP_ATTEMPTS неудач больше не закрываем
+    clock.now += 1000
+    engine.on_price("BTCUSDT", 100.0)
+    assert len(manager.closed) == 3
+
+
+def test_target_is_none_without_rules():
+    engine, _, _ = make_engine(long_position())
+    assert engine._target(long_position(), {"best": 200.0, "risk": 5.0}, True) is None
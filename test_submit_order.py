@@ -0,0 +1,91 @@
+from pybit.exceptions import InvalidRequestError
+
+from trading_bot.bybit_client import BybitClient, DUPLICATE_LINK_ID_CODE, make_http_client
+from trading_bot.rate_budget import RATE_LIMIT_CODE, RateBudget
+
+
+class StubHttp:
+    """Биржа, на которой ордер с этим link ID уже был."""
+
+    def __init__(self, history):
+        self.history = history
+        self.placed = 0
+
+    def place_order(self, **params):
+        self.placed += 1
+        raise InvalidRequestError(
+            request="create", message="OrderLinkedID is duplicate",
+            status_code=DUPLICATE_LINK_ID_CODE, time="0", resp_headers={})
+
+    def get_open_orders(self, **params):
+        return {"result": {"list": [o for o in self.history if o["orderStatus"] == "New"]}}
+
+    def get_order_history(self, **params):
+        return {"result": {"list": self.history}}
+
+
+def make_client(history):
+    client = BybitClient.__new__(BybitClient)
+    client.http_client = StubHttp(history)
+    client.order_budget = RateBudget(0)
+    return client
+
+
+def test_duplicate_of_cancelled_order_is_not_reused():
+    client = make_client([{"orderId": "old", "orderLinkId": "tb-x-close",
+                           "orderStatus": "Cancelled"}])
+    resp = client.submit_order("tb-x-close", symbol="BTCUSDT", side="Sell",
+                               orderType="Market", qty="1")
+    assert resp["retCode"] == DUPLICATE_LINK_ID_CODE
+    assert client.http_client.placed == 1   # без бесполезных повторов
+
+
+def test_duplicate_of_live_order_resolves_to_it():
+    client = make_client([
+        {"orderId": "old", "orderLinkId": "tb-x-sl", "orderStatus": "Deactivated"},
+        {"orderId": "live", "orderLinkId": "tb-x-sl", "orderStatus": "Untriggered"},
+    ])
+    resp = client.submit_order("tb-x-sl", symbol="BTCUSDT", side="Sell",
+                               orderType="Market", qty="1")
+    assert resp["retCode"] == 0
+    assert resp["result"]["orderId"] == "live"
+
+
+class RateLimitedHttp:
+    """Первый запрос упирается в лимит 10006, второй проходит."""
+
+    def __init__(self):
+        self.placed = 0
+
+    def place_order(self, **params):
+        self.placed += 1
+        if self.placed == 1:
+            raise InvalidRequestError(
+                request="create", message="Too many visits", status_code=RATE_LIMIT_CODE,
+                time="0", resp_headers={"X-Bapi-Limit-Reset-Timestamp": "0"})
+        return {"retCode": 0, "retMsg": "OK", "result": {"orderId": "new"}}
+
+    def get_open_orders(self, **params):
+        return {"result": {"list": []}}
+
+    def get_order_history(self, **params):
+        return {"result": {"list": []}}
+
+
+def test_rate_limit_reaches_submit_order_and_holds_budget(monkeypatch):
+    monkeypatch.setattr("trading_bot.bybit_client.time.sleep", lambda s: None)
+    client = BybitClient.__new__(BybitClient)
+    client.http_client = RateLimitedHttp()
+    held = []
+    client.order_budget = RateBudget(0)
+    client.order_budget.hold = held.append
+    resp = client.submit_order("tb-x-entry", symbol="BTCUSDT", side="Buy",
+                               orderType="Market", qty="1")
+    assert resp["result"]["orderId"] == "new"
+    assert held == [{"X-Bapi-Limit-Reset-Timestamp": "0"}]
+
+
+def test_pybit_does_not_swallow_rate_limit_or_recv_window():
+    http = make_http_client()
+    assert RATE_LIMIT_CODE not in http.retry_codes
+    assert 10002 not in http.retry_codes
@@ -0,0 +1,124 @@
+from trading_bot.account_state import AccountState
+from trading_bot.paper_client import PaperClient
+from trading_bot.position_journal import PositionJournal
+from trading_bot.position_manager import PositionManager
+from trading_bot.trade_context import TradeContext
+
+from test_position_manager import StubMarket
+
+
+class StubHttp:
+    def __init__(self, leverage="5", set_error=None):
+        self.leverage = leverage
+        self.set_error = set_error
+        self.calls = []
+
+    def get_positions(self, **params):
+        self.calls.append("get_positions")
+        return {"result": {"list": [{"symbol": params["symbol"], "leverage": self.leverage}]}}
+
+    def set_leverage(self, **params):
+        self.calls.append("set_leverage")
+        if self.set_error:
+            raise Exception(self.set_error)
+        self.leverage = params["buyLeverage"]
+
+
+class StubClient:
+    def __init__(self, http):
+        self.http_client = http
+        self.calls = []
+
+    def get_symbol_info(self, symbol):
+        self.calls.append("spec")
+        return {"priceFilter": {"tickSize": "0.1"}}
+
+    def get_current_price(self, symbol):
+        self.calls.append("price")
+        return 100.0
+
+
+def make_context(**http_options):
+    http = StubHttp(**http_options)
+    return TradeContext(StubClient(http), AccountState(http)), http
+
+
+def test_apply_leverage_reads_exchange_once_then_uses_cache():
+    context, http = make_context(leverage="5")
+    context.ensure_leverage("BTCUSDT", 10)
+    assert http.calls == ["get_positions", "set_leverage"]
+    context.ensure_leverage("BTCUSDT", 10)
+    assert http.calls == ["get_positions", "set_leverage"]
+    assert context.stats()["hits"] == 1
+
+
+def test_apply_leverage_skips_set_when_equal_and_tolerates_not_modified():
+    context, http = make_context(leverage="10")
+    context.apply_leverage("BTCUSDT", 10)
+    assert http.calls == ["get_positions"]
+
+    context, http = make_context(leverage="5", set_error="leverage not modified (ErrCode: 110043)")
+    context.apply_leverage("BTCUSDT", 10)
+    assert context.leverages["BTCUSDT"] == 10.0
+
+
+def test_leverage_from_account_mirror_needs_no_request():
+    context, http = make_context()
+    context.account_state.apply_ws_message({"topic": "position", "data": [
+        {"symbol": "BTCUSDT", "size": "0", "leverage": "10", "updatedTime": "1"}]})
+    context.ensure_leverage("BTCUSDT", 10)
+    assert http.calls == []
+
+
+def test_spec_and_price_are_cached_until_stale(monkeypatch):
+    context, _ = make_context()
+    clock = [1000.0]
+    monkeypatch.setattr("trading_bot.trade_context.time.monotonic", lambda: clock[0])
+    context.refresh("BTCUSDT")
+    assert context.client.calls == ["spec", "price"]
+    context.spec("BTCUSDT")
+    context.price("BTCUSDT")
+    assert context.client.calls == ["spec", "price"]
+    clock[0] += 11          # цена устарела, шаг цены — ещё нет
+    context.price("BTCUSDT")
+    context.spec("BTCUSDT")
+    assert context.client.calls == ["spec", "price", "price"]
+
+
+class CountingHttp:
+    """Обёртка над PaperHttp: записывает каждый запрос к бирже."""
+
+    def __init__(self, http):
+        self._http = http
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self._http, name)
+
+        def call(**params):
+            self.calls.append((name, params.get("orderLinkId", "")))
+            return method(**params)
+        return call
+
+
+def test_warm_entry_sends_only_the_order(tmp_path):
+    client = PaperClient(name="test", latency_ms=0, jitter_ms=0, market=StubMarket(),
+                         journal_path=str(tmp_path / "trade_journal.csv"))
+    manager = PositionManager(journal=PositionJournal(str(tmp_path / "positions.log")),
+                              client=client)
+    manager._notify = lambda message: None
+    manager.context.refresh("BTCUSDT", leverage=10)
+    manager.account_state.apply_snapshot(manager.account_state.fetch_snapshot())
+    manager.context.on_price("BTCUSDT", 100.0)
+    client.exchange.set_price("BTCUSDT", 100.0)
+
+    counting = client.http_client = CountingHttp(client.http_client)
+    signal = {"direction": "long", "sl": 95.0, "tp1": 105.0, "tp2": 110.0, "timestamp": 1}
+    position = manager.open_position(signal, 10, 100, "BTCUSDT")
+
+    assert position is not None and position["entry"] == 100.0
+    assert position["entry_fee"] > 0
+    entry = [name for name, link in counting.calls if not link.rsplit("-", 1)[-1]
+             .startswith(("sl", "tp"))]
+    # ни баланса, ни инструмента, ни плеча, ни опроса статуса ордера
+    assert entry == ["place_order"]
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from trading_bot.trade_store import FIRST_SYNC_MS, TradeStore
+
+
+class StubHttp:
+    """closed-pnl держит запрос, пока тест не отпустит gate."""
+
+    def __init__(self, records=()):
+        self.records = list(records)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+        self.execution_calls = []
+
+    def get_executions(self, **params):
+        self.execution_calls.append(params)
+        return {"result": {"list": [], "nextPageCursor": ""}}
+
+    def get_closed_pnl(self, **params):
+        self.entered.set()
+        self.gate.wait(5)
+        return {"result": {"list": list(self.records), "nextPageCursor": ""}}
+
+
+def test_first_sync_reads_a_week_of_executions():
+    http = StubHttp()
+    store = TradeStore(http, "BTCUSDT")
+    store.sync()
+    params = http.execution_calls[0]
+    assert params["endTime"] - params["startTime"] == FIRST_SYNC_MS
+
+
+def test_reset_does_not_wait_for_sync_and_discards_its_result():
+    now = int(time.time() * 1000)
+    http = StubHttp([{"orderId": "old", "closedPnl": "7", "updatedTime": str(now)}])
+    store = TradeStore(http, "BTCUSDT")
+    store.reset_pnl(now - 1000)
+    http.gate.clear()
+    worker = threading.Thread(target=store.sync)
+    worker.start()
+    assert http.entered.wait(5)
+
+    # sync висит на REST, а сброс проходит сразу
+    done = threading.Thread(target=store.reset_pnl, args=(now + 1000,))
+    done.start()
+    done.join(1)
+    assert not done.is_alive()
+
+    http.gate.set()
+    worker.join(5)
+    # выборка под старый since не попадает в новую статистику
+    assert store.trade_statistics()["total_trades"] == 0
+    assert store.pnl_cursor == now + 1000
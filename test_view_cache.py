@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+from trading_bot.view_cache import ViewCache
+
+
+class Loader:
+    def __init__(self, fail_first=False):
+        self.calls = 0
+        self.fail_first = fail_first
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, value):
+        self.calls += 1
+        self.release.wait(5)
+        if self.fail_first and self.calls == 1:
+            raise RuntimeError("exchange down")
+        return f"{value}-{self.calls}"
+
+
+def test_value_is_cached_until_ttl_expires(monkeypatch):
+    cache, loader = ViewCache(ttl=5.0), Loader()
+    clock = [1000.0]
+    monkeypatch.setattr("trading_bot.view_cache.time.monotonic", lambda: clock[0])
+
+    async def main():
+        first = await cache.get("balance", loader, "b")
+        clock[0] += 4.9
+        cached = await cache.get("balance", loader, "b")
+        clock[0] += 0.2          # ttl истёк
+        fresh = await cache.get("balance", loader, "b")
+        return first, cached, fresh
+
+    assert asyncio.run(main()) == ("b-1", "b-1", "b-2")
+    assert cache.stats()["hits"] == 1 and cache.stats()["fetches"] == 2
+
+
+def test_concurrent_callers_share_one_load():
+    cache, loader = ViewCache(), Loader()
+    loader.release.clear()
+
+    async def main():
+        tasks = [asyncio.create_task(cache.get("stats", loader, "s")) for _ in range(5)]
+        while not cache.stats()["in_flight"] or cache.joined < 4:
+            await asyncio.sleep(0.01)
+        loader.release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(main()) == ["s-1"] * 5
+    assert loader.calls == 1
+    assert cache.stats() == {"hits": 0, "joined": 4, "fetches": 1,
+                             "cached": 1, "in_flight": 0}
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    cache, loader = ViewCache(), Loader(fail_first=True)
+    loader.release.clear()
+
+    async def main():
+        tasks = [asyncio.create_task(cache.get("positions", loader, "p")) for _ in range(3)]
+        while cache.joined < 2:
+            await asyncio.sleep(0.01)
+        loader.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.stats()["cached"] == 0 and cache.stats()["in_flight"] == 0
+        # следующий запрос идёт на биржу заново, а не получает старую ошибку
+        return await cache.get("positions", loader, "p")
+
+    assert asyncio.run(main()) == "p-2"
+
+
+def test_invalidate_forces_reload():
+    cache, loader = ViewCache(), Loader()
+
+    async def main():
+        await cache.get("a", loader, "a")
+        await cache.get("b", loader, "b")
+        cache.invalidate("a")
+        assert await cache.get("b", loader, "b") == "b-2"
+        cache.invalidate()
+        return await cache.get("a", loader, "a"), await cache.get("b", loader, "b")
+
+    assert asyncio.run(main()) == ("a-3", "b-4")
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+
+from trading_bot.ws_bridge import WsEventBridge
+
+
+class Recorder:
+    def __init__(self, fail_on=None):
+        self.messages = []
+        self.threads = set()
+        self.fail_on = fail_on
+
+    def __call__(self, message):
+        self.threads.add(threading.current_thread().name)
+        if message == self.fail_on:
+            raise ValueError("bad message")
+        self.messages.append(message)
+
+
+async def drain(bridge, count, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while bridge.processed + (bridge.handler.fail_on is not None) < count:
+        assert asyncio.get_running_loop().time() < deadline, bridge.stats()
+        await asyncio.sleep(0.01)
+
+
+def test_pending_events_are_replayed_first_in_order():
+    recorder = Recorder()
+    bridge = WsEventBridge(recorder)
+    for i in range(3):
+        bridge.submit(i)
+    assert bridge.stats()["queued"] == 3
+
+    async def main():
+        bridge.start(asyncio.get_running_loop())
+        for i in range(3, 6):
+            bridge.submit(i)
+        await drain(bridge, 6)
+        bridge.stop()
+
+    asyncio.run(main())
+    assert recorder.messages == list(range(6))
+
+
+def test_handler_runs_on_order_state_thread_and_survives_errors():
+    recorder = Recorder(fail_on="bad")
+    bridge = WsEventBridge(recorder)
+
+    async def main():
+        bridge.start(asyncio.get_running_loop())
+        for message in ("a", "bad", "b"):
+            bridge.submit(message)
+        await drain(bridge, 3)
+        bridge.stop()
+
+    asyncio.run(main())
+    assert recorder.messages == ["a", "b"]
+    assert {name.split("_")[0] for name in recorder.threads} == {"order-state"}
+
+
+def test_submit_from_ws_thread_during_start_loses_nothing():
+    recorder = Recorder()
+    bridge = WsEventBridge(recorder)
+    total = 5000
+    started = threading.Event()
+
+    def ws_thread():
+        started.set()
+        for i in range(total):
+            bridge.submit(i)
+
+    async def main():
+        producer = threading.Thread(target=ws_thread)
+        producer.start()
+        started.wait()
+        bridge.start(asyncio.get_running_loop())
+        await asyncio.get_running_loop().run_in_executor(None, producer.join)
+        await drain(bridge, total)
+        bridge.stop()
+
+    asyncio.run(main())
+    assert recorder.messages == list(range(total))
+
+
+def test_run_serial_and_call_serial_share_the_order_thread():
+    bridge = WsEventBridge(Recorder())
+
+    async def main():
+        bridge.start(asyncio.get_running_loop())
+        name = await bridge.run_serial(lambda: threading.current_thread().name)
+        # из order-state call_serial выполняется сразу, а не ждёт сам себя
+        nested = await bridge.run_serial(
+            bridge.call_serial, lambda: threading.current_thread().name)
+        bridge.stop()
+        return name, nested
+
+    name, nested = asyncio.run(main())
+    assert name.startswith("order-state") and nested == name
+    assert bridge.call_serial(lambda: threading.current_thread().name) == name
+
+
+def test_event_arriving_while_start_builds_queue_is_kept(monkeypatch):
+    recorder = Recorder()
+    bridge = WsEventBridge(recorder)
+    real_queue = asyncio.Queue
+
+    def queue_with_event_in_window():
+        # WS-событие приходит, пока start() ещё создаёт очередь
+        bridge.submit("early")
+        return real_queue()
+
+    async def main():
+        monkeypatch.setattr("trading_bot.ws_bridge.asyncio.Queue", queue_with_event_in_window)
+        bridge.start(asyncio.get_running_loop())
+        monkeypatch.undo()
+        bridge.submit("late")
+        await drain(bridge, 2)
+        bridge.stop()
+
+    asyncio.run(main())
+    assert recorder.messages == ["early", "late"]
+
+
+def test_expect_order_is_matched_on_the_ws_thread():
+    bridge = WsEventBridge(Recorder())
+    wait = bridge.expect_order("tb-BTCUSDT-1-entry")
+    bridge.submit({"topic": "order", "data": [
+        {"orderLinkId": "tb-BTCUSDT-1-entry", "orderStatus": "New"},
+        {"orderLinkId": "other", "orderStatus": "Filled"}]})
+    assert wait.wait(0) is None
+    bridge.submit({"topic": "order", "data": [
+        {"orderLinkId": "tb-BTCUSDT-1-entry", "orderStatus": "Filled", "avgPrice": "100"}]})
+    # мост ещё не запущен, а ожидание уже получило пуш; само событие в буфере
+    assert wait.wait(0)["avgPrice"] == "100"
+    assert bridge.stats()["queued"] == 2
+    bridge.forget_order("tb-BTCUSDT-1-entry")
+    assert not bridge._order_waits
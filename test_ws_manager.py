@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+from trading_bot import ws_manager
+from trading_bot.latency_monitor import LatencyMonitor
+from trading_bot.ws_manager import PublicWsManager, extract_topic
+
+
+class FakeConnection:
+    """PublicConnection без сети: только набор топиков."""
+
+    def __init__(self, name, url, on_message, on_alert=None):
+        self.name = name
+        self.topics = set()
+        self.closed = False
+        self.monitor = LatencyMonitor(name)
+
+    async def subscribe(self, topics):
+        self.topics.update(topics)
+
+    async def unsubscribe(self, topics):
+        self.topics.difference_update(topics)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(ws_manager, "PublicConnection", FakeConnection)
+    return PublicWsManager(url="ws://test", max_topics_per_connection=2, max_connections=2)
+
+
+def kline_frame(topic, confirm=True):
+    return json.dumps({"topic": topic, "ts": 1, "data": [{
+        "start": 0, "interval": "5", "open": "1", "high": "1", "low": "1",
+        "close": "1", "volume": "1", "confirm": confirm}]}, separators=(",", ":"))
+
+
+def test_extract_topic():
+    assert extract_topic('{"topic":"kline.5.BTCUSDT","data":[]}') == "kline.5.BTCUSDT"
+    assert extract_topic(b'{"topic": "tickers.ETHUSDT"}') == "tickers.ETHUSDT"
+    assert extract_topic('{"op":"pong"}') is None
+
+
+def test_topics_pooled_within_connection_limit(manager):
+    async def scenario():
+        await manager.subscribe_many([f"kline.5.S{i}" for i in range(3)], lambda t, p: None)
+        await manager.subscribe("kline.5.S0", lambda t, p: None)   # уже подписан
+        with pytest.raises(RuntimeError):
+            await manager.subscribe_many(["kline.5.S3", "kline.5.S4"], lambda t, p: None)
+    asyncio.run(scenario())
+    assert [len(c.topics) for c in manager.connections] == [2, 2]
+
+
+def test_empty_connection_is_closed_on_unsubscribe(manager):
+    async def scenario():
+        await manager.subscribe_many(["a.1", "a.2", "b.1"], lambda t, p: None)
+        last = manager.connections[-1]
+        await manager.unsubscribe("b.1")
+        return last
+    last = asyncio.run(scenario())
+    assert last.closed
+    assert len(manager.connections) == 1
+    assert "b.1" not in manager.handlers
+
+
+def test_route_by_topic_and_closed_only(manager):
+    received = []
+    conn = FakeConnection("c", "", None)
+
+    async def scenario():
+        await manager.subscribe("kline.5.BTCUSDT", lambda t, p: received.append((t, p)))
+        await manager.subscribe("kline.5.ETHUSDT", lambda t, p: received.append((t, p)),
+                                closed_only=False)
+    asyncio.run(scenario())
+
+    manager._route(kline_frame("kline.5.BTCUSDT", confirm=False), conn, 10.0)
+    manager._route(kline_frame("kline.5.ETHUSDT", confirm=False), conn, 10.0)
+    manager._route(kline_frame("kline.5.BTCUSDT"), conn, 11.0)
+    manager._route(kline_frame("kline.5.XRPUSDT"), conn, 11.0)
+
+    assert [(t, p[0]["confirm"]) for t, p in received] == [
+        ("kline.5.ETHUSDT", False), ("kline.5.BTCUSDT", True)]
+    assert received[-1][1][0]["received_at"] == 11.0
+    assert manager.unrouted == 1
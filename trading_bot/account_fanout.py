@@ -0,0 +1,145 @@
+# account_fanout.py
+import asyncio
+import logging
+import time
+
+from .bybit_client import BybitClient
+from .paper_client import PaperClient
+from .position_manager import PositionManager
+from .position_journal import PositionJournal
+
+
+class AccountFanout:
+    """
+    Один сигнал — на все аккаунты сразу. У каждого аккаунта свой
+    BybitClient (своя HTTP-сессия с keep-alive, свой приватный WS, свой
+    бюджет запросов) и свой PositionManager (позиции, журнал, зеркало
+    аккаунта, поток order-state). Вход на каждом аккаунте идёт в его
+    собственном потоке order-state, поэтому execute() ждёт самый медленный
+    аккаунт, а не сумму: задержка веера ≈ задержке одного входа.
+
+    Размер: notional · size аккаунта; при size = 0 — пропорционально
+    эквити аккаунта к эквити основного (из зеркал AccountState, без REST).
+
+    paper=True (PAPER_TRADING): суб-аккаунты тоже бумажные — PaperClient
+    со своим журналом позиций, ключи не нужны и не используются.
+    """
+
+    def __init__(self, primary: PositionManager, accounts: list[dict] | None = None,
+                 paper: bool = False):
+        self.primary = primary
+        self.accounts = []   # {"name", "manager", "size"}
+        for spec in accounts or []:
+            name = spec["name"]
+            if paper:
+                client = PaperClient(name)
+                journal = PositionJournal(f"positions_paper_{name}.log")
+            elif not spec.get("api_key") or not spec.get("api_secret"):
+                logging.error(f"Суб-аккаунт {name}: нет ключей, пропущен")
+                continue
+            else:
+                client = BybitClient(spec["api_key"], spec["api_secret"], name=name)
+                journal = PositionJournal(f"positions_{name}.log")
+            manager = PositionManager(journal=journal, client=client)
+            self.accounts.append(
+                {"name": name, "manager": manager, "size": spec.get("size", 0)})
+        self.last_fanout: dict | None = None
+
+    def managers(self) -> list[PositionManager]:
+        return [self.primary] + [a["manager"] for a in self.accounts]
+
+    async def start(self) -> None:
+        """Мосты, зеркала и сверка с биржей суб-аккаунтов — параллельно."""
+        loop = asyncio.get_running_loop()
+        for account in self.accounts:
+            manager = account["manager"]
+            manager.bridge.start(loop)
+            manager.account_state.start(manager.bridge)
+        results = await asyncio.gather(
+            *(a["manager"].bridge.run_serial(a["manager"].recover) for a in self.accounts),
+            return_exceptions=True)
+        for account, result in zip(self.accounts, results):
+            if isinstance(result, Exception):
+                logging.error(f"Сверка суб-аккаунта {account['name']}: {result}")
+
+    def notional_for(self, account: dict, notional: float) -> float:
+        if account["size"]:
+            return notional * account["size"]
+        equity = account["manager"].account_state.equity
+        primary_equity = self.primary.account_state.equity
+        if not equity or not primary_equity:
+            return notional
+        return notional * equity / primary_equity
+
+    async def execute(self, symbol: str, signal: dict, leverage, position_notional) -> dict:
+        """Вход на всех аккаунтах одновременно; возвращает name -> position | None."""
+        started = time.perf_counter()
+        timings = {}
+
+        async def submit(name, manager, notional):
+            t0 = time.perf_counter()
+            try:
+                return await manager.bridge.run_serial(
+                    manager.open_position, signal, leverage=leverage,
+                    position_notional=notional, symbol=symbol)
+            finally:
+                timings[name] = round((time.perf_counter() - t0) * 1000)
+
+        jobs = [("main", self.primary, position_notional)] + [
+            (a["name"], a["manager"], self.notional_for(a, position_notional))
+            for a in self.accounts]
+        results = await asyncio.gather(*(submit(*job) for job in jobs),
+                                       return_exceptions=True)
+        outcome = {}
+        for (name, _, _), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logging.error(f"Вход на аккаунте {name} не удался: {result}")
+                result = None
+            outcome[name] = result
+        total = round((time.perf_counter() - started) * 1000)
+        self.last_fanout = {"total_ms": total, "accounts_ms": timings}
+        if self.accounts:
+            logging.info(f"Веер {symbol}: {total} мс, по аккаунтам {timings}")
+        return outcome
+
+    def has_positions(self) -> bool:
+        return any(m.active_positions for m in self.managers())
+
+    async def close(self) -> dict:
+        """
+        Ручное закрытие на всех аккаунтах одновременно, каждое — в потоке
+        order-state своего аккаунта; name -> закрытая позиция | None.
+        Аккаунты без открытых позиций пропускаются.
+        """
+        jobs = [(name, manager) for name, manager in self._named_managers()
+                if manager.active_positions]
+        results = await asyncio.gather(
+            *(m.bridge.run_serial(m.market_close_active_position) for _, m in jobs),
+            return_exceptions=True)
+        outcome = {}
+        for (name, _), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logging.error(f"Закрытие на аккаунте {name} не удалось: {result}")
+                result = None
+            outcome[name] = result
+        return outcome
+
+    def _named_managers(self) -> list[tuple[str, PositionManager]]:
+        return [("main", self.primary)] + [(a["name"], a["manager"]) for a in self.accounts]
+
+    def on_price(self, symbol: str, price: float) -> None:
+        for manager in self.managers():
+            manager.on_price(symbol, price)
+
+    def prewarm(self, symbol: str, leverage) -> None:
+        """Контексты входа всех аккаунтов — в io-потоках, не в пути ордера."""
+        for manager in self.managers():
+            manager.bridge.run_blocking(manager.prewarm, symbol, leverage)
+
+    def stats(self) -> dict:
+        return {
+            "accounts": [a["name"] for a in self.accounts],
+            "budgets": {a["name"]: a["manager"].client.order_budget.stats()
+                        for a in self.accounts},
+            "last_fanout": self.last_fanout,
+        }
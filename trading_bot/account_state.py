@@ -0,0 +1,232 @@
+# account_state.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+RECONCILE_INTERVAL = 60   # секунд между сверками с REST
+FILLS_LIMIT = 500         # сколько ордеров держим в агрегате исполнений
+
+
+class AccountState:
+    """
+    Локальное зеркало аккаунта по приватным топикам position / execution /
+    wallet. Позиции, эквити и исполнения читаются из памяти; периодическая
+    сверка через REST исправляет расхождения (пропущенные пуши, реконнект).
+
+    Записи меняются только в потоке order-state (через WsEventBridge),
+    читатели получают уже готовые словари — каждый апдейт заменяет запись
+    целиком, поэтому частично обновлённых данных читатель не увидит.
+    """
+
+    def __init__(self, http_client, account_type: str = "UNIFIED"):
+        self.http_client = http_client
+        self.account_type = account_type
+        self.positions: dict[str, dict] = {}
+        self.equity: float | None = None
+        self.available_balance: float | None = None
+        self.wallet_updated_at = 0.0
+        self.fills: OrderedDict[str, dict] = OrderedDict()
+        self.synced = False
+        self.last_reconcile = 0.0
+        self._reconcile_task: asyncio.Task | None = None
+        self._bridge = None
+        self.close_listeners: list = []   # func(symbol), вызываются в io-потоке
+
+    # ---------- обновления из WebSocket ----------
+
+    def apply_ws_message(self, message: dict) -> None:
+        topic = message.get("topic")
+        data = message.get("data", [])
+        if topic == "position":
+            for p in data:
+                self._apply_position(p)
+        elif topic == "wallet":
+            for w in data:
+                if w.get("accountType", self.account_type) == self.account_type:
+                    self._apply_wallet(w)
+        elif topic == "execution":
+            for e in data:
+                self._apply_execution(e)
+
+    def _apply_position(self, p: dict) -> None:
+        symbol = p.get("symbol")
+        if not symbol:
+            return
+        updated = int(p.get("updatedTime") or 0)
+        current = self.positions.get(symbol)
+        if current and updated and updated < current["updated_time"]:
+            return  # устаревший пуш после реконнекта
+        if current and current["size"] and not _to_float(p.get("size")):
+            self._on_position_closed(symbol)
+        self.positions[symbol] = {
+            "symbol": symbol,
+            "side": p.get("side", ""),
+            "size": _to_float(p.get("size")),
+            "avg_price": _to_float(p.get("avgPrice") or p.get("entryPrice")),
+            "leverage": _to_float(p.get("leverage")),
+            "unrealised_pnl": _to_float(p.get("unrealisedPnl")),
+            "mark_price": _to_float(p.get("markPrice")),
+            "updated_time": updated,
+        }
+
+    def _apply_wallet(self, w: dict) -> None:
+        if w.get("totalEquity") not in (None, ""):
+            self.equity = float(w["totalEquity"])
+        if w.get("totalAvailableBalance") not in (None, ""):
+            self.available_balance = float(w["totalAvailableBalance"])
+        self.wallet_updated_at = time.time()
+
+    def _on_position_closed(self, symbol: str) -> None:
+        # после закрытой сделки эквити меняется: не ждём ни wallet-пуша,
+        # ни плановой сверки, а сразу подтягиваем кошелёк в фоне
+        if self._bridge is not None:
+            self._bridge.run_blocking(self.refresh_wallet)
+            for listener in self.close_listeners:
+                self._bridge.run_blocking(listener, symbol)
+
+    def _apply_execution(self, e: dict) -> None:
+        order_id = e.get("orderId")
+        if not order_id or e.get("execType", "Trade") != "Trade":
+            return
+        qty = _to_float(e.get("execQty"))
+        price = _to_float(e.get("execPrice"))
+        prev = self.fills.get(order_id) or {
+            "symbol": e.get("symbol"), "side": e.get("side"),
+            "qty": 0.0, "value": 0.0, "fee": 0.0, "first_time": None,
+            "exec_ids": set()}
+        exec_id = e.get("execId")
+        if exec_id and exec_id in prev["exec_ids"]:
+            return
+        exec_time = int(e.get("execTime") or 0)
+        self.fills[order_id] = {
+            **prev,
+            "qty": prev["qty"] + qty,
+            "value": prev["value"] + qty * price,
+            "fee": prev["fee"] + _to_float(e.get("execFee")),
+            "first_time": prev["first_time"] or exec_time,
+            "last_time": exec_time,
+            "exec_ids": prev["exec_ids"] | ({exec_id} if exec_id else set()),
+        }
+        self.fills.move_to_end(order_id)
+        while len(self.fills) > FILLS_LIMIT:
+            self.fills.popitem(last=False)
+
+    # ---------- чтение ----------
+
+    def get_position(self, symbol: str) -> dict | None:
+        return self.positions.get(symbol)
+
+    def position_size(self, symbol: str) -> float | None:
+        pos = self.positions.get(symbol)
+        if pos is None:
+            return 0.0 if self.synced else None
+        return pos["size"]
+
+    def leverage(self, symbol: str) -> float | None:
+        pos = self.positions.get(symbol)
+        return pos["leverage"] if pos else None
+
+    def avg_fill_price(self, order_id: str) -> float | None:
+        fill = self.fills.get(order_id)
+        if not fill or not fill["qty"]:
+            return None
+        return fill["value"] / fill["qty"]
+
+    # ---------- сверка с REST ----------
+
+    def equity_below(self, threshold: float) -> bool:
+        """O(1)-проверка для авто-стопа; до первых данных не срабатывает."""
+        return self.equity is not None and self.equity <= threshold
+
+    def fetch_snapshot(self, symbols: list[str] | None = None) -> dict:
+        """Блокирующий REST-запрос: позиции и кошелёк."""
+        started = time.time()
+        if symbols:
+            positions = []
+            for symbol in symbols:
+                resp = self.http_client.get_positions(
+                    category="linear", symbol=symbol)
+                positions += resp.get("result", {}).get("list", [])
+        else:
+            resp = self.http_client.get_positions(
+                category="linear", settleCoin="USDT")
+            positions = resp.get("result", {}).get("list", [])
+        return {
+            "started": started,
+            "positions": positions,
+            "wallet": self.fetch_wallet(),
+        }
+
+    def fetch_wallet(self) -> list:
+        wallet = self.http_client.get_wallet_balance(
+            accountType=self.account_type)
+        return wallet.get("result", {}).get("list", [])
+
+    def refresh_wallet(self) -> None:
+        """
+        Блокирующее обновление кошелька; применяется в потоке order-state.
+        До start() моста ещё нет и WS-события не применяются — пишем сразу.
+        """
+        started = time.time()
+        wallet = self.fetch_wallet()
+        if self._bridge is None:
+            self._apply_wallet_snapshot(started, wallet)
+            return
+        self._bridge.order_executor.submit(
+            self._apply_wallet_snapshot, started, wallet)
+
+    def apply_snapshot(self, snapshot: dict) -> None:
+        seen = set()
+        for p in snapshot["positions"]:
+            seen.add(p.get("symbol"))
+            before = self.positions.get(p.get("symbol"))
+            self._apply_position(p)
+            after = self.positions.get(p.get("symbol"))
+            if before and after is not before and before["size"] != after["size"]:
+                logging.warning(
+                    f"AccountState: расхождение по {p.get('symbol')}: "
+                    f"{before['size']} -> {after['size']}")
+        # позиции, которых REST уже не видит, закрыты — как закрытие из WS
+        for symbol, pos in list(self.positions.items()):
+            if symbol not in seen and pos["size"] and \
+                    pos["updated_time"] < snapshot["started"] * 1000:
+                self._on_position_closed(symbol)
+                self.positions[symbol] = {**pos, "size": 0.0, "side": ""}
+        self._apply_wallet_snapshot(snapshot["started"], snapshot["wallet"])
+        self.synced = True
+        self.last_reconcile = time.time()
+
+    def _apply_wallet_snapshot(self, started: float, wallet: list) -> None:
+        # кошелёк не перетираем, если WS-пуш пришёл уже после запроса
+        if wallet and self.wallet_updated_at < started:
+            self._apply_wallet(wallet[0])
+
+    def reconcile(self, symbols: list[str] | None = None) -> None:
+        """Синхронная сверка — для вызова из потока order-state."""
+        self.apply_snapshot(self.fetch_snapshot(symbols))
+
+    def start(self, bridge, interval: float = RECONCILE_INTERVAL) -> None:
+        if self._reconcile_task and not self._reconcile_task.done():
+            return
+        self._bridge = bridge
+        self._reconcile_task = asyncio.get_running_loop().create_task(
+            self._reconcile_loop(bridge, interval))
+
+    async def _reconcile_loop(self, bridge, interval: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                snapshot = await loop.run_in_executor(
+                    bridge.io_executor, self.fetch_snapshot)
+                await bridge.run_serial(self.apply_snapshot, snapshot)
+            except Exception as e:
+                logging.error(f"AccountState: ошибка сверки с REST: {e}")
+            await asyncio.sleep(interval)
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
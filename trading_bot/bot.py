@@ -1,6 +1,7 @@
 import logging
 import asyncio
 import datetime
+import time
 import requests
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import (
@@ -11,16 +12,28 @@ from telegram.ext import (
     filters,
     ContextTypes
 )
-from .config import TELEGRAM_BOT_TOKEN, TRADING_CONFIG
+from .config import TELEGRAM_BOT_TOKEN, TRADING_CONFIG, PAPER_TRADING, PAPER_VARIANTS
+from .config import SUB_ACCOUNTS
 from . import config
-from . import subscribe
 from .market_analyzer import MarketAnalyzer
+from .ws_manager import PublicWsManager
+from .candle_sequencer import CandleSequencer
+from .pipeline import SignalPipeline
+from .trade_context import REFRESH_INTERVAL
+from .stop_engine import StopEngine
+from .pnl_aggregate import PnlAggregate, PNL_STATE_FILE
+from .closed_pnl import sync_closed_pnl
+from .view_cache import ViewCache
+from .chart import ChartService, position_markers
 from .bybit_client import BybitClient
 from . import data_storage
 from .position_manager import PositionManager
+from .position_journal import PositionJournal
+from .paper_client import PaperClient
+from .account_fanout import AccountFanout
 from .trading_state import TradingState
-from .config import BYBIT_API_KEY, BYBIT_API_SECRET
-from pybit.unified_trading import HTTP
+from .utils import send_telegram_message
+from .config import BYBIT_REST_URL
 import os
 from dotenv import load_dotenv
 
@@ -39,6 +52,7 @@ POSITION_NOTIONAL = 1  # по умолчанию
 MIN_BALANCE = None
 AUTO_STOP_ENABLED = False
 TRADE_HISTORY = []
+TRADE_STORE_REFRESH = 30  # сек.: старше — отчёт догружает исполнения в фоне
 
 # переменная, чтобы "ловить" ввод пользователя
 AWAITING_SIZE_INPUT = False
@@ -49,55 +63,95 @@ logging.basicConfig(
     level=logging.INFO
 )
 
-HTTP_CLIENT = HTTP(
-    testnet=False,                    # или True для тестнета
-    api_key=BYBIT_API_KEY,
-    api_secret=BYBIT_API_SECRET
-)
-
-# Инициализация клиента Bybit
-bybit_client = BybitClient()
-position_manager = PositionManager()
+# Бумажный основной счёт: свой журнал позиций и состояние PnL, чтобы
+# сверка с пустой локальной биржей не тронула записи живого счёта
+PAPER_POSITIONS_LOG = "positions_paper.log"
+PAPER_PNL_STATE = "pnl_state_paper.json"
+
+# Основной счёт: живой BybitClient или PaperClient. Отчёты, баланс,
+# свечи и цены читаются через его HTTP-клиент, поэтому в бумажном режиме
+# ключи не нужны и настоящий счёт не трогается.
+if PAPER_TRADING:
+    position_manager = PositionManager(
+        journal=PositionJournal(PAPER_POSITIONS_LOG), client=PaperClient("paper"))
+else:
+    position_manager = PositionManager(client=BybitClient())
+bybit_client = position_manager.client
+HTTP_CLIENT = bybit_client.http_client
+# сигнал исполняется на основном аккаунте и всех суб-аккаунтах одновременно
+fanout = AccountFanout(position_manager, SUB_ACCOUNTS, paper=PAPER_TRADING)
+# Один пул публичных WS на процесс: топики всех символов/интервалов
+ws_manager = PublicWsManager(on_alert=send_telegram_message)
+# Анализаторы по символам, которыми сейчас торгуем
+ANALYZERS: dict[str, MarketAnalyzer] = {}
+# Чтения с биржи для экранов: свой пул потоков, TTL-кэш и single-flight
+views = ViewCache()
+# Отрисовка /chart в пуле процессов с кэшем PNG
+charts = ChartService()
+CHART_CANDLES = 500
+# PnL с начала месяца: догружается при закрытии сделок, меню читает из памяти
+pnl_aggregate = PnlAggregate(
+    HTTP_CLIENT, path=PAPER_PNL_STATE if PAPER_TRADING else PNL_STATE_FILE)
 trading_state = TradingState(
-    api_key=BYBIT_API_KEY, api_secret=BYBIT_API_SECRET, symbol=SELECTED_SYMBOL)
+    HTTP_CLIENT, symbol=SELECTED_SYMBOL, account_state=position_manager.account_state)
 
 
-def check_authorized(user_id: int) -> bool:
-    return user_id in AUTHORIZED_USERS
+def sync_after_close(symbol: str) -> None:
+    """
+    После закрытия сделки: одна выборка closed-pnl и для PnL за месяц, и
+    для кэша отчётов, затем новые исполнения. В io-потоке.
+    """
+    store = trading_state.trade_store(symbol)
+    sync_closed_pnl(HTTP_CLIENT, symbol, [pnl_aggregate, store])
+    store.sync_executions()
+
+
+position_manager.account_state.close_listeners.append(sync_after_close)
+
+
+PAPER_CLIENT_OPTIONS = ("balance", "latency_ms", "jitter_ms", "taker_fee", "maker_fee")
+
+
+def variant_config(spec: dict) -> dict:
+    return {**TRADING_CONFIG, **spec.get("overrides", {})}
 
 
-def get_monthly_metrics(symbol: str) -> tuple[float, int]:
+def make_paper_manager(spec: dict) -> PositionManager:
     """
-    PnL и кол‑во закрытых сделок c 00:00 UTC 1‑го числа
-    до текущего момента. Разбиваем период на интервалы ≤ 7 суток.
+    Бумажный счёт варианта стратегии: свой PaperClient, позиции и стопы.
+    Строится один раз на процесс, как fanout: мост, пулы и локальная биржа
+    переживают остановку торговли; анализатор пересоздаётся при каждом старте.
     """
-    now = datetime.datetime.utcnow()
-    start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    total_pnl = 0.0
-    total_trades = 0
+    name = spec["name"]
+    client = PaperClient(name, **{k: spec[k] for k in PAPER_CLIENT_OPTIONS if k in spec})
+    manager = PositionManager(
+        journal=PositionJournal(f"positions_{name}.log"), client=client)
+    manager.stops = StopEngine(
+        manager, variant_config(spec),
+        atr_for=lambda s: PAPER_ANALYZERS[name].atr_indicator.last_atr
+        if name in PAPER_ANALYZERS else None)
+    return manager
 
-    chunk_start = start
-    seven_days = datetime.timedelta(days=7)
 
-    while chunk_start < now:
-        chunk_end = min(chunk_start + seven_days, now)
+# Бумажные варианты: счета — на процесс, анализаторы — на запуск торговли
+PAPER_MANAGERS: dict[str, PositionManager] = {
+    spec["name"]: make_paper_manager(spec) for spec in PAPER_VARIANTS}
+PAPER_ANALYZERS: dict[str, MarketAnalyzer] = {}
 
-        resp = HTTP_CLIENT.get_closed_pnl(
-            category="linear",
-            symbol=symbol,
-            startTime=int(chunk_start.timestamp() * 1000),
-            endTime=int(chunk_end.timestamp() * 1000),
-            limit=1000
-        )
 
-        rows = resp.get("result", {}).get("list", [])
-        total_pnl += sum(float(r["closedPnl"]) for r in rows)
-        total_trades += len(rows)
+def check_authorized(user_id: int) -> bool:
+    return user_id in AUTHORIZED_USERS
 
-        chunk_start = chunk_end + datetime.timedelta(milliseconds=1)
 
-    return total_pnl, total_trades
+async def get_monthly_metrics(symbol: str) -> tuple[float, int]:
+    """
+    PnL и кол‑во закрытых сделок c 00:00 UTC 1‑го числа
+    до текущего момента. Берётся из PnlAggregate; REST нужен только
+    при первом обращении к символу (и то лишь за новые записи).
+    """
+    if not pnl_aggregate.is_synced(symbol):
+        await views.get(("pnl_sync", symbol), pnl_aggregate.sync, symbol)
+    return pnl_aggregate.month_to_date(symbol)
 
 
 def get_server_time() -> int:
@@ -105,16 +159,20 @@ def get_server_time() -> int:
     Получаем серверное время Bybit (в мс).
     Возвращаем как int, чтобы потом использовать в запросах.
     """
-    r = requests.get("https://api.bybit.com/v5/market/time")
+    r = requests.get(f"{BYBIT_REST_URL}/v5/market/time")
     server_ts = r.json()["time"]
     return int(server_ts)
 
 
 def get_balance() -> float:
     """Получение баланса с единого торгового аккаунта."""
+    # локальное зеркало (wallet-топик + сверка), REST — только до синхронизации
+    equity = position_manager.account_state.equity
+    if equity is not None:
+        return equity
     try:
 
-        balance_info = bybit_client.get_unified_wallet_balance()
+        balance_info = position_manager.client.get_unified_wallet_balance()
 
         if balance_info.get("retCode") == 0:
             return float(balance_info["result"]["list"][0]["totalEquity"])
@@ -153,83 +211,152 @@ async def trading_loop():
     global TRADING_ACTIVE, MIN_BALANCE, AUTO_STOP_ENABLED, position_manager
 
     # 1) Настройка символа и анализатора
-    config.SYMBOL = SELECTED_SYMBOL
-    subscribe.SYMBOL = SELECTED_SYMBOL
-    subscribe.analyzer = MarketAnalyzer(
+    symbol = SELECTED_SYMBOL
+    interval = "5"
+    config.SYMBOL = symbol
+    analyzer = MarketAnalyzer(
         TRADING_CONFIG,
         position_manager=position_manager
     )
-    position_manager = subscribe.analyzer.position_manager
+    ANALYZERS[symbol] = analyzer
+    position_manager = analyzer.position_manager
+    # стопы ведутся по ценам из потока свечей, ATR — из анализатора символа
+    if position_manager.stops is None:
+        position_manager.stops = StopEngine(
+            position_manager, TRADING_CONFIG,
+            atr_for=lambda s: ANALYZERS[s].atr_indicator.last_atr if s in ANALYZERS else None)
+    # события приватного WS обрабатываются на этом loop, а не в потоке pybit
+    position_manager.bridge.start(asyncio.get_running_loop())
+    position_manager.account_state.start(position_manager.bridge)
+    # позиции и SL/TP из журнала, сверенные с биржей, — до первой свечи,
+    # чтобы не открыть дубль уже открытой сделки
+    await position_manager.bridge.run_serial(position_manager.recover)
+    for manager in fanout.managers():
+        if manager.stops is None:
+            manager.stops = StopEngine(
+                manager, TRADING_CONFIG,
+                atr_for=lambda s: ANALYZERS[s].atr_indicator.last_atr if s in ANALYZERS else None)
+    await fanout.start()
 
     # 2) Очищаем файл CSV, чтобы сохранить новую историю
     data_storage.clear_candle_csv()
-    client = BybitClient()
+    client = position_manager.client
 
     # 3) Загружаем последние 100 свечей
     historical_candles = client.get_historical_kline(
-        symbol=SELECTED_SYMBOL,
+        symbol=symbol,
         limit=1200,
-        interval="5"
+        interval=interval
     )
     logging.info(
         f"Загружено {len(historical_candles)} свечей для инициализации.")
 
-    historical_candles.sort(key=lambda c: c["timestamp"])
-    for c in historical_candles:
+    # секвенсор отбрасывает ещё не закрытую свечу из истории и дальше
+    # следит, чтобы каждая свеча попала в анализатор ровно один раз
+    sequencer = CandleSequencer(symbol, interval, client.get_historical_kline)
+    for c in sequencer.prime(historical_candles):
         data_storage.save_candle_to_csv(c)
-        subscribe.analyzer.generate_signal(c)
-
-    # 5) Основной цикл: пока TRADING_ACTIVE = True, пытаемся подключиться к WebSocket
-    while TRADING_ACTIVE:
-        try:
-            async with subscribe.websockets.connect("wss://stream.bybit.com/v5/public/linear") as ws:
-                await subscribe.subscribe(ws)
-                # Запускаем heartbeat в фоне
-                heartbeat_task = asyncio.create_task(
-                    subscribe.send_heartbeat(ws))
-
-                # Цикл чтения свечей из WebSocket
-                while TRADING_ACTIVE:
-                    # Проверка авто-стопа по балансу
-                    if AUTO_STOP_ENABLED and MIN_BALANCE is not None:
-                        balance = get_balance()
-                        if balance <= MIN_BALANCE:
-                            logging.info(
-                                "Баланс ниже минимального, остановка торговли.")
-                            TRADING_ACTIVE = False
-                            break
-
-                    # Получаем следующую свечу
-                    raw_data = await ws.recv()
-                    data = subscribe.json.loads(raw_data)
-
-                    # Обрабатываем свечу, если это закрытая свеча (confirm=True)
-                    if data.get("data") and data["data"][0].get("confirm"):
-                        candle = data["data"][0]
-                        logging.info(f"Получена новая свеча: {candle}")
-
-                        # Сохраняем свечу в CSV
-                        data_storage.save_candle_to_csv(candle)
-
-                        # Генерируем сигнал
-                        signal = subscribe.analyzer.generate_signal(candle)
-                        if signal.get("direction"):
-                            logging.info(
-                                "Открытие позиции, т.к. сигнал сгенерирован.")
-                            position_manager.open_position(
-                                signal,
-                                leverage=LEVERAGE,
-                                position_notional=POSITION_NOTIONAL,
-                                symbol=SELECTED_SYMBOL
-                            )
-                        else:
-                            logging.info(
-                                "Позиция не открывается – сигнал отсутствует.")
-        except Exception as e:
-            logging.error(f"Ошибка в торговом цикле: {e}")
-            if 'heartbeat_task' in locals() and not heartbeat_task.cancelled():
-                heartbeat_task.cancel()
-            await asyncio.sleep(5)
+        analyzer.generate_signal(c)
+
+    # бумажные варианты стратегии: те же свечи, свои счета и позиции
+    variants = []
+    for spec in PAPER_VARIANTS:
+        v_manager = PAPER_MANAGERS[spec["name"]]
+        v_analyzer = MarketAnalyzer(variant_config(spec), position_manager=v_manager)
+        PAPER_ANALYZERS[spec["name"]] = v_analyzer
+        v_manager.bridge.start(asyncio.get_running_loop())
+        v_manager.account_state.start(v_manager.bridge)
+        await v_manager.bridge.run_serial(v_manager.recover)
+        v_sequencer = CandleSequencer(symbol, interval, client.get_historical_kline)
+        for c in v_sequencer.prime([dict(c) for c in historical_candles]):
+            v_analyzer.generate_signal(c)
+        variants.append((v_analyzer, v_sequencer))
+
+    # 4) Конвейер: чтение WS -> анализ по символу -> исполнение
+    def should_run() -> bool:
+        global TRADING_ACTIVE
+        # Проверка авто-стопа по балансу: эквити из зеркала аккаунта, без REST
+        if TRADING_ACTIVE and AUTO_STOP_ENABLED and MIN_BALANCE is not None:
+            if position_manager.account_state.equity_below(MIN_BALANCE):
+                logging.info("Баланс ниже минимального, остановка торговли.")
+                TRADING_ACTIVE = False
+        return TRADING_ACTIVE
+
+    async def execute(symbol, signal):
+        # все аккаунты параллельно, каждый в своём потоке order-state
+        await fanout.execute(symbol, signal, LEVERAGE, POSITION_NOTIONAL)
+
+    def prewarm(symbol, signal):
+        # предварительный сигнал: плечо выставляем заранее, не в пути ордера
+        fanout.prewarm(symbol, LEVERAGE)
+
+    provisional = TRADING_CONFIG.get('provisional_signals', False)
+    pipeline = SignalPipeline(
+        execute, should_run, prewarm=prewarm if provisional else None,
+        on_processed=ws_manager.record_processed)
+    analyze = pipeline.add_symbol(symbol, interval, analyzer, sequencer)
+
+    def paper_pipeline(v_analyzer, v_sequencer):
+        manager = v_analyzer.position_manager
+
+        async def v_execute(symbol, signal):
+            await manager.bridge.run_serial(
+                manager.open_position, signal, leverage=LEVERAGE,
+                position_notional=POSITION_NOTIONAL, symbol=symbol)
+
+        v_pipeline = SignalPipeline(
+            v_execute, lambda: TRADING_ACTIVE, save_candles=False)
+        return v_pipeline, manager, v_pipeline.add_symbol(
+            symbol, interval, v_analyzer, v_sequencer)
+
+    paper = [paper_pipeline(*v) for v in variants]
+
+    def on_candles(topic, candles):
+        analyze(topic, candles)
+        for _, _, v_analyze in paper:
+            # у каждого варианта свои копии свечей: анализатор их дополняет
+            v_analyze(topic, [dict(c) for c in candles])
+
+    def on_ticker(_topic, message):
+        # последняя цена — в контекст входа, стопы и бумажный матчинг;
+        # delta несёт только изменившиеся поля, lastPrice может не быть
+        price = message.get("data", {}).get("lastPrice")
+        if not price:
+            return
+        fanout.on_price(symbol, float(price))
+        for _, manager, _ in paper:
+            manager.on_price(symbol, float(price))
+
+    # формирующиеся свечи декодируем, только если их оценивает конвейер
+    topic = f"kline.{interval}.{symbol}"
+    ticker_topic = f"tickers.{symbol}"
+    await ws_manager.subscribe(topic, on_candles, closed_only=not provisional)
+    await ws_manager.subscribe(ticker_topic, on_ticker)
+
+    async def refresh_context():
+        # параметры инструмента, эквити и плечо держим тёплыми до сигнала
+        while True:
+            for manager in fanout.managers() + [m for _, m, _ in paper]:
+                manager.bridge.run_blocking(manager.prewarm, symbol, LEVERAGE)
+            await asyncio.sleep(REFRESH_INTERVAL)
+
+    # 5) Ждём, пока конвейер не остановится (стоп или авто-стоп)
+    pipeline.start()
+    for v_pipeline, _, _ in paper:
+        v_pipeline.start()
+    refresh_task = asyncio.create_task(refresh_context())
+    try:
+        await pipeline.stopped.wait()
+    finally:
+        refresh_task.cancel()
+        await ws_manager.unsubscribe(topic)
+        await ws_manager.unsubscribe(ticker_topic)
+        await pipeline.stop()
+        logging.info(f"Конвейер: {pipeline.stats()}")
+        logging.info(f"Аккаунты: {fanout.stats()}")
+        for v_pipeline, manager, _ in paper:
+            await v_pipeline.stop()
+            logging.info(f"Бумажный счёт: {manager.client.stats()}")
 
     logging.info("Торговля остановлена. Выходим из trading_loop.")
 
@@ -251,6 +378,41 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+async def chart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/chart [SYMBOL] [INTERVAL] — свечи, зоны и позиции картинкой."""
+    if not update.effective_user or not check_authorized(update.effective_user.id):
+        await update.message.reply_text("Нет прав доступа.")
+        return
+
+    args = context.args or []
+    symbol = args[0].upper() if args else SELECTED_SYMBOL
+    interval = args[1] if len(args) > 1 else "5"
+
+    candles = await views.get(
+        ("klines", symbol, interval), bybit_client.get_historical_kline,
+        symbol, CHART_CANDLES, interval)
+    if not candles:
+        await update.message.reply_text(f"❌ Нет свечей для {symbol}")
+        return
+
+    analyzer = ANALYZERS.get(symbol)
+    zones = {}
+    if analyzer is not None and interval == "5":
+        zones = {"support": analyzer.zone_builder.support_zones,
+                 "resistance": analyzer.zone_builder.resistance_zones}
+    markers = position_markers(
+        [*position_manager.active_positions.values(), *position_manager.closed_positions],
+        symbol)
+
+    try:
+        png = await charts.render(symbol, interval, candles, zones, markers)
+    except Exception as e:
+        logging.error(f"Ошибка отрисовки графика: {e}")
+        await update.message.reply_text("❌ Не удалось построить график")
+        return
+    await update.message.reply_photo(photo=png, caption=f"{symbol} {interval}m")
+
+
 async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     if not query or not check_authorized(query.from_user.id):
@@ -266,7 +428,7 @@ async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if data == "trade_menu":
         if TRADING_ACTIVE:
-            month_pnl, month_trades = get_monthly_metrics(SELECTED_SYMBOL)
+            month_pnl, month_trades = await get_monthly_metrics(SELECTED_SYMBOL)
 
             status = (
                 "🟢 Торговля активна\n"
@@ -297,7 +459,8 @@ async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     elif data == "toggle_tp_mode":
         new_mode = "single" if position_manager.tp_mode == "dual" else "dual"
-        position_manager.set_tp_mode(new_mode)
+        for manager in fanout.managers():
+            manager.set_tp_mode(new_mode)
         mode_text = "SL + TP" if new_mode == "single" else "SL + TP1 + TP2"
         await query.edit_message_text(f"Выбран режим: {mode_text}")
 
@@ -353,7 +516,7 @@ async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Меню настроек
     elif data == "settings_menu":
-        balance = get_balance()
+        balance = await views.get("balance", get_balance)
         min_bal_text = (
             f"Мин. баланс: {MIN_BALANCE}$" if AUTO_STOP_ENABLED and MIN_BALANCE is not None
             else "Мин. баланс: Выкл"
@@ -374,7 +537,7 @@ async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("Настройки:", reply_markup=InlineKeyboardMarkup(keyboard))
 
     elif data == "refresh_balance":
-        balance = get_balance()
+        balance = await views.get("balance", get_balance)
         await query.edit_message_text(f"Текущий баланс: {balance:.2f} USDT")
         keyboard = [[InlineKeyboardButton(
             "Назад", callback_data="settings_menu")]]
@@ -424,6 +587,8 @@ async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     elif data.startswith("leverage|"):
         LEVERAGE = int(data.split("|")[1])
+        # плечо на бирже меняем сразу, а не в момент входа
+        fanout.prewarm(SELECTED_SYMBOL, LEVERAGE)
         keyboard = [[InlineKeyboardButton(
             "Назад", callback_data="settings_menu")]]
         await query.edit_message_text(
@@ -448,6 +613,7 @@ async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
             [InlineKeyboardButton("За 24 часа",  callback_data="report_1d")],
             [InlineKeyboardButton("За 7 дней",   callback_data="report_7d")],
             [InlineKeyboardButton("За 30 дней",  callback_data="report_30d")],
+            [InlineKeyboardButton("Исполнение",  callback_data="execution_report")],
             [InlineKeyboardButton("Назад",       callback_data="main_menu")]
         ]
         await query.edit_message_text(
@@ -456,14 +622,14 @@ async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
     elif data == "full_report":
-        # Получаем последние 50 сделок и сортируем по времени (от новых к старым)
-        resp = HTTP_CLIENT.get_executions(
-            category="linear",
-            symbol=SELECTED_SYMBOL,
-            limit=50
-        )
-        trades = resp["result"]["list"]
-        trades.sort(key=lambda t: int(t["execTime"]), reverse=True)
+        # Последние 50 сделок из локального кэша (от новых к старым);
+        # догрузка новых исполнений идёт в фоне, если кэш устарел
+        store = trading_state.trade_store(SELECTED_SYMBOL)
+        if not store.last_sync:
+            await views.get(("trade_store", SELECTED_SYMBOL), store.sync)
+        elif time.time() - store.last_sync > TRADE_STORE_REFRESH:
+            position_manager.bridge.run_blocking(store.sync)
+        trades = store.last_executions(50)
 
         # Словарь для перевода сторон сделки
         side_map = {
@@ -474,18 +640,14 @@ async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
         report_lines = ["📊 Последние 50 сделок:"]
         for tr in trades:
             # Преобразуем UNIX‑метку в локальное время
-            ts = datetime.datetime.fromtimestamp(int(tr["execTime"]) / 1000)
+            ts = datetime.datetime.fromtimestamp(tr["time"] / 1000)
             date_str = ts.strftime("%d.%m.%Y %H:%M")
             side_str = side_map.get(
                 tr["side"].upper(), tr["side"].capitalize())
 
-            # Форматирование чисел: цена — с двумя знаками, объём — с четырьмя
-            price = float(tr["execPrice"])
-            qty = float(tr["execQty"])
-
             report_lines.append(
                 f"• {date_str} — {side_str} {tr['symbol']}\n"
-                f"    Цена: {price:,.2f} USDT; Объём: {qty:,.4f}"
+                f"    Цена: {tr['price']:,.2f} USDT; Объём: {tr['qty']:,.4f}"
             )
 
         report_text = "\n".join(report_lines)
@@ -516,12 +678,20 @@ async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Назад", callback_data="stats_menu")]]
         await query.edit_message_text(report, reply_markup=InlineKeyboardMarkup(keyboard))
 
+    elif data == "execution_report":
+        # проскальзывание и задержки из памяти, без запросов к бирже
+        report = position_manager.executions.report()
+        keyboard = [[InlineKeyboardButton(
+            "Назад", callback_data="stats_menu")]]
+        await query.edit_message_text(report, reply_markup=InlineKeyboardMarkup(keyboard))
+
     # Меню позиций
     elif data == "positions_menu":
-        positions = trading_state.get_current_positions()
+        positions = await views.get(
+            ("positions", trading_state.symbol), trading_state.get_current_positions)
         keyboard = []
 
-        if position_manager.active_positions:
+        if fanout.has_positions():
             keyboard.append([InlineKeyboardButton("Закрыть позицию",
                                                   callback_data="close_position")])
 
@@ -548,22 +718,29 @@ async def handle_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("Главное меню:", reply_markup=InlineKeyboardMarkup(keyboard))
 
     elif data == "close_position":
-        if not position_manager.active_positions:
+        if not fanout.has_positions():
             await query.answer("Открытых позиций нет")
         else:
-            # выполняем в отдельном потоке, чтобы не блокировать loop
-            closed = await asyncio.to_thread(
-                position_manager.market_close_active_position
-            )
-            await query.answer("✅ Позиция закрыта" if closed else
-                               "❌ Не удалось закрыть позицию")
+            # на всех аккаунтах сразу, каждый — в своём потоке order-state,
+            # чтобы не блокировать loop и не пересекаться с событиями WS
+            outcome = await fanout.close()
+            failed = [name for name, closed in outcome.items() if not closed]
+            if not failed:
+                cancelled = sum(len(c["cancel_report"]["cancelled"]) for c in outcome.values())
+                await query.answer(
+                    f"✅ Позиции закрыты: {', '.join(outcome)} "
+                    f"(снято ордеров: {cancelled})")
+            else:
+                await query.answer(f"❌ Не удалось закрыть: {', '.join(failed)}")
 
-        positions = trading_state.get_current_positions()
+        views.invalidate(("positions", trading_state.symbol))
+        positions = await views.get(
+            ("positions", trading_state.symbol), trading_state.get_current_positions)
         keyboard = [
             [InlineKeyboardButton("Обновить", callback_data="positions_menu"),
              InlineKeyboardButton("Назад",    callback_data="main_menu")]
         ]
-        if position_manager.active_positions:
+        if fanout.has_positions():
             keyboard.insert(0, [InlineKeyboardButton("Закрыть позицию",
                                                      callback_data="close_position")])
 
@@ -598,7 +775,8 @@ async def handle_size_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         POSITION_NOTIONAL = value
         AWAITING_SIZE_INPUT = False
-        current_price = bybit_client.get_current_price(SELECTED_SYMBOL)
+        current_price = await views.get(
+            ("price", SELECTED_SYMBOL), bybit_client.get_current_price, SELECTED_SYMBOL)
         if not current_price:
             await update.message.reply_text("❌ Не удалось получить цену")
             return
@@ -617,6 +795,7 @@ def main():
     application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
 
     application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("chart", chart_command))
 
     application.add_handler(CallbackQueryHandler(handle_buttons))
 
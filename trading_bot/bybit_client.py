@@ -1,29 +1,101 @@
 # bybit_client.py
 import time
+import random
+import hashlib
 import logging
 import requests
 from pybit.unified_trading import HTTP, WebSocket
+from pybit.exceptions import FailedRequestError, InvalidRequestError
 from .config import BYBIT_API_KEY, BYBIT_API_SECRET, SYMBOL
+from .config import BYBIT_REST_URL, BYBIT_WS_PRIVATE_URL
+from .message_dedup import MessageDeduplicator
+from .ws_bridge import WsEventBridge
+from .account_state import AccountState
+from .rate_budget import RateBudget, ORDER_RATE_LIMIT, RATE_LIMIT_CODE
+
+WS_DEDUP_MAX_SIZE = 5000   # сколько ключей orderId_updatedTime держим
+WS_DEDUP_TTL = 900         # секунд: реплеи после реконнекта приходят раньше
+
+ORDER_RETRIES = 4
+ORDER_RETRY_BASE_DELAY = 0.15   # секунд, умножается на номер попытки + джиттер
+LINK_ID_PREFIX = "tb"
+# коды, после которых повтор имеет смысл: сбой/перегрузка на стороне биржи
+RETRYABLE_ORDER_CODES = {10000, 10002, 10006, 10016, 10019, 170146}
+# коды, на которых pybit сам спит и повторяет; без 10002 (окно приёма) и
+# 10006 (лимит запросов): их разбирает наш код — повтор ордера после
+# проверки link ID и пауза RateBudget до сброса лимита
+PYBIT_RETRY_CODES = {30034, 30035, 130035, 130150}
+DUPLICATE_LINK_ID_CODE = 110072
+# ордер с такими статусами действительно стоит или исполнен; Cancelled,
+# Deactivated и Rejected с тем же link ID — прошлая попытка, не ответ на эту
+LIVE_ORDER_STATUSES = ("New", "PartiallyFilled", "Filled", "Untriggered")
+
+
+def make_order_link_id(symbol: str, signal_ts, role: str) -> str:
+    """
+    Детерминированный orderLinkId: один и тот же сигнал и роль ордера
+    (entry, sl, tp1, ...) всегда дают один и тот же ID, поэтому повторная
+    отправка не может создать второй ордер. Bybit ограничивает ID 36 символами.
+    """
+    link_id = f"{LINK_ID_PREFIX}-{symbol}-{signal_ts}-{role}"
+    if len(link_id) > 36:
+        digest = hashlib.sha1(link_id.encode()).hexdigest()[:20]
+        link_id = f"{LINK_ID_PREFIX}-{digest}-{role}"[:36]
+    return link_id
+
+
+class PrivateWebSocket(WebSocket):
+    """pybit WebSocket, подключающийся к BYBIT_WS_PRIVATE_URL (прод или стенд)."""
+
+    def _connect(self, url):
+        super()._connect(BYBIT_WS_PRIVATE_URL)
+
+
+def make_http_client(**kwargs) -> HTTP:
+    """pybit HTTP-клиент с базовым адресом из BYBIT_REST_URL."""
+    kwargs.setdefault("retry_codes", PYBIT_RETRY_CODES)
+    client = HTTP(testnet=False, **kwargs)
+    client.endpoint = BYBIT_REST_URL
+    return client
 
 
 class BybitClient:
-    def __init__(self):
-        self.http_client = HTTP(
-            api_key=BYBIT_API_KEY,
-            api_secret=BYBIT_API_SECRET,
-            testnet=False
-        )
-        self.ws = WebSocket(
-            api_key=BYBIT_API_KEY,
-            api_secret=BYBIT_API_SECRET,
-            channel_type="private",
-            testnet=False
-        )
+    def __init__(self, api_key: str = None, api_secret: str = None, name: str = "main",
+                 order_rate: float = ORDER_RATE_LIMIT, http_client=None):
+        # без ключей — основной аккаунт из config; суб-аккаунты передают свои.
+        # http_client — готовый транспорт (PaperHttp): тогда ни ключей, ни
+        # приватного WS, события в ws_bridge кладёт сам транспорт
+        self.name = name
+        if http_client is not None:
+            self.http_client = http_client
+            self.ws = None
+        else:
+            api_key = api_key or BYBIT_API_KEY
+            api_secret = api_secret or BYBIT_API_SECRET
+            self.http_client = make_http_client(
+                api_key=api_key,
+                api_secret=api_secret,
+            )
+            self.ws = PrivateWebSocket(
+                api_key=api_key,
+                api_secret=api_secret,
+                channel_type="private",
+                testnet=False
+            )
+        # лимит Bybit считается на UID: у каждого аккаунта свой бюджет
+        self.order_budget = RateBudget(order_rate)
 
-        self.subscribe_to_order_updates()
-        self.processed_messages = set()
+        self.processed_messages = MessageDeduplicator(
+            max_size=WS_DEDUP_MAX_SIZE, ttl=WS_DEDUP_TTL)
+        # поток pybit только кладёт сообщения в мост, обработка — в asyncio
+        self.ws_bridge = WsEventBridge(self.handle_ws_message)
+        self.account_state = AccountState(self.http_client)
+        if self.ws is not None:
+            self.subscribe_to_order_updates()
+            self.subscribe_to_account_updates()
 
-    def get_historical_kline(self, symbol: str, limit: int = 150, interval: str = "5"):
+    def get_historical_kline(self, symbol: str, limit: int = 150, interval: str = "5",
+                             start: int = None, end: int = None):
 
         import logging
         try:
@@ -34,7 +106,9 @@ class BybitClient:
                 category="linear",
                 symbol=symbol,
                 interval=interval,
-                limit=limit
+                limit=limit,
+                start=start,
+                end=end
             )
             # Лог для отладки
             logging.info(f"get_historical_kline response: {response}")
@@ -69,22 +143,27 @@ class BybitClient:
     def subscribe_to_order_updates(self):
         # Подписка на обычные ордера
         self.ws.subscribe(topic="order", symbol=SYMBOL,
-                          callback=self.handle_ws_message)
+                          callback=self.ws_bridge.submit)
+
+    def subscribe_to_account_updates(self):
+        # Позиции, исполнения и кошелёк — для локального зеркала аккаунта
+        for topic in ("position", "execution", "wallet"):
+            self.ws.subscribe(topic=topic, callback=self.ws_bridge.submit)
 
     def handle_ws_message(self, message):
         logging.info(f"WebSocket message: {message}")
-        if message.get("topic") == "order":
+        if message.get("topic") in ("position", "execution", "wallet"):
+            self.account_state.apply_ws_message(message)
+        elif message.get("topic") == "order":
             for order in message.get("data", []):
-                message_key = f"{order.get('orderId')}_{order.get('updatedTime')}"
-                if message_key in self.processed_messages:
+                # статус в ключе: "New" и "Filled" могут прийти с одним updatedTime
+                message_key = (f"{order.get('orderId')}_{order.get('updatedTime')}"
+                               f"_{order.get('orderStatus')}")
+                if self.processed_messages.seen(message_key):
                     logging.debug(
                         f"Skipping duplicate WebSocket message: {message_key}")
                     continue
-                self.processed_messages.add(message_key)
                 self.handle_order_update(order)
-                # Очистка старых сообщений для экономии памяти
-                if len(self.processed_messages) > 1000:
-                    self.processed_messages.clear()
 
     def handle_order_update(self, order_data):
         order_id = order_data.get("orderId")
@@ -92,6 +171,9 @@ class BybitClient:
         if hasattr(self, "order_callback"):
             self.order_callback(order_id, status, order_data)
 
+    def on_price(self, symbol: str, price: float) -> None:
+        """Цена из публичного потока; реальной бирже не нужна (см. PaperClient)."""
+
     def track_order_status(self, callback):
         """Регистрация колбэка для отслеживания статусов ордеров."""
         self.order_callback = callback
@@ -100,53 +182,110 @@ class BybitClient:
         """Получает серверное время Bybit в миллисекундах."""
         try:
             response = requests.get(
-                "https://api.bybit.com/v5/market/time", timeout=5)
+                f"{BYBIT_REST_URL}/v5/market/time", timeout=5)
             return int(response.json()["time"])
         except Exception as e:
             logging.error(f"Ошибка получения времени Bybit: {e}")
             return int(time.time() * 1000)  # fallback на локальное время
 
-    def place_active_order(self, symbol, side: str, qty: float):
+    def find_order_by_link_id(self, symbol: str, order_link_id: str) -> dict | None:
+        """Ищет живой (LIVE_ORDER_STATUSES) ордер по orderLinkId: открытые, затем история."""
+        for method in (self.http_client.get_open_orders,
+                       self.http_client.get_order_history):
+            try:
+                resp = method(category="linear", symbol=symbol,
+                              orderLinkId=order_link_id)
+                orders = resp.get("result", {}).get("list", [])
+                for order in orders:
+                    if order.get("orderStatus") in LIVE_ORDER_STATUSES:
+                        return order
+            except Exception as e:
+                logging.warning(f"Не удалось проверить ордер {order_link_id}: {e}")
+        return None
 
-        try:
-            ts = self._get_server_timestamp()
-            order = self.http_client.place_order(
-                category="linear",
-                symbol=symbol,
-                side=side,
-                orderType="Market",
-                qty=str(qty),  # Приводим количество к строке
-                timeInForce="GTC",
-                reduceOnly=False,
-                closeOnTrigger=False,
-                timestamp=ts,
-                recv_window=15000
-            )
-            if order.get("retCode") == 0:
-                order_id = order["result"]["orderId"]
-                logging.info(f"Placed {side} market order: {order_id}")
-                return order
-            else:
-                logging.error(f"Order failed: {order.get('retMsg')}")
-                return None
-        except Exception as e:
-            logging.error(f"Error placing order: {e}")
-            return None
+    def submit_order(self, order_link_id: str, retries: int = ORDER_RETRIES, **params) -> dict:
+        """
+        Идемпотентная отправка ордера. Каждый ордер несёт orderLinkId; если
+        ответ не получен (таймаут, сетевая ошибка, сбой биржи), перед повтором
+        проверяем по link ID, не дошёл ли ордер, — поэтому повторять можно
+        сразу, с коротким джиттером, без риска задвоить позицию.
+        Возвращает ответ в формате Bybit (retCode/retMsg/result).
+        """
+        symbol = params["symbol"]
+        last_error = None
+        for attempt in range(retries):
+            if attempt:
+                existing = self.find_order_by_link_id(symbol, order_link_id)
+                if existing:
+                    logging.info(
+                        f"Ордер {order_link_id} уже принят биржей, повтор не нужен")
+                    return _as_placed(existing)
+            self.order_budget.acquire()
+            try:
+                return self.http_client.place_order(
+                    category="linear", orderLinkId=order_link_id, **params)
+            except InvalidRequestError as e:
+                if e.status_code == RATE_LIMIT_CODE:
+                    self.order_budget.hold(e.resp_headers)
+                if e.status_code == DUPLICATE_LINK_ID_CODE:
+                    # ордер уже на бирже — остаётся только найти его
+                    existing = self.find_order_by_link_id(symbol, order_link_id)
+                    if existing:
+                        return _as_placed(existing)
+                    # link ID занят снятым ордером: повтор с ним бесполезен,
+                    # новую попытку вызывающий отправляет с новым ID
+                    logging.error(f"Ордер {order_link_id} уже был и снят")
+                    return {"retCode": e.status_code, "retMsg": e.message, "result": {}}
+                elif e.status_code not in RETRYABLE_ORDER_CODES:
+                    logging.error(f"Ордер {order_link_id} отклонён: {e.message}")
+                    return {"retCode": e.status_code, "retMsg": e.message, "result": {}}
+                last_error = e
+            except (FailedRequestError, requests.exceptions.RequestException) as e:
+                last_error = e
+            logging.warning(
+                f"Попытка {attempt + 1} отправки {order_link_id} не удалась: {last_error}")
+            time.sleep(ORDER_RETRY_BASE_DELAY * (attempt + 1) * random.uniform(0.5, 1.5))
+
+        existing = self.find_order_by_link_id(symbol, order_link_id)
+        if existing:
+            return _as_placed(existing)
+        return {"retCode": -1, "retMsg": f"{last_error}", "result": {}}
+
+    def place_active_order(self, symbol, side: str, qty: float, order_link_id: str = None,
+                           reduce_only: bool = False):
+        order_link_id = order_link_id or make_order_link_id(
+            symbol, int(time.time() * 1000), "mkt")
+        order = self.submit_order(
+            order_link_id,
+            symbol=symbol,
+            side=side,
+            orderType="Market",
+            qty=str(qty),  # Приводим количество к строке
+            timeInForce="GTC",
+            reduceOnly=reduce_only,
+            closeOnTrigger=False,
+        )
+        if order.get("retCode") == 0:
+            order_id = order["result"]["orderId"]
+            logging.info(f"Placed {side} market order: {order_id}")
+            return order
+        logging.error(f"Order failed: {order.get('retMsg')}")
+        return None
 
     def get_unified_wallet_balance(self, retries=3) -> dict:
         for _ in range(retries):
             try:
-                ts = self._get_server_timestamp()
+                # подпись и timestamp pybit ставит сам, лишний /market/time не нужен;
+                # широкое окно приёма — на случай дрейфа локальных часов
                 result = self.http_client.get_wallet_balance(
                     accountType="UNIFIED",
-                    timestamp=ts,
                     recv_window=30000
                 )
                 if result.get("retCode") == 0:
                     return result
                 elif result.get("retCode") == 10002:
                     logging.warning(
-                        f"Retrying... Server time: {result.get('time')}, Request time: {ts}")
+                        f"Retrying... Server time: {result.get('time')}")
                     time.sleep(2.5)
                     continue
             except Exception as e:
@@ -162,37 +301,28 @@ class BybitClient:
         orderType: str = "Market",
         reduce_only: bool = True,
         triggerDirection: int = None,
-        retries: int = 3
+        retries: int = ORDER_RETRIES,
+        order_link_id: str = None
     ):
         if triggerDirection not in [1, 2]:
             raise ValueError(
                 "triggerDirection должен быть 1 (цена выше) или 2 (цена ниже)")
 
-        import time
-        for attempt in range(retries):
-            try:
-                result = self.http_client.place_order(
-                    category="linear",
-                    symbol=symbol,
-                    side=side,
-                    orderType=orderType,
-                    qty=str(qty),
-                    triggerPrice=str(stop_px),
-                    timeInForce="GTC",
-                    triggerBy="LastPrice",
-                    reduceOnly=reduce_only,
-                    triggerDirection=triggerDirection
-                )
-                if result.get("retCode") == 0:
-                    return result
-                elif attempt < retries - 1:
-                    time.sleep(1.5 ** attempt)
-            except Exception as e:
-                logging.error(f"Попытка {attempt+1} не удалась: {e}")
-                if attempt == retries - 1:
-                    raise Exception(
-                        f"Не удалось разместить ордер после {retries} попыток: {e}")
-        return None
+        order_link_id = order_link_id or make_order_link_id(
+            symbol, int(time.time() * 1000), "cond")
+        return self.submit_order(
+            order_link_id,
+            retries=retries,
+            symbol=symbol,
+            side=side,
+            orderType=orderType,
+            qty=str(qty),
+            triggerPrice=str(stop_px),
+            timeInForce="GTC",
+            triggerBy="LastPrice",
+            reduceOnly=reduce_only,
+            triggerDirection=triggerDirection
+        )
 
     def set_sl_tp(self, position, symbol):
         try:
@@ -255,3 +385,13 @@ class BybitClient:
         }
         resp = self.sign_request("GET", path, params)
         return resp.get("result", {}).get("dataList", [])
+
+
+def _as_placed(order: dict) -> dict:
+    """Ответ place_order для ордера, найденного по orderLinkId."""
+    return {
+        "retCode": 0,
+        "retMsg": "OK",
+        "result": {"orderId": order.get("orderId"),
+                   "orderLinkId": order.get("orderLinkId")},
+    }
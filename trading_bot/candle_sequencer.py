@@ -0,0 +1,126 @@
+# candle_sequencer.py
+import logging
+import time
+
+KLINE_PAGE_LIMIT = 1000   # максимум свечей за один запрос /v5/market/kline
+
+INTERVAL_MS = {
+    "D": 86_400_000,
+    "W": 7 * 86_400_000,
+}
+
+
+def interval_to_ms(interval: str) -> int:
+    """Интервал Bybit ("5", "60", "D", "W") в миллисекундах."""
+    if interval in INTERVAL_MS:
+        return INTERVAL_MS[interval]
+    return int(interval) * 60_000
+
+
+class CandleSequencer:
+    """
+    Порядок закрытых свечей одного (symbol, interval).
+
+    Хранит время открытия следующей ожидаемой свечи. Всё, что раньше, —
+    дубликат или запоздавший повтор после реконнекта и отбрасывается за O(1).
+    Если пришедшая свеча дальше ожидаемой, недостающие свечи догружаются
+    через REST и отдаются по порядку перед ней.
+    """
+
+    def __init__(self, symbol: str, interval: str, fetch_klines):
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        # fetch_klines(symbol=, interval=, start=, end=, limit=) -> list[dict]
+        self.fetch_klines = fetch_klines
+        self.next_open: int | None = None
+
+        self.gaps = 0
+        self.gaps_filled = 0
+        self.duplicates_dropped = 0
+        self.missing_after_backfill = 0
+
+    def prime(self, candles: list[dict]) -> list[dict]:
+        """
+        Принимает историю (в любом порядке), отбрасывает ещё не закрытую
+        свечу и ставит курсор за последней закрытой. Возвращает закрытые
+        свечи по возрастанию времени.
+        """
+        now_ms = int(time.time() * 1000)
+        closed = sorted(
+            (c for c in candles if c["timestamp"] + self.interval_ms <= now_ms),
+            key=lambda c: c["timestamp"])
+        if closed:
+            self.next_open = closed[-1]["timestamp"] + self.interval_ms
+        return closed
+
+    def classify(self, candle: dict) -> str:
+        """'next' | 'duplicate' | 'gap'"""
+        ts = candle["timestamp"]
+        if self.next_open is None or ts == self.next_open:
+            return "next"
+        if ts < self.next_open:
+            return "duplicate"
+        return "gap"
+
+    def accept(self, candle: dict) -> list[dict]:
+        """
+        Свечи к обработке в правильном порядке: [] для дубликата,
+        [candle] в обычном случае, [пропущенные..., candle] после разрыва.
+        При разрыве делает блокирующие REST-запросы.
+        """
+        kind = self.classify(candle)
+        if kind == "duplicate":
+            self.duplicates_dropped += 1
+            logging.debug(
+                f"{self.symbol}/{self.interval}: дубликат свечи {candle['timestamp']}")
+            return []
+
+        batch = []
+        if kind == "gap":
+            batch = self._backfill(self.next_open, candle["timestamp"])
+        batch.append(candle)
+        self.next_open = candle["timestamp"] + self.interval_ms
+        return batch
+
+    def _backfill(self, start: int, until: int) -> list[dict]:
+        expected = (until - start) // self.interval_ms
+        self.gaps += 1
+        logging.warning(
+            f"{self.symbol}/{self.interval}: разрыв в {expected} свеч., догружаем через REST")
+
+        # Bybit отдаёт самые свежие свечи диапазона, поэтому листаем назад
+        fetched: dict[int, dict] = {}
+        end = until - 1
+        while end >= start:
+            page = self.fetch_klines(
+                symbol=self.symbol, interval=self.interval, start=start,
+                end=end, limit=KLINE_PAGE_LIMIT)
+            page = [c for c in page if start <= c["timestamp"] < until]
+            if not page:
+                break
+            for c in page:
+                fetched[c["timestamp"]] = {
+                    **c, "symbol": self.symbol, "interval": self.interval}
+            if len(page) < KLINE_PAGE_LIMIT:
+                break
+            end = min(c["timestamp"] for c in page) - 1
+
+        batch = [fetched[ts] for ts in sorted(fetched)]
+        self.gaps_filled += len(batch)
+        self.missing_after_backfill += expected - len(batch)
+        if len(batch) < expected:
+            logging.error(
+                f"{self.symbol}/{self.interval}: догружено {len(batch)} из {expected} свечей")
+        return batch
+
+    def stats(self) -> dict:
+        return {
+            "symbol": self.symbol,
+            "interval": self.interval,
+            "next_open": self.next_open,
+            "gaps": self.gaps,
+            "gaps_filled": self.gaps_filled,
+            "duplicates_dropped": self.duplicates_dropped,
+            "missing_after_backfill": self.missing_after_backfill,
+        }
@@ -0,0 +1,184 @@
+# chart.py
+"""
+PNG-график свечей с зонами и сигналами для команды /chart.
+
+Отрисовка идёт в отдельном процессе (ProcessPoolExecutor), поэтому
+event loop бота не блокируется. Свечи рисуются двумя коллекциями
+(тени и тела), маркеры каждого вида — одним scatter, длинные диапазоны
+сворачиваются в более крупные свечи до MAX_BARS.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+CHART_WORKERS = 2
+MAX_BARS = 300          # больше — свечи объединяются по k штук
+CACHE_SIZE = 32         # PNG в кэше по (symbol, interval, последняя свеча, маркеры)
+FIGSIZE = (12, 6)
+DPI = 100
+
+MARKERS = {
+    # вид: (ключ маркера, маркер, цвет)
+    "entry": ("entry", "o", "#1f77b4"),
+    "sl": ("sl", "x", "#d62728"),
+    "tp1": ("tp1", "^", "#2ca02c"),
+    "tp2": ("tp2", "v", "#17becf"),
+}
+
+
+def downsample(ts, o, h, l, c, max_bars: int = MAX_BARS):
+    """OHLC-свёртка по k подряд идущих свечей, чтобы осталось не больше max_bars."""
+    n = len(ts)
+    k = -(-n // max_bars)
+    if k <= 1:
+        return ts, o, h, l, c
+    cut = n - n % k if n % k else n
+    # хвост, не влезающий в полную группу, отбрасываем слева — справа свежие свечи
+    start = n - cut
+    shape = (-1, k)
+    return (ts[start:].reshape(shape)[:, 0],
+            o[start:].reshape(shape)[:, 0],
+            h[start:].reshape(shape).max(axis=1),
+            l[start:].reshape(shape).min(axis=1),
+            c[start:].reshape(shape)[:, -1])
+
+
+def position_markers(positions, symbol: str) -> list[dict]:
+    """
+    Маркеры из позиций символа (открытых и закрытых): вход, начальный
+    стоп и цели на свече открытия. Позиции без opened_at (из старого
+    журнала) пропускаются.
+    """
+    markers = []
+    for p in positions:
+        if p.get("symbol") != symbol or not p.get("opened_at"):
+            continue
+        markers.append({"timestamp": p["opened_at"], "entry": p.get("entry"),
+                        "sl": p.get("initial_sl") or p.get("sl"),
+                        "tp1": p.get("tp1"), "tp2": p.get("tp2")})
+    return sorted(markers, key=lambda m: m["timestamp"])
+
+
+def render_chart(candles: list[dict], zones: dict, signals: list[dict], title: str) -> bytes:
+    """Рисует PNG; выполняется в рабочем процессе."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection, PolyCollection
+
+    candles = sorted(candles, key=lambda x: x["timestamp"])
+    ts = np.array([x["timestamp"] for x in candles], dtype=np.int64)
+    o, h, l, c = (np.array([x[k] for x in candles], dtype=float)
+                  for k in ("open", "high", "low", "close"))
+    ts, o, h, l, c = downsample(ts, o, h, l, c)
+
+    x = np.arange(len(ts))
+    up = c >= o
+    colors = np.where(up, "#26a69a", "#ef5350")
+
+    fig, ax = plt.subplots(figsize=FIGSIZE, dpi=DPI)
+    ax.add_collection(LineCollection(
+        np.stack([np.column_stack([x, l]), np.column_stack([x, h])], axis=1),
+        colors=colors, linewidths=0.8))
+    half = 0.35
+    bottom, top = np.minimum(o, c), np.maximum(o, c)
+    bodies = np.stack([
+        np.column_stack([x - half, bottom]), np.column_stack([x - half, top]),
+        np.column_stack([x + half, top]), np.column_stack([x + half, bottom]),
+    ], axis=1)
+    ax.add_collection(PolyCollection(bodies, facecolors=colors, edgecolors=colors))
+
+    if len(ts):
+        lo, hi = l.min(), h.max()
+        for kind, color in (("support", "#2ca02c"), ("resistance", "#d62728")):
+            levels = [z for z in zones.get(kind, []) if lo <= z <= hi]
+            if levels:
+                ax.hlines(levels, 0, len(x) - 1, colors=color,
+                          linestyles="dashed", linewidths=0.8, alpha=0.6)
+
+        # маркер -> индекс свечи (после свёртки — группы, в которую он попал)
+        in_range = [s for s in signals if ts[0] <= s.get("timestamp", -1)]
+        idx = np.searchsorted(ts, [s["timestamp"] for s in in_range], side="right") - 1
+        for kind, (key, marker, color) in MARKERS.items():
+            points = [(i, s[key]) for i, s in zip(idx, in_range) if s.get(key)]
+            if points:
+                px, py = zip(*points)
+                ax.scatter(px, py, marker=marker, color=color, s=40,
+                           label=kind.upper(), zorder=3)
+
+        ax.set_xlim(-1, len(x))
+        ax.set_ylim(lo - (hi - lo) * 0.02, hi + (hi - lo) * 0.02)
+        ticks = np.linspace(0, len(x) - 1, min(8, len(x))).astype(int)
+        ax.set_xticks(ticks)
+        ax.set_xticklabels(np.datetime_as_string(
+            ts[ticks].astype("datetime64[ms]"), unit="m"), rotation=20, fontsize=8)
+        if ax.get_legend_handles_labels()[0]:
+            ax.legend(loc="upper left", fontsize=8)
+
+    ax.set_title(title)
+    ax.grid(alpha=0.2)
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+class ChartService:
+    """Пул процессов для отрисовки и LRU-кэш готовых PNG."""
+
+    def __init__(self, workers: int = CHART_WORKERS, cache_size: int = CACHE_SIZE):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.cache: OrderedDict[tuple, bytes] = OrderedDict()
+        self._pool: ProcessPoolExecutor | None = None
+        self._in_flight: dict[tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.renders = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: форк процесса с потоками pybit/requests небезопасен
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def render(self, symbol: str, interval: str, candles: list[dict],
+                     zones: dict, signals: list[dict]) -> bytes:
+        last_ts = max(c["timestamp"] for c in candles)
+        # новая или закрытая позиция меняет картинку без новой свечи
+        key = (symbol, interval, last_ts,
+               tuple(tuple(s.get(k) for k in ("timestamp", *MARKERS)) for s in signals))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key]
+        if key in self._in_flight:
+            return await asyncio.shield(self._in_flight[key])
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor(), render_chart, candles, zones, signals,
+            f"{symbol} {interval}m")
+        self._in_flight[key] = future
+        try:
+            png = await asyncio.shield(future)
+        finally:
+            self._in_flight.pop(key, None)
+        self.renders += 1
+        self.cache[key] = png
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        logging.info(f"График {symbol}/{interval} отрисован ({len(png)} байт)")
+        return png
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,89 @@
+# closed_pnl.py
+import time
+from collections import deque
+
+PAGE_LIMIT = 100               # максимум записей на страницу execution/closed-pnl
+WINDOW_MS = 7 * 86_400_000     # оба эндпоинта: не больше 7 суток за запрос
+OVERLAP_MS = 60_000            # перекрытие с прошлой выборкой, повторы отсекаются по id
+
+
+def fetch_paged(method, symbol: str, start: int, end: int) -> list[dict]:
+    """
+    Записи execution / closed-pnl за [start, end]: окнами по WINDOW_MS,
+    внутри окна — постранично через nextPageCursor.
+    """
+    records = []
+    while start < end:
+        window_end = min(start + WINDOW_MS, end)
+        page_cursor = None
+        while True:
+            params = {"category": "linear", "symbol": symbol,
+                      "startTime": start, "endTime": window_end,
+                      "limit": PAGE_LIMIT}
+            if page_cursor:
+                params["cursor"] = page_cursor
+            result = method(**params).get("result", {})
+            records += result.get("list", [])
+            page_cursor = result.get("nextPageCursor")
+            if not page_cursor or not result.get("list"):
+                break
+        start = window_end + 1
+    return records
+
+
+def record_time(record: dict) -> int:
+    return int(record.get("updatedTime") or record.get("createdTime") or 0)
+
+
+def sync_closed_pnl(http_client, symbol: str, consumers: list) -> list:
+    """
+    Одна выборка closed-pnl на всех потребителей (PnlAggregate, TradeStore):
+    от самого раннего нужного им времени до текущего момента, каждому —
+    записи не старше его начала. Потребитель реализует
+    pnl_start(symbol, now_ms) -> int | None (None — ему ничего не нужно) и
+    apply_closed_pnl(symbol, records, start, now_ms). Возвращает результаты
+    apply_closed_pnl по порядку consumers, None — для пропущенных.
+    """
+    now_ms = int(time.time() * 1000)
+    starts = [c.pnl_start(symbol, now_ms) for c in consumers]
+    needed = [start for start in starts if start is not None]
+    if not needed:
+        return [None] * len(consumers)
+    records = fetch_paged(http_client.get_closed_pnl, symbol, min(needed), now_ms)
+    records.sort(key=record_time)
+    return [None if start is None else consumer.apply_closed_pnl(
+                symbol, [r for r in records if record_time(r) >= start], start, now_ms)
+            for consumer, start in zip(consumers, starts)]
+
+
+class RecentIds:
+    """Последние limit идентификаторов: проверка за O(1), вытеснение старейшего."""
+
+    def __init__(self, limit: int, ids=()):
+        self.order: deque = deque(maxlen=limit)
+        self.ids: set = set()
+        for key in ids:
+            self.add(key)
+
+    def add(self, key) -> bool:
+        """False — идентификатор уже был."""
+        if key in self.ids:
+            return False
+        if len(self.order) == self.order.maxlen:
+            self.ids.discard(self.order[0])
+        self.order.append(key)
+        self.ids.add(key)
+        return True
+
+    def clear(self) -> None:
+        self.order.clear()
+        self.ids.clear()
+
+    def __contains__(self, key) -> bool:
+        return key in self.ids
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __len__(self) -> int:
+        return len(self.order)
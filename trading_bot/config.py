@@ -8,8 +8,42 @@ BYBIT_API_SECRET = os.getenv('BYBIT_API_SECRET')
 SYMBOL = "BTCUSDT"
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', "https://api.telegram.org")
 LOG_FILE = "trading.log"
 
+# Адреса Bybit. Для локального стенда (python -m trading_bot.fake_exchange)
+# переопределяются в .env, например BYBIT_REST_URL=http://127.0.0.1:8080
+BYBIT_REST_URL = os.getenv('BYBIT_REST_URL', "https://api.bybit.com")
+BYBIT_WS_PUBLIC_URL = os.getenv(
+    'BYBIT_WS_PUBLIC_URL', "wss://stream.bybit.com/v5/public/linear")
+BYBIT_WS_PRIVATE_URL = os.getenv(
+    'BYBIT_WS_PRIVATE_URL', "wss://stream.bybit.com/v5/private")
+
+# Суб-аккаунты, которые торгуют тем же сигналом одновременно с основным:
+# BYBIT_SUB_ACCOUNTS=alpha,beta и для каждого BYBIT_API_KEY_ALPHA,
+# BYBIT_API_SECRET_ALPHA, необязательно BYBIT_SIZE_ALPHA — множитель размера
+# позиции (0 или не задан — пропорционально эквити к основному счёту).
+SUB_ACCOUNTS = [
+    {
+        "name": name,
+        "api_key": os.getenv(f'BYBIT_API_KEY_{name.upper()}'),
+        "api_secret": os.getenv(f'BYBIT_API_SECRET_{name.upper()}'),
+        "size": float(os.getenv(f'BYBIT_SIZE_{name.upper()}', '0')),
+    }
+    for name in filter(None, map(str.strip, os.getenv('BYBIT_SUB_ACCOUNTS', '').split(',')))
+]
+
+# Бумажная торговля (PaperClient): ордера исполняются локально по ценам
+# из публичного потока. PAPER_TRADING=1 — основной счёт бота тоже бумажный.
+PAPER_TRADING = os.getenv('PAPER_TRADING', '0') == '1'
+# Варианты стратегии, которые параллельно торгуют на бумаге по тем же свечам:
+# name, overrides поверх TRADING_CONFIG и параметры PaperClient
+# (balance, latency_ms, jitter_ms, taker_fee, maker_fee).
+PAPER_VARIANTS = [
+    # {"name": "trail3", "overrides": {"trailing_atr_multiplier": 3.0},
+    #  "balance": 10000.0, "latency_ms": 80.0},
+]
+
 
 TRADING_CONFIG = {
     # ***Объём***
@@ -45,5 +79,16 @@ TRADING_CONFIG = {
 
     # Отмена перегретых сигналов
     'rsi_max_for_long': 70,   # если RSI выше – лонг‑сигнал отменяем
-    'rsi_min_for_short': 30   # если RSI ниже – шорт‑сигнал отменяем
+    'rsi_min_for_short': 30,  # если RSI ниже – шорт‑сигнал отменяем
+
+    # Предварительная оценка формирующейся свечи (прогрев исполнения)
+    'provisional_signals': False,   # прогрев по формирующейся свече, по умолчанию выкл.
+    'provisional_min_interval': 2.0,  # сек. между оценками одной свечи
+
+    # ***Ведение стопа*** (StopEngine, по ценам из потока; всё выключено по умолчанию)
+    'trailing_atr_multiplier': 0.0,   # трейлинг на k·ATR за лучшей ценой, 0 — выкл.
+    'breakeven_r': 0.0,               # безубыток после движения на X·R, 0 — выкл.
+    'time_stop_minutes': 0,           # закрыть, если TP1 не взят за N минут, 0 — выкл.
+    'time_stop_attempts': 3,          # неудачных закрытий по тайм-стопу до отказа
+    'stop_amend_interval': 2.0        # сек. между переносами стопа одной позиции
 }
@@ -2,6 +2,9 @@ import csv
 import os
 
 CSV_FILENAME = "candles.csv"
+TRADE_JOURNAL_FILENAME = "trade_journal.csv"
+TRADE_JOURNAL_FIELDS = ["time", "account", "symbol", "side", "order_type",
+                        "price", "qty", "fee", "pnl", "order_link_id"]
 
 
 def clear_candle_csv():
@@ -49,3 +52,49 @@ def load_candles_from_csv() -> list:
     # Сортируем свечи по возрастанию времени (от старой к новой)
     candles.sort(key=lambda c: c["timestamp"])
     return candles
+
+
+def save_trade_to_journal(record: dict, filename: str = TRADE_JOURNAL_FILENAME):
+    """Дописывает исполнение в журнал сделок; заголовок — при создании файла."""
+    new_file = not os.path.exists(filename)
+    with open(filename, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(TRADE_JOURNAL_FIELDS)
+        writer.writerow([record.get(field) for field in TRADE_JOURNAL_FIELDS])
+
+
+EXECUTION_LOG_FILENAME = "executions.csv"
+EXECUTION_FIELDS = ["account", "symbol", "position", "role", "side", "qty",
+                    "reference_price", "fill_price", "slippage_bps", "fee",
+                    "signal_time", "send_time", "ack_time", "fill_time",
+                    "signal_to_send_ms", "send_to_ack_ms", "send_to_fill_ms"]
+
+
+def save_execution_record(record: dict, filename: str = EXECUTION_LOG_FILENAME):
+    """Дописывает запись о качестве исполнения ордера позиции."""
+    new_file = not os.path.exists(filename)
+    with open(filename, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(EXECUTION_FIELDS)
+        writer.writerow([record.get(field) for field in EXECUTION_FIELDS])
+
+
+def load_execution_records(filename: str = EXECUTION_LOG_FILENAME) -> list:
+    """Записи исполнения из CSV; числа — float, пустые поля — None."""
+    if not os.path.exists(filename):
+        return []
+    records = []
+    with open(filename, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            if not row or not row.get("symbol"):
+                continue
+            record = dict(row)
+            for field in EXECUTION_FIELDS[5:]:
+                try:
+                    record[field] = float(row[field]) if row.get(field) else None
+                except ValueError:
+                    record[field] = None
+            records.append(record)
+    return records
@@ -0,0 +1,151 @@
+# execution_stats.py
+import datetime
+import logging
+import threading
+from collections import deque
+
+from . import data_storage
+
+HISTORY_LIMIT = 5000   # записей в памяти для распределений; CSV хранит всё
+
+
+class ExecutionStats:
+    """
+    Качество исполнения по каждому ордеру позиции: входу и каждому выходу
+    (tp1, tp2, sl, close). Запись — опорная цена (закрытие сигнальной
+    свечи, цена триггера или лимита, цена потока при ручном закрытии),
+    средняя цена исполнения из execution-отчётов, проскальзывание в б.п.
+    (плюс — против нас) и этапы: сигнал -> отправка -> ответ -> исполнение.
+    Время исполнения — execTime биржи, остальное — локальные часы.
+
+    Записи дописываются в CSV и держатся в памяти; summary() группирует
+    их по символу или часу (UTC) и отдаёт p50/p90/среднее.
+    """
+
+    def __init__(self, account: str = "main",
+                 path: str = data_storage.EXECUTION_LOG_FILENAME, load: bool = True):
+        self.account = account
+        self.path = path
+        self.records: deque[dict] = deque(maxlen=HISTORY_LIMIT)
+        self._lock = threading.Lock()
+        if load:
+            self.records.extend(r for r in data_storage.load_execution_records(path)
+                                if r.get("account") == account)
+
+    @staticmethod
+    def slippage_bps(side: str, reference: float | None, fill: float | None) -> float | None:
+        """Покупка дороже опорной или продажа дешевле — положительное проскальзывание."""
+        if not reference or not fill:
+            return None
+        sign = 1 if side == "Buy" else -1
+        return round(sign * (fill - reference) / reference * 10_000, 3) + 0.0  # без -0.0
+
+    def record(self, position: dict, role: str, side: str, qty: float,
+               reference_price: float | None, fill_price: float | None,
+               fill_time: int | None = None, fee: float | None = None,
+               signal_time: int | None = None, send_time: int | None = None,
+               ack_time: int | None = None) -> dict:
+        record = {
+            "account": self.account,
+            "symbol": position["symbol"],
+            "position": position["order_id"],
+            "role": role,
+            "side": side,
+            "qty": qty,
+            "reference_price": reference_price,
+            "fill_price": fill_price,
+            "slippage_bps": self.slippage_bps(side, reference_price, fill_price),
+            "fee": fee,
+            "signal_time": signal_time,
+            "send_time": send_time,
+            "ack_time": ack_time,
+            "fill_time": fill_time,
+            "signal_to_send_ms": _delta(signal_time, send_time),
+            "send_to_ack_ms": _delta(send_time, ack_time),
+            "send_to_fill_ms": _delta(send_time, fill_time),
+        }
+        with self._lock:
+            self.records.append(record)
+            try:
+                data_storage.save_execution_record(record, self.path)
+            except OSError as e:
+                logging.error(f"Журнал исполнения {self.account}: {e}")
+        logging.info(
+            f"Исполнение {record['symbol']} {role}: {fill_price} против {reference_price}, "
+            f"{record['slippage_bps']} б.п., отправка→исполнение {record['send_to_fill_ms']} мс")
+        return record
+
+    def summary(self, by: str = "symbol", role: str | None = None) -> dict:
+        """
+        by — "symbol" или "hour" (час отправки/исполнения, UTC);
+        role — "entry", "exit" (все выходы) или конкретная роль.
+        """
+        with self._lock:
+            records = list(self.records)
+        groups: dict = {}
+        for r in records:
+            if role == "exit" and r["role"] == "entry":
+                continue
+            if role not in (None, "exit") and r["role"] != role:
+                continue
+            if by == "hour":
+                ts = r.get("send_time") or r.get("fill_time")
+                if not ts:
+                    continue
+                key = datetime.datetime.fromtimestamp(
+                    ts / 1000, datetime.timezone.utc).hour
+            else:
+                key = r["symbol"]
+            groups.setdefault(key, []).append(r)
+        return {
+            key: {
+                "count": len(rows),
+                "slippage_bps": _distribution(r["slippage_bps"] for r in rows),
+                "signal_to_send_ms": _distribution(r["signal_to_send_ms"] for r in rows),
+                "send_to_ack_ms": _distribution(r["send_to_ack_ms"] for r in rows),
+                "send_to_fill_ms": _distribution(r["send_to_fill_ms"] for r in rows),
+            }
+            for key, rows in sorted(groups.items())
+        }
+
+    def report(self) -> str:
+        """Текст для Telegram: входы и выходы по символам, входы по часам."""
+        lines = ["⏱ Качество исполнения (p50 / p90)"]
+        for title, role, by in (("Входы", "entry", "symbol"), ("Выходы", "exit", "symbol"),
+                                ("Входы по часам (UTC)", "entry", "hour")):
+            summary = self.summary(by=by, role=role)
+            if not summary:
+                continue
+            lines.append(f"\n{title}:")
+            for key, s in summary.items():
+                slip, fill = s["slippage_bps"], s["send_to_fill_ms"]
+                line = f"• {key}: {s['count']} шт., проск. {_fmt(slip)} б.п."
+                if fill:
+                    line += f", до исполнения {_fmt(fill)} мс"
+                lines.append(line)
+        if len(lines) == 1:
+            lines.append("Пока нет данных")
+        return "\n".join(lines)
+
+
+def _delta(start, end) -> float | None:
+    if start is None or end is None:
+        return None
+    return float(end) - float(start)
+
+
+def _distribution(values) -> dict | None:
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+
+    def pct(p):
+        return values[min(len(values) - 1, int(p * len(values)))]
+    return {"p50": pct(0.5), "p90": pct(0.9), "mean": round(sum(values) / len(values), 3),
+            "max": values[-1]}
+
+
+def _fmt(dist: dict | None) -> str:
+    if not dist:
+        return "—"
+    return f"{dist['p50']:.1f} / {dist['p90']:.1f}"
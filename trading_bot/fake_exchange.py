@@ -0,0 +1,657 @@
+# fake_exchange.py
+"""
+Локальный стенд Bybit v5 для интеграционных тестов и замеров задержек.
+
+REST (http.server в отдельном потоке) и WebSocket (websockets, asyncio)
+реализуют ровно те эндпоинты и топики, которыми пользуется бот. Подписи
+не проверяются. Цена берётся из записанного CSV со свечами (--replay)
+или из случайного блуждания.
+
+Запуск:
+    python -m trading_bot.fake_exchange --replay historical_candles.csv \\
+        --latency-ms 30 --jitter-ms 10 --error-rate 0.02
+
+и в .env бота:
+    BYBIT_REST_URL=http://127.0.0.1:8080
+    BYBIT_WS_PUBLIC_URL=ws://127.0.0.1:8081/v5/public/linear
+    BYBIT_WS_PRIVATE_URL=ws://127.0.0.1:8081/v5/private
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+from websockets.asyncio.server import serve
+
+TAKER_FEE = 0.00055
+MAKER_FEE = 0.0002
+DEFAULT_INSTRUMENT = {"tickSize": "0.1", "qtyStep": "0.001", "minOrderQty": "0.001"}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def ok(result=None, **extra) -> dict:
+    """Успешный ответ в формате Bybit v5 (и для PaperHttp)."""
+    return {"retCode": 0, "retMsg": "OK", "result": result or {},
+            "retExtInfo": {}, "time": _now_ms(), **extra}
+
+
+def _err(code: int, msg: str) -> dict:
+    return {"retCode": code, "retMsg": msg, "result": {},
+            "retExtInfo": {}, "time": _now_ms()}
+
+
+def _page(rows: list, params: dict, time_key: str) -> dict:
+    """Фильтр по startTime/endTime и постраничная выдача (новые сначала)."""
+    start = int(params.get("startTime", 0))
+    end = int(params.get("endTime", 2 ** 62))
+    rows = [r for r in rows if start <= int(r[time_key]) <= end]
+    rows.sort(key=lambda r: int(r[time_key]), reverse=True)
+    offset = int(params.get("cursor") or 0)
+    limit = int(params.get("limit", 50))
+    chunk = rows[offset:offset + limit]
+    next_cursor = str(offset + limit) if offset + limit < len(rows) else ""
+    return {"category": "linear", "list": chunk, "nextPageCursor": next_cursor}
+
+
+class FakeExchange:
+    """Состояние биржи: цены, ордера, позиции, кошелёк. Потокобезопасно."""
+
+    def __init__(self, balance: float = 10000.0, instruments: dict | None = None,
+                 taker_fee: float = TAKER_FEE, maker_fee: float = MAKER_FEE):
+        self.lock = threading.RLock()
+        self.balance = balance
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+        self.instruments = instruments or {}
+        self.prices: dict[str, float] = {}
+        self.candles: dict[str, list[dict]] = {}
+        self.orders: dict[str, dict] = {}
+        self.positions: dict[str, dict] = {}
+        self.executions: list[dict] = []
+        self.closed_pnl: list[dict] = []
+        self.listeners = []        # callback(topic, data) для приватного WS
+
+    # ---------- рынок ----------
+
+    def instrument(self, symbol: str) -> dict:
+        spec = {**DEFAULT_INSTRUMENT, **self.instruments.get(symbol, {})}
+        return {
+            "symbol": symbol, "status": "Trading", "contractType": "LinearPerpetual",
+            "priceFilter": {"tickSize": spec["tickSize"]},
+            "lotSizeFilter": {"qtyStep": spec["qtyStep"],
+                              "minOrderQty": spec["minOrderQty"],
+                              "maxOrderQty": "1000000"},
+            "leverageFilter": {"minLeverage": "1", "maxLeverage": "100"},
+        }
+
+    def add_candle(self, symbol: str, candle: dict) -> None:
+        with self.lock:
+            self.candles.setdefault(symbol, []).append(candle)
+        self.set_price(symbol, candle["close"])
+
+    def set_price(self, symbol: str, price: float) -> None:
+        with self.lock:
+            self.prices[symbol] = price
+            for order in list(self.orders.values()):
+                if order["symbol"] == symbol and order["orderStatus"] in ("New", "Untriggered"):
+                    self._try_fill(order, price)
+            pos = self.positions.get(symbol)
+            if pos and pos["size"]:
+                self._emit("position", [self._position_view(symbol)])
+
+    # ---------- ордера ----------
+
+    def place_order(self, p: dict) -> dict:
+        symbol = p["symbol"]
+        with self.lock:
+            link_id = p.get("orderLinkId") or ""
+            if link_id and any(o["orderLinkId"] == link_id for o in self.orders.values()):
+                return _err(110072, "OrderLinkedID is duplicate")
+            price = self.prices.get(symbol)
+            if price is None:
+                return _err(10001, f"symbol {symbol} has no price")
+            now = _now_ms()
+            trigger = p.get("triggerPrice")
+            order = {
+                "orderId": str(uuid.uuid4()), "orderLinkId": link_id,
+                "symbol": symbol, "side": p["side"], "orderType": p.get("orderType", "Market"),
+                "qty": str(p["qty"]), "price": str(p.get("price", "0")),
+                "triggerPrice": str(trigger or ""),
+                "triggerDirection": int(p.get("triggerDirection") or 0),
+                "reduceOnly": str(p.get("reduceOnly", False)).lower() == "true",
+                "orderStatus": "Untriggered" if trigger else "New",
+                "stopOrderType": "Stop" if trigger else "",
+                "cumExecQty": "0", "avgPrice": "", "createdTime": str(now),
+                "updatedTime": str(now), "category": "linear",
+            }
+            self.orders[order["orderId"]] = order
+            self._emit("order", [dict(order)])
+            self._try_fill(order, price)
+            return ok({"orderId": order["orderId"], "orderLinkId": link_id})
+
+    def amend_order(self, p: dict) -> dict:
+        with self.lock:
+            order = self._find_order(p)
+            if not order or order["orderStatus"] not in ("New", "Untriggered"):
+                return _err(110001, "Order does not exist")
+            for key in ("triggerPrice", "price", "qty"):
+                if p.get(key) is not None:
+                    order[key] = str(p[key])
+            order["updatedTime"] = str(_now_ms())
+            self._emit("order", [dict(order)])
+            self._try_fill(order, self.prices[order["symbol"]])
+            return ok({"orderId": order["orderId"], "orderLinkId": order["orderLinkId"]})
+
+    def cancel_order(self, p: dict) -> dict:
+        with self.lock:
+            order = self._find_order(p)
+            if not order or order["orderStatus"] not in ("New", "Untriggered"):
+                return _err(110001, "Order does not exist")
+            self._set_status(order, "Cancelled")
+            return ok({"orderId": order["orderId"], "orderLinkId": order["orderLinkId"]})
+
+    def cancel_all(self, p: dict) -> dict:
+        with self.lock:
+            cancelled = []
+            for order in self.orders.values():
+                if order["symbol"] == p.get("symbol") and \
+                        order["orderStatus"] in ("New", "Untriggered"):
+                    self._set_status(order, "Cancelled")
+                    cancelled.append({"orderId": order["orderId"],
+                                      "orderLinkId": order["orderLinkId"]})
+            return ok({"list": cancelled, "success": "1"})
+
+    def query_orders(self, p: dict, open_only: bool) -> dict:
+        with self.lock:
+            rows = [dict(o) for o in self.orders.values()
+                    if (not p.get("symbol") or o["symbol"] == p["symbol"])
+                    and (not p.get("orderId") or o["orderId"] == p["orderId"])
+                    and (not p.get("orderLinkId") or o["orderLinkId"] == p["orderLinkId"])
+                    and (o["orderStatus"] in ("New", "Untriggered", "PartiallyFilled")) == open_only]
+        return ok(_page(rows, p, "createdTime"))
+
+    def _find_order(self, p: dict) -> dict | None:
+        if p.get("orderId"):
+            return self.orders.get(p["orderId"])
+        for o in self.orders.values():
+            if p.get("orderLinkId") and o["orderLinkId"] == p["orderLinkId"]:
+                return o
+        return None
+
+    def _set_status(self, order: dict, status: str) -> None:
+        order["orderStatus"] = status
+        order["updatedTime"] = str(_now_ms())
+        self._emit("order", [dict(order)])
+
+    def _try_fill(self, order: dict, price: float) -> None:
+        if order["orderStatus"] == "Untriggered":
+            trigger = float(order["triggerPrice"])
+            direction = order["triggerDirection"]
+            if (direction == 1 and price >= trigger) or (direction == 2 and price <= trigger):
+                order["orderStatus"] = "New"
+                order["orderType"] = "Market"
+            else:
+                return
+        if order["orderType"] == "Limit":
+            limit = float(order["price"])
+            if (order["side"] == "Buy" and price > limit) or \
+                    (order["side"] == "Sell" and price < limit):
+                return
+            self._fill(order, limit, self.maker_fee)
+        else:
+            self._fill(order, price, self.taker_fee)
+
+    def _fill(self, order: dict, price: float, fee_rate: float) -> None:
+        symbol = order["symbol"]
+        qty = float(order["qty"])
+        pos = self.positions.setdefault(symbol, {"size": 0.0, "avg": 0.0, "leverage": 1.0})
+        signed = qty if order["side"] == "Buy" else -qty
+        if order["reduceOnly"]:
+            if pos["size"] == 0 or (pos["size"] > 0) == (signed > 0):
+                self._set_status(order, "Deactivated")
+                return
+            qty = min(qty, abs(pos["size"]))
+            signed = qty if signed > 0 else -qty
+
+        now = _now_ms()
+        fee = qty * price * fee_rate
+        realised = self._apply_fill(symbol, pos, signed, price, order)
+        self.balance += realised - fee
+
+        order.update(orderStatus="Filled", cumExecQty=str(qty), avgPrice=str(price),
+                     cumExecFee=str(fee), updatedTime=str(now))
+        execution = {
+            "symbol": symbol, "orderId": order["orderId"], "orderLinkId": order["orderLinkId"],
+            "side": order["side"], "execId": str(uuid.uuid4()), "execPrice": str(price),
+            "execQty": str(qty), "execFee": str(fee), "execType": "Trade",
+            "execPnl": str(realised),
+            "execTime": str(now), "orderType": order["orderType"], "category": "linear",
+        }
+        self.executions.append(execution)
+        self._emit("execution", [execution])
+        self._emit("order", [dict(order)])
+        self._emit("position", [self._position_view(symbol)])
+        self._emit("wallet", [self._wallet_view()])
+
+    def _apply_fill(self, symbol, pos, signed, price, order) -> float:
+        size = pos["size"]
+        if size == 0 or (size > 0) == (signed > 0):
+            total = abs(size) + abs(signed)
+            pos["avg"] = (pos["avg"] * abs(size) + price * abs(signed)) / total
+            pos["size"] = size + signed
+            return 0.0
+        closed = min(abs(size), abs(signed))
+        realised = (price - pos["avg"]) * closed * (1 if size > 0 else -1)
+        self.closed_pnl.append({
+            "symbol": symbol, "orderId": order["orderId"], "side": order["side"],
+            "qty": str(closed), "closedSize": str(closed), "orderType": order["orderType"],
+            "avgEntryPrice": str(pos["avg"]), "avgExitPrice": str(price),
+            "closedPnl": str(realised), "leverage": str(pos["leverage"]),
+            "createdTime": str(_now_ms()), "updatedTime": str(_now_ms()),
+        })
+        pos["size"] = size + signed
+        if abs(pos["size"]) < 1e-12:
+            pos["size"], pos["avg"] = 0.0, 0.0
+        elif (pos["size"] > 0) != (size > 0):
+            pos["avg"] = price       # позиция развернулась
+        return realised
+
+    # ---------- представления ----------
+
+    def _position_view(self, symbol: str) -> dict:
+        pos = self.positions.get(symbol, {"size": 0.0, "avg": 0.0, "leverage": 1.0})
+        price = self.prices.get(symbol, 0.0)
+        size = pos["size"]
+        return {
+            "symbol": symbol, "positionIdx": 0,
+            "side": "Buy" if size > 0 else "Sell" if size < 0 else "",
+            "size": str(abs(size)), "avgPrice": str(pos["avg"]),
+            "entryPrice": str(pos["avg"]), "leverage": str(pos["leverage"]),
+            "markPrice": str(price),
+            "unrealisedPnl": str((price - pos["avg"]) * size if size else 0.0),
+            "updatedTime": str(_now_ms()), "category": "linear",
+        }
+
+    def _wallet_view(self) -> dict:
+        upnl = sum((self.prices.get(s, 0.0) - p["avg"]) * p["size"]
+                   for s, p in self.positions.items() if p["size"])
+        equity = self.balance + upnl
+        return {"accountType": "UNIFIED", "totalEquity": str(equity),
+                "totalWalletBalance": str(self.balance),
+                "totalAvailableBalance": str(equity),
+                "coin": [{"coin": "USDT", "equity": str(equity),
+                          "walletBalance": str(self.balance)}]}
+
+    def wallet_balance(self, p: dict) -> dict:
+        with self.lock:
+            return ok({"list": [self._wallet_view()]})
+
+    def execution_list(self, p: dict) -> dict:
+        with self.lock:
+            rows = _by_symbol(self.executions, p)
+        return ok(_page(rows, p, "execTime"))
+
+    def closed_pnl_list(self, p: dict) -> dict:
+        with self.lock:
+            rows = _by_symbol(self.closed_pnl, p)
+        return ok(_page(rows, p, "updatedTime"))
+
+    def positions_list(self, p: dict) -> dict:
+        with self.lock:
+            symbols = [p["symbol"]] if p.get("symbol") else list(self.positions)
+            rows = [self._position_view(s) for s in symbols]
+        return ok({"category": "linear", "list": rows, "nextPageCursor": ""})
+
+    def set_leverage(self, p: dict) -> dict:
+        with self.lock:
+            pos = self.positions.setdefault(
+                p["symbol"], {"size": 0.0, "avg": 0.0, "leverage": 1.0})
+            new = float(p["buyLeverage"])
+            if new == pos["leverage"]:
+                return _err(110043, "leverage not modified")
+            pos["leverage"] = new
+            self._emit("position", [self._position_view(p["symbol"])])
+        return ok()
+
+    def kline(self, p: dict) -> dict:
+        symbol = p["symbol"]
+        with self.lock:
+            candles = list(self.candles.get(symbol, []))
+        start = int(p.get("start", 0))
+        end = int(p.get("end", 2 ** 62))
+        limit = int(p.get("limit", 200))
+        rows = [c for c in candles if start <= c["timestamp"] <= end][-limit:]
+        rows.reverse()
+        return ok({"symbol": symbol, "category": "linear", "list": [
+            [str(c["timestamp"]), str(c["open"]), str(c["high"]), str(c["low"]),
+             str(c["close"]), str(c["volume"]), str(c["volume"] * c["close"])]
+            for c in rows]})
+
+    def tickers(self, p: dict) -> dict:
+        with self.lock:
+            symbols = [p["symbol"]] if p.get("symbol") else list(self.prices)
+            rows = [{"symbol": s, "lastPrice": str(self.prices[s]),
+                     "markPrice": str(self.prices[s])}
+                    for s in symbols if s in self.prices]
+        return ok({"category": "linear", "list": rows})
+
+    def _emit(self, topic: str, data: list) -> None:
+        for listener in self.listeners:
+            listener(topic, data)
+
+
+class RateLimiter:
+    """Token bucket на все запросы: при исчерпании — retCode 10006."""
+
+    def __init__(self, per_second: float):
+        self.rate = per_second
+        self.tokens = per_second
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class FaultModel:
+    """Задержка, джиттер и инъекция ошибок для REST и WS."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 timeout_rate=0.0, timeout_s=15.0, rate_limit=0.0, seed=None):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_s = timeout_s
+        self.limiter = RateLimiter(rate_limit)
+        self.random = random.Random(seed)
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+
+def make_rest_handler(exchange: FakeExchange, faults: FaultModel):
+    routes = {
+        ("GET", "/v5/market/time"): lambda p: ok({
+            "timeSecond": str(int(time.time())),
+            "timeNano": str(time.time_ns())}),
+        ("GET", "/v5/market/kline"): exchange.kline,
+        ("GET", "/v5/market/tickers"): exchange.tickers,
+        ("GET", "/v5/market/instruments-info"): lambda p: ok({
+            "category": "linear", "list": [exchange.instrument(p["symbol"])]}),
+        ("POST", "/v5/order/create"): exchange.place_order,
+        ("POST", "/v5/order/amend"): exchange.amend_order,
+        ("POST", "/v5/order/cancel"): exchange.cancel_order,
+        ("POST", "/v5/order/cancel-all"): exchange.cancel_all,
+        ("GET", "/v5/order/realtime"): lambda p: exchange.query_orders(p, True),
+        ("GET", "/v5/order/history"): lambda p: exchange.query_orders(p, False),
+        ("GET", "/v5/position/list"): exchange.positions_list,
+        ("POST", "/v5/position/set-leverage"): exchange.set_leverage,
+        ("GET", "/v5/account/wallet-balance"): exchange.wallet_balance,
+        ("GET", "/v5/position/closed-pnl"): exchange.closed_pnl_list,
+        ("GET", "/v5/execution/list"): exchange.execution_list,
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            self._dispatch("GET", url.path, params)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b"{}"
+            self._dispatch("POST", urlparse(self.path).path, json.loads(body or b"{}"))
+
+        def _dispatch(self, method, path, params):
+            time.sleep(faults.delay())
+            route = routes.get((method, path))
+            headers = {}
+            if route is None:
+                self._send(404, _err(10001, f"unknown endpoint {path}"))
+                return
+            if not faults.limiter.allow():
+                headers["X-Bapi-Limit-Reset-Timestamp"] = str(_now_ms() + 1000)
+                self._send(200, _err(10006, "Too many visits!"), headers)
+                return
+            if faults.random.random() < faults.error_rate:
+                self._send(200, _err(10016, "Internal server error (injected)"))
+                return
+            try:
+                body = route(params)
+            except KeyError as e:
+                body = _err(10001, f"missing parameter {e}")
+            # запрос выполнен, но ответ «теряется» — проверка идемпотентности
+            if faults.random.random() < faults.timeout_rate:
+                time.sleep(faults.timeout_s)
+            self._send(200, body, headers)
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            logging.debug("REST " + fmt % args)
+
+    return Handler
+
+
+def _by_symbol(rows: list, p: dict) -> list:
+    return [r for r in rows if not p.get("symbol") or r["symbol"] == p["symbol"]]
+
+
+class WsHub:
+    """Публичные и приватные WS-подключения и рассылка по топикам."""
+
+    def __init__(self, exchange: FakeExchange, faults: FaultModel):
+        self.exchange = exchange
+        self.faults = faults
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.subscribers: dict = {}     # connection -> (set(topics), queue)
+        self.conn_ids = itertools.count(1)
+        exchange.listeners.append(self._on_private_event)
+
+    async def handler(self, connection):
+        private = connection.request.path.rstrip("/").endswith("/private")
+        conn_id = f"fake-{next(self.conn_ids)}"
+        topics, queue = set(), asyncio.Queue()
+        self.subscribers[connection] = (topics, queue)
+        sender = asyncio.create_task(self._sender(connection, queue))
+        try:
+            async for raw in connection:
+                msg = json.loads(raw)
+                op = msg.get("op")
+                reply = {"success": True, "ret_msg": "", "conn_id": conn_id,
+                         "req_id": msg.get("req_id", ""), "op": op}
+                if op == "auth":
+                    pass
+                elif op == "subscribe":
+                    topics.update(msg.get("args", []))
+                elif op == "unsubscribe":
+                    topics.difference_update(msg.get("args", []))
+                elif op == "ping":
+                    if private:
+                        reply = {"req_id": msg.get("req_id", ""), "op": "pong",
+                                 "args": [str(_now_ms())], "conn_id": conn_id}
+                    else:
+                        reply["ret_msg"] = "pong"
+                await connection.send(json.dumps(reply))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            sender.cancel()
+            self.subscribers.pop(connection, None)
+
+    async def _sender(self, connection, queue):
+        # сообщения уходят строго по порядку, каждое не раньше своего due
+        while True:
+            due, payload = await queue.get()
+            wait = due - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await connection.send(payload)
+
+    def publish(self, topic: str, data, msg_type: str = "snapshot") -> None:
+        """Вызывается только из потока event loop."""
+        payload = None
+        for topics, queue in self.subscribers.values():
+            if topic in topics:
+                if payload is None:
+                    payload = json.dumps({"topic": topic, "type": msg_type,
+                                          "ts": _now_ms(), "data": data})
+                queue.put_nowait((time.monotonic() + self.faults.delay(), payload))
+
+    def _on_private_event(self, topic, data):
+        if self.loop is None:
+            return
+        payload = {"id": str(uuid.uuid4()), "topic": topic,
+                   "creationTime": _now_ms(), "data": data}
+        self.loop.call_soon_threadsafe(self._publish_private, topic, payload)
+
+    def _publish_private(self, topic, payload):
+        text = json.dumps(payload)
+        for topics, queue in self.subscribers.values():
+            if topic in topics:
+                queue.put_nowait((time.monotonic() + self.faults.delay(), text))
+
+
+def load_replay(path: str) -> list[dict]:
+    candles = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            candles.append({k: float(row[k]) for k in ("open", "high", "low", "close", "volume")}
+                           | {"timestamp": int(row["timestamp"])})
+    candles.sort(key=lambda c: c["timestamp"])
+    return candles
+
+
+def random_walk(start_price: float, interval_ms: int, seed=None, history: int = 0):
+    """Бесконечные свечи; первые history заканчиваются текущей (незакрытой) свечой."""
+    rnd = random.Random(seed)
+    ts = (_now_ms() // interval_ms - history) * interval_ms
+    price = start_price
+    while True:
+        close = price * (1 + rnd.gauss(0, 0.002))
+        yield {"timestamp": ts, "open": price, "high": max(price, close) * (1 + abs(rnd.gauss(0, 0.001))),
+               "low": min(price, close) * (1 - abs(rnd.gauss(0, 0.001))),
+               "close": close, "volume": abs(rnd.gauss(100, 30))}
+        price, ts = close, ts + interval_ms
+
+
+async def drive_market(exchange: FakeExchange, hub: WsHub, symbol: str, interval: str,
+                       candles, speed: float, ticks: int, history: int, seed=None):
+    """
+    Проигрывает свечи: на каждую — ticks промежуточных пушей (confirm=false)
+    и один закрывающий. Первые history свечей сразу кладутся в историю REST.
+    Промежуточные цены — из своего Random(seed): с --seed прогон повторяем.
+    """
+    rnd = random.Random(seed)
+    interval_ms = int(interval) * 60_000
+    topic = f"kline.{interval}.{symbol}"
+    candles = iter(candles)
+    for candle in itertools.islice(candles, history):
+        exchange.add_candle(symbol, candle)
+    step = 1.0 / speed / (ticks + 1)
+    for candle in candles:
+        path = [candle["open"]] + [
+            rnd.uniform(candle["low"], candle["high"]) for _ in range(ticks - 1)
+        ] + [candle["close"]]
+        for i, price in enumerate(path):
+            confirm = i == len(path) - 1
+            exchange.set_price(symbol, price)
+            hub.publish(f"tickers.{symbol}", {"symbol": symbol, "lastPrice": str(price)})
+            hub.publish(topic, [{
+                "start": candle["timestamp"], "end": candle["timestamp"] + interval_ms - 1,
+                "interval": interval, "open": str(candle["open"]),
+                "close": str(price), "high": str(candle["high"]), "low": str(candle["low"]),
+                "volume": str(candle["volume"] * (i + 1) / len(path)),
+                "turnover": str(candle["volume"] * price), "confirm": confirm,
+                "timestamp": _now_ms()}])
+            if confirm:
+                exchange.add_candle(symbol, candle)
+            await asyncio.sleep(step)
+    logging.info("fake_exchange: запись свечей закончилась")
+
+
+async def run(args):
+    exchange = FakeExchange(balance=args.balance)
+    faults = FaultModel(args.latency_ms, args.jitter_ms, args.error_rate,
+                        args.timeout_rate, rate_limit=args.rate_limit, seed=args.seed)
+    hub = WsHub(exchange, faults)
+    hub.loop = asyncio.get_running_loop()
+
+    rest = ThreadingHTTPServer((args.host, args.rest_port), make_rest_handler(exchange, faults))
+    threading.Thread(target=rest.serve_forever, daemon=True).start()
+
+    if args.replay:
+        candles = load_replay(args.replay)
+    else:
+        candles = random_walk(args.start_price, int(args.interval) * 60_000, args.seed,
+                              history=args.history)
+
+    async with serve(hub.handler, args.host, args.ws_port):
+        logging.info(f"fake_exchange: REST http://{args.host}:{args.rest_port}, "
+                     f"WS ws://{args.host}:{args.ws_port}/v5/public/linear | /v5/private")
+        await drive_market(exchange, hub, args.symbol, args.interval, candles,
+                           args.speed, args.ticks, args.history, seed=args.seed)
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный стенд Bybit v5")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--rest-port", type=int, default=8080)
+    parser.add_argument("--ws-port", type=int, default=8081)
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--interval", default="5")
+    parser.add_argument("--replay", help="CSV со свечами (timestamp,open,high,low,close,volume)")
+    parser.add_argument("--history", type=int, default=1200,
+                        help="сколько свечей сразу доступно через /v5/market/kline")
+    parser.add_argument("--start-price", type=float, default=60000.0)
+    parser.add_argument("--speed", type=float, default=1.0, help="свечей в секунду")
+    parser.add_argument("--ticks", type=int, default=5, help="пушей на свечу")
+    parser.add_argument("--balance", type=float, default=10000.0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="запросов/сек, 0 — без лимита")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# kline_decoder.py
+"""
+Декодирование kline-пушей публичного WebSocket.
+
+Используется самый быстрый доступный парсер: orjson, затем msgspec
+(сразу в типизированную структуру), иначе стандартный json. Промежуточные
+обновления свечи (confirm=false) отбрасываются дешёвой проверкой подстроки,
+без полного разбора JSON.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+if msgspec is not None:
+    class _Kline(msgspec.Struct):
+        start: int
+        interval: str
+        open: float
+        high: float
+        low: float
+        close: float
+        volume: float
+        confirm: bool = False
+        timestamp: int = 0
+
+    class _KlineMessage(msgspec.Struct):
+        topic: str = ""
+        ts: int = 0
+        data: list[_Kline] = []
+
+    # strict=False: Bybit присылает числа строками, msgspec сам приведёт к float
+    _msgspec_decoder = msgspec.json.Decoder(_KlineMessage, strict=False)
+
+
+_LOADERS = {"json": json.loads}
+if msgspec is not None:
+    _LOADERS["msgspec"] = msgspec.json.decode
+if orjson is not None:
+    _LOADERS["orjson"] = orjson.loads
+
+DECODER = "orjson" if orjson else "msgspec" if msgspec else "json"
+loads = _LOADERS[DECODER]
+
+_KLINE_MARK = '"topic":"kline.'
+_UNCONFIRMED = ('"confirm":false', '"confirm": false')
+_CONFIRMED = ('"confirm":true', '"confirm": true')
+
+
+def _contains(raw, markers) -> bool:
+    if isinstance(raw, (bytes, bytearray)):
+        return any(m.encode() in raw for m in markers)
+    return any(m in raw for m in markers)
+
+
+class KlineDecoder:
+    """
+    Превращает сырые kline-кадры в записи свечей:
+    {"symbol", "interval", "timestamp" (начало свечи), "open", "high", "low",
+    "close", "volume", "confirm", "ts" (время пуша на бирже)}.
+    """
+
+    def __init__(self, closed_only: bool = True, backend: str = DECODER):
+        if backend not in _LOADERS:
+            raise ValueError(f"decoder backend '{backend}' is not installed")
+        self.closed_only = closed_only
+        self.backend = backend
+        self._loads = _LOADERS[backend]
+        self.frames = 0
+        self.skipped_unconfirmed = 0
+        self.decoded = 0
+
+    def is_kline(self, raw) -> bool:
+        return _contains(raw, (_KLINE_MARK, _KLINE_MARK.replace(':', ': ', 1)))
+
+    def decode(self, raw) -> list[dict]:
+        """Свечи из кадра; [] для служебных и отброшенных сообщений."""
+        self.frames += 1
+        if not self.is_kline(raw):
+            return []
+        if self.closed_only and _contains(raw, _UNCONFIRMED) \
+                and not _contains(raw, _CONFIRMED):
+            self.skipped_unconfirmed += 1
+            return []
+
+        if self.backend == "msgspec":
+            candles = self._decode_msgspec(raw)
+        else:
+            candles = self._decode_dict(self._loads(raw))
+        if self.closed_only:
+            candles = [c for c in candles if c["confirm"]]
+        self.decoded += len(candles)
+        return candles
+
+    def _decode_msgspec(self, raw) -> list[dict]:
+        msg = _msgspec_decoder.decode(raw)
+        symbol = msg.topic.rsplit(".", 1)[-1]
+        return [{
+            "symbol": symbol, "interval": k.interval, "timestamp": k.start,
+            "open": k.open, "high": k.high, "low": k.low, "close": k.close,
+            "volume": k.volume, "confirm": k.confirm, "ts": msg.ts or k.timestamp,
+        } for k in msg.data]
+
+    @staticmethod
+    def _decode_dict(msg: dict) -> list[dict]:
+        symbol = msg.get("topic", "").rsplit(".", 1)[-1]
+        ts = msg.get("ts", 0)
+        return [{
+            "symbol": symbol, "interval": k["interval"], "timestamp": int(k["start"]),
+            "open": float(k["open"]), "high": float(k["high"]), "low": float(k["low"]),
+            "close": float(k["close"]), "volume": float(k["volume"]),
+            "confirm": bool(k.get("confirm")), "ts": ts or int(k.get("timestamp", 0)),
+        } for k in msg.get("data", [])]
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "frames": self.frames,
+            "skipped_unconfirmed": self.skipped_unconfirmed,
+            "decoded": self.decoded,
+        }
@@ -0,0 +1,136 @@
+# latency_monitor.py
+import time
+from collections import deque
+
+WINDOW = 500                 # последних замеров в скользящем окне
+MAX_MISSED_PONGS = 2         # подряд неотвеченных ping до переподключения
+MAX_RTT = 3.0                # сек., p95 RTT ping/pong
+MAX_EXCHANGE_LAG = 3.0       # сек., p95 задержки биржа -> приём
+MAX_PROCESSING_LAG = 5.0     # сек., p95 задержки приём -> обработано
+MIN_SAMPLES = 100            # меньше замеров — порогов по p95 не проверяем
+
+
+class RollingWindow:
+    """Скользящее окно замеров с перцентилями."""
+
+    def __init__(self, size: int = WINDOW):
+        self.values: deque = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self.values.append(value)
+
+    def percentile(self, p: float) -> float | None:
+        """Линейная интерполяция между соседними рангами, а не ближайший сверху."""
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        rank = (len(ordered) - 1) * p
+        low = int(rank)
+        high = min(low + 1, len(ordered) - 1)
+        return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+    def stats(self) -> dict:
+        return {
+            "count": len(self.values),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": max(self.values) if self.values else None,
+        }
+
+
+class LatencyMonitor:
+    """
+    Задержки одного WS-подключения: RTT по парам ping/pong (сопоставление
+    по req_id), задержка от ts биржи до приёма и от приёма до окончания
+    обработки. check() возвращает причину, если пора переподключаться, —
+    только сетевые признаки; медленная обработка — наша очередь, новое
+    соединение её не ускорит, поэтому о ней сообщает check_processing().
+    """
+
+    def __init__(self, name: str, clock=time.time):
+        self.name = name
+        self.clock = clock
+        self.rtt = RollingWindow()
+        self.exchange_lag = RollingWindow()
+        self.processing_lag = RollingWindow()
+        self._pending_pings: dict[str, float] = {}
+        self._ping_seq = 0
+        self.missed_pongs = 0
+
+    def reset(self) -> None:
+        """Новое соединение: старые ping уже не ответят, окна обнуляем."""
+        self._pending_pings.clear()
+        self.missed_pongs = 0
+        self.rtt = RollingWindow()
+        self.exchange_lag = RollingWindow()
+        self.processing_lag = RollingWindow()
+
+    def next_ping(self) -> str:
+        """req_id для очередного ping; неотвеченный предыдущий — пропуск."""
+        if self._pending_pings:
+            self.missed_pongs += 1
+            self._pending_pings.clear()
+        self._ping_seq += 1
+        req_id = f"{self.name}-{self._ping_seq}"
+        self._pending_pings[req_id] = self.clock()
+        return req_id
+
+    def on_pong(self, req_id: str) -> None:
+        sent_at = self._pending_pings.pop(req_id, None)
+        if sent_at is not None:
+            self.rtt.add(self.clock() - sent_at)
+            self.missed_pongs = 0
+
+    def on_message(self, exchange_ts_ms: int, received_at: float) -> None:
+        if exchange_ts_ms:
+            self.exchange_lag.add(received_at - exchange_ts_ms / 1000)
+
+    def on_processed(self, received_at: float) -> None:
+        self.processing_lag.add(self.clock() - received_at)
+
+    def check(self) -> str | None:
+        if self.missed_pongs >= MAX_MISSED_PONGS:
+            return f"нет pong на {self.missed_pongs} ping подряд"
+        for label, window, limit in (
+                ("RTT", self.rtt, MAX_RTT),
+                ("задержка биржа→приём", self.exchange_lag, MAX_EXCHANGE_LAG)):
+            reason = _over_limit(label, window, limit)
+            if reason:
+                return reason
+        return None
+
+    def check_processing(self) -> str | None:
+        """Причина для алерта (без переподключения), если обработка отстаёт."""
+        return _over_limit("задержка приём→обработка", self.processing_lag,
+                           MAX_PROCESSING_LAG)
+
+    def stats(self) -> dict:
+        return {
+            "missed_pongs": self.missed_pongs,
+            "rtt": self.rtt.stats(),
+            "exchange_lag": self.exchange_lag.stats(),
+            "processing_lag": self.processing_lag.stats(),
+        }
+
+    def summary(self) -> str:
+        def fmt(window):
+            p50, p95 = window.percentile(0.5), window.percentile(0.95)
+            if p50 is None:
+                return "—"
+            return f"p50 {p50 * 1000:.0f} мс / p95 {p95 * 1000:.0f} мс"
+        return (
+            f"RTT: {fmt(self.rtt)}\n"
+            f"Биржа→приём: {fmt(self.exchange_lag)}\n"
+            f"Приём→обработка: {fmt(self.processing_lag)}\n"
+            f"Пропущено pong: {self.missed_pongs}"
+        )
+
+
+def _over_limit(label: str, window: RollingWindow, limit: float) -> str | None:
+    if len(window.values) < MIN_SAMPLES:
+        return None
+    p95 = window.percentile(0.95)
+    if p95 > limit:
+        return f"{label} p95 {p95:.2f} с > {limit} с"
+    return None
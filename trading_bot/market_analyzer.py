@@ -3,6 +3,10 @@ from typing import List, Dict, Optional
 from .position_manager import PositionManager
 
 import logging
+import time
+
+# не чаще одной предварительной оценки формирующейся свечи за столько секунд
+PROVISIONAL_MIN_INTERVAL = 2.0
 
 
 class PatternDetector:
@@ -19,6 +23,12 @@ class PatternDetector:
     def detect_pattern(self) -> Optional[Dict]:
         pass
 
+    def preview(self, candle: Dict) -> Optional[Dict]:
+        """Паттерн с формирующейся свечой, не трогая сохранённые свечи."""
+        overlay = PatternDetector()
+        overlay.candles = self.candles[-4:] + [candle]
+        return overlay.detect_pattern()
+
 
 class ZoneBuilder:
     def __init__(self, daily_candles: List[Dict], tolerance: float = 0.005):
@@ -72,6 +82,14 @@ class ZoneBuilder:
         # подсчёт касаний по цене закрытия
         self._count_touches(candle['close'])
 
+    def preview(self, candle: Dict) -> "ZoneBuilder":
+        """Зоны так, будто candle уже добавлена: копия, сохранённые зоны не меняются."""
+        overlay = ZoneBuilder([], self.tolerance)
+        overlay._support_zones = [dict(z) for z in self._support_zones]
+        overlay._resistance_zones = [dict(z) for z in self._resistance_zones]
+        overlay.update_zones(candle)
+        return overlay
+
     def _count_touches(self, price: float):
         for z in self._support_zones:
             if abs(price - z['level'])/z['level'] <= self.tolerance:
@@ -96,11 +114,22 @@ class VolumeAnalyzer:
         self.high_mult = high_multiplier
         self.low_mult = low_multiplier
         self.volume_history: List[float] = []
+        self._sum = 0.0
 
     def update(self, volume: float):
         self.volume_history.append(volume)
         if len(self.volume_history) > self.window:
             self.volume_history.pop(0)
+        self._sum = sum(self.volume_history)
+
+    def preview_is_high_volume(self, volume: float) -> bool:
+        """is_high_volume так, будто volume уже добавлен в окно; O(1)."""
+        history = self.volume_history
+        if len(history) + 1 < self.window:
+            return False
+        dropped = history[0] if len(history) >= self.window else 0.0
+        avg = (self._sum - dropped + volume) / self.window
+        return volume > avg * self.high_mult
 
     def is_high_volume(self, volume: Optional[float] = None) -> bool:
         if len(self.volume_history) < self.window:
@@ -124,6 +153,9 @@ class RSIIndicator:
         self.oversold = oversold_level
         self.close_history: List[float] = []
         self.last_rsi: Optional[float] = None
+        # суммы роста/падения по последним period-1 разностям — для preview
+        self._tail_gain = 0.0
+        self._tail_loss = 0.0
 
     def update(self, close: float):
         self.close_history.append(close)
@@ -133,6 +165,20 @@ class RSIIndicator:
             self.last_rsi = self._calculate_rsi()
         else:
             self.last_rsi = None
+        diffs = np.diff(self.close_history[-self.period:])
+        self._tail_gain = float(np.maximum(diffs, 0).sum())
+        self._tail_loss = float(np.abs(np.minimum(diffs, 0)).sum())
+
+    def preview(self, close: float) -> Optional[float]:
+        """RSI так, будто close уже добавлен; O(1), состояние не меняется."""
+        if len(self.close_history) < self.period:
+            return None
+        diff = close - self.close_history[-1]
+        avg_gain = (self._tail_gain + max(diff, 0.0)) / self.period
+        avg_loss = (self._tail_loss + max(-diff, 0.0)) / self.period
+        if avg_loss == 0:
+            return 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
 
     def _calculate_rsi(self) -> float:
         diffs = np.diff(self.close_history)
@@ -221,6 +267,28 @@ class SignalValidator:
         return None
 
 
+class _RSIView:
+    """RSI-индикатор для SignalValidator с подменённым last_rsi."""
+
+    def __init__(self, base: RSIIndicator, rsi: Optional[float]):
+        self.overbought = base.overbought
+        self.oversold = base.oversold
+        self.last_rsi = rsi
+
+    is_overbought = RSIIndicator.is_overbought
+    is_oversold = RSIIndicator.is_oversold
+
+
+class _VolumeView:
+    """Объём для SignalValidator: окно считается уже с формирующейся свечой."""
+
+    def __init__(self, base: VolumeAnalyzer):
+        self.base = base
+
+    def is_high_volume(self, volume: float) -> bool:
+        return self.base.preview_is_high_volume(volume)
+
+
 class MarketAnalyzer:
     def __init__(self, config: Dict, position_manager: PositionManager | None = None):
         self.config = config
@@ -251,6 +319,7 @@ class MarketAnalyzer:
             config.get('adx_period', 14),
             config.get('adx_threshold', 15)
         )
+        self._last_preview: tuple[int, float] | None = None   # (свеча, время оценки)
 
     def _calculate_tp_levels(self, entry: float, sl: float, direction: str) -> Dict:
         # Вычисляем риск с учётом направления
@@ -276,6 +345,47 @@ class MarketAnalyzer:
         else:
             return entry + (base_sl - entry) * adjustment
 
+    def preview_signal(self, candle: Dict) -> Dict:
+        """
+        Предварительная оценка ещё не закрытой свечи поверх сохранённого
+        состояния индикаторов. Ничего не меняет: RSI, объём, ATR и EMA
+        считаются за O(1) от закэшированных сумм, зоны — на копии. Результат
+        тот же, что даст проверка после закрытия этой свечи в generate_signal.
+        Частота ограничена по каждой свече: первый пуш новой свечи
+        оценивается всегда. Возвращает {} если оценка пропущена по частоте
+        или сигнала нет.
+        """
+        now = time.monotonic()
+        min_interval = self.config.get(
+            'provisional_min_interval', PROVISIONAL_MIN_INTERVAL)
+        last = self._last_preview
+        if last and last[0] == candle['timestamp'] and now - last[1] < min_interval:
+            return {}
+        self._last_preview = (candle['timestamp'], now)
+
+        candle = {**candle}
+        for key in ['open', 'close', 'high', 'low', 'volume']:
+            candle[key] = float(candle[key])
+
+        validator = SignalValidator(
+            self.config, self.zone_builder.preview(candle),
+            _VolumeView(self.volume_analyzer),
+            _RSIView(self.rsi_indicator,
+                     self.rsi_indicator.preview(candle['close'])))
+        signal = validator.validate(
+            self.pattern_detector.preview(candle), candle, self.prev_candle)
+        if not signal:
+            return {}
+
+        prev_close = self.prev_candle['close'] if self.prev_candle else candle['close']
+        return {
+            **signal,
+            'provisional': True,
+            'entry': candle['close'],
+            'atr': self.atr_indicator.preview(candle, prev_close),
+            **self.trend_filter.preview(candle['close']),
+        }
+
     def generate_signal(self, candle: Dict) -> Dict:
         try:
             # Преобразование данных свечи
@@ -302,6 +412,7 @@ class ATRIndicator:
         self.period = period
         self.tr_history = []
         self.last_atr = None
+        self._tail_tr = 0.0
 
     def update(self, candle, prev_close):
         tr = max(candle['high'] - candle['low'],
@@ -312,6 +423,16 @@ class ATRIndicator:
             self.tr_history.pop(0)
         if len(self.tr_history) == self.period:
             self.last_atr = np.mean(self.tr_history)
+        self._tail_tr = sum(self.tr_history[-(self.period - 1):])
+
+    def preview(self, candle, prev_close) -> Optional[float]:
+        """ATR так, будто candle уже добавлена; O(1)."""
+        if len(self.tr_history) < self.period - 1:
+            return None
+        tr = max(candle['high'] - candle['low'],
+                 abs(candle['high'] - prev_close),
+                 abs(candle['low'] - prev_close))
+        return (self._tail_tr + tr) / self.period
 
 
 class TrendFilter:
@@ -334,3 +455,16 @@ class TrendFilter:
 
     def update(self, candle: Dict) -> None:
         pass
+
+    def preview(self, close: float) -> Dict:
+        """EMA с ещё не закрытой свечой (один шаг рекурсии), ADX — последний."""
+        def step(ema, period):
+            if ema is None:
+                return None
+            k = 2 / (period + 1)
+            return ema + k * (close - ema)
+        return {
+            'ema_short': step(self.last_ema_short, self.short_period),
+            'ema_long': step(self.last_ema_long, self.long_period),
+            'adx': self.last_adx,
+        }
@@ -0,0 +1,71 @@
+# message_dedup.py
+import time
+from collections import OrderedDict
+
+
+class MessageDeduplicator:
+    """
+    Ограниченное по памяти и по времени хранилище ключей уже обработанных
+    WS-сообщений. Ключи лежат в OrderedDict в порядке вставки, поэтому
+    вытеснение самых старых и проверка/вставка — O(1), без полной очистки.
+    """
+
+    def __init__(self, max_size: int = 5000, ttl: float = 900.0, clock=time.monotonic):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._keys: OrderedDict[str, float] = OrderedDict()
+
+        self.checks = 0
+        self.hits = 0
+        self.evicted_by_size = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        self._expire(self._clock())
+        return key in self._keys
+
+    def seen(self, key: str) -> bool:
+        """
+        True — ключ уже встречался в пределах окна (дубликат).
+        False — ключ новый, он запоминается.
+        """
+        now = self._clock()
+        self._expire(now)
+        self.checks += 1
+
+        if key in self._keys:
+            self.hits += 1
+            return True
+
+        self._keys[key] = now
+        if len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+            self.evicted_by_size += 1
+        return False
+
+    def _expire(self, now: float) -> None:
+        # самые старые ключи всегда в начале — снимаем, пока не дойдём до свежих
+        keys = self._keys
+        while keys:
+            _, ts = next(iter(keys.items()))
+            if now - ts < self.ttl:
+                break
+            keys.popitem(last=False)
+            self.expired += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._keys),
+            "max_size": self.max_size,
+            "checks": self.checks,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.checks if self.checks else 0.0,
+            "evicted_by_size": self.evicted_by_size,
+            "expired": self.expired,
+        }
@@ -0,0 +1,200 @@
+# notifier.py
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+
+CHAT_INTERVAL = 1.0        # сек. между сообщениями в один чат (лимит Telegram)
+GLOBAL_INTERVAL = 1 / 30   # не больше ~30 сообщений в секунду на бота
+MAX_TEXT_LENGTH = 4096     # лимит Bot API на длину сообщения
+QUEUE_LIMIT = 1000         # при переполнении теряются самые старые
+REQUEST_TIMEOUT = 10       # сек.
+SEND_RETRIES = 3
+RETRY_BACKOFF = 1.0        # сек., первая пауза после 5xx/сетевой ошибки, дальше ×2
+
+
+class TelegramNotifier:
+    """
+    Очередь уведомлений Telegram с одним фоновым потоком-отправителем.
+
+    notify() только кладёт текст в очередь (O(1)) и сразу возвращается,
+    поэтому его можно звать из потока WS и из обработки ордеров. Поток
+    держит один requests.Session (keep-alive), соблюдает интервал между
+    сообщениями в чат и общий лимит бота, а всё, что накопилось для чата
+    за время ожидания, склеивает в одно сообщение в исходном порядке;
+    одинаковые подряд тексты сворачиваются в "текст (×N)". На 429 ждёт
+    retry_after из ответа и повторяет, на 5xx и сетевые ошибки — с
+    экспоненциальной паузой.
+    """
+
+    def __init__(self, token: str, chat_id, api_url: str = "https://api.telegram.org",
+                 chat_interval: float = CHAT_INTERVAL,
+                 queue_limit: int = QUEUE_LIMIT, session: requests.Session | None = None,
+                 sleep=time.sleep):
+        self.token = token
+        self.chat_id = chat_id
+        self.api_url = api_url.rstrip("/")
+        self.chat_interval = chat_interval
+        self.session = session or requests.Session()
+        self.sleep = sleep
+        self._queue: deque = deque()
+        self._queue_limit = queue_limit
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self._in_flight = 0
+        self._last_sent: dict = {}
+        self._last_any = 0.0
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def notify(self, text: str, chat_id=None) -> None:
+        """Ставит сообщение в очередь; не блокирует."""
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._queue) >= self._queue_limit:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append((chat_id or self.chat_id, text))
+            self.enqueued += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="telegram-notifier", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Ждёт, пока очередь опустеет; True, если успели."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.session.close()
+
+    # ---------- поток отправки ----------
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                chat_id = self._queue[0][0]
+                wait = self._wait_time(chat_id)
+                if wait > 0:
+                    # пока ждём лимит, в очередь докапывают новые сообщения
+                    self._cond.wait(wait)
+                    continue
+                texts = self._take_batch(chat_id)
+                self._in_flight += 1
+            try:
+                for text in _pack(_collapse(texts)):
+                    self._send(chat_id, text)
+            except Exception as e:
+                # поток один на весь бот: падать ему нельзя
+                self.failed += 1
+                logging.error(f"Telegram: ошибка отправки в чат {chat_id}: {e}")
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def _wait_time(self, chat_id) -> float:
+        now = time.monotonic()
+        return max(self._last_sent.get(chat_id, 0.0) + self.chat_interval - now,
+                   self._last_any + GLOBAL_INTERVAL - now)
+
+    def _take_batch(self, chat_id) -> list[str]:
+        """Снимает с головы очереди все подряд идущие сообщения этого чата."""
+        texts = []
+        while self._queue and self._queue[0][0] == chat_id:
+            texts.append(self._queue.popleft()[1])
+        self.coalesced += len(texts) - 1
+        return texts
+
+    def _send(self, chat_id, text: str) -> None:
+        url = f"{self.api_url}/bot{self.token}/sendMessage"
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+        for attempt in range(SEND_RETRIES):
+            now = time.monotonic()
+            self._last_sent[chat_id] = self._last_any = now
+            response = None
+            try:
+                self.requests += 1
+                response = self.session.post(url, json=payload, timeout=REQUEST_TIMEOUT)
+                if response.status_code == 429:
+                    retry_after = response.json().get(
+                        "parameters", {}).get("retry_after", 1)
+                    logging.warning(f"Telegram 429, ждём {retry_after} с")
+                    self.sleep(retry_after)
+                    continue
+                response.raise_for_status()
+                logging.info(f"Telegram message sent: {text}")
+                return
+            except requests.exceptions.RequestException as e:
+                status = response.status_code if response is not None else 'N/A'
+                body = response.text if response is not None else 'N/A'
+                logging.error(
+                    f"Telegram error: {e}, HTTP status: {status}, Response: {body}")
+                if response is not None and response.status_code < 500:
+                    break
+                if attempt + 1 < SEND_RETRIES:
+                    self.sleep(RETRY_BACKOFF * 2 ** attempt)
+        self.failed += 1
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queue),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+        }
+
+
+def _collapse(texts: list[str]) -> list[str]:
+    """Одинаковые подряд сообщения -> одно с счётчиком."""
+    result, count = [], 0
+    for i, text in enumerate(texts):
+        count += 1
+        if i + 1 < len(texts) and texts[i + 1] == text:
+            continue
+        result.append(f"{text} (×{count})" if count > 1 else text)
+        count = 0
+    return result
+
+
+def _pack(texts: list[str]) -> list[str]:
+    """Склеивает тексты в сообщения не длиннее MAX_TEXT_LENGTH."""
+    messages, current = [], ""
+    for text in texts:
+        text = text[:MAX_TEXT_LENGTH]
+        if current and len(current) + 2 + len(text) > MAX_TEXT_LENGTH:
+            messages.append(current)
+            current = text
+        else:
+            current = f"{current}\n\n{text}" if current else text
+    if current:
+        messages.append(current)
+    return messages
@@ -0,0 +1,190 @@
+# paper_client.py
+"""
+Бумажная торговля: тот же интерфейс, что у BybitClient, но ордера
+исполняются локально.
+
+Матчинг — FakeExchange из стенда (рыночные, лимитные, условные ордера,
+позиции, кошелёк, комиссии), цены — из публичного потока свечей через
+on_price(). Приватных WS и торговых REST-запросов нет: события ордеров,
+исполнений, позиций и кошелька FakeExchange отдаёт в тот же WsEventBridge,
+что и настоящий приватный WS, поэтому PositionManager и AccountState
+работают без изменений. С биржи читаются только свечи и параметры
+инструментов (последние — один раз на символ на процесс).
+
+В одном процессе можно держать сколько угодно PaperClient с разными
+балансами, задержками и комиссиями.
+"""
+import logging
+import random
+import threading
+import time
+
+from pybit.exceptions import InvalidRequestError
+
+from .bybit_client import BybitClient, make_http_client
+from .fake_exchange import FakeExchange, TAKER_FEE, MAKER_FEE, ok
+from . import data_storage
+
+PAPER_BALANCE = 10000.0
+PAPER_LATENCY_MS = 50.0    # путь ордера до "биржи": исполнение по цене после задержки
+PAPER_JITTER_MS = 20.0
+
+_market = None                        # публичный HTTP: свечи и инструменты
+_instruments: dict[str, dict] = {}    # symbol -> instrument, общий для всех бумажных счетов
+_market_lock = threading.Lock()
+
+
+def _public_market():
+    global _market
+    with _market_lock:
+        if _market is None:
+            _market = make_http_client()
+        return _market
+
+
+class PaperHttp:
+    """
+    Подмножество pybit HTTP поверх FakeExchange. Ошибки — как у pybit:
+    InvalidRequestError с кодом Bybit. Изменяющие запросы ждут модельную
+    задержку (в потоке вызывающего), чтения отвечают сразу из памяти.
+    """
+
+    def __init__(self, exchange: FakeExchange, market=None,
+                 latency_ms: float = PAPER_LATENCY_MS, jitter_ms: float = PAPER_JITTER_MS,
+                 seed=None):
+        self.exchange = exchange
+        self.market = market
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.random = random.Random(seed)
+
+    def _call(self, func, params: dict, write: bool = False) -> dict:
+        if write and (self.latency or self.jitter):
+            time.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+        resp = func(params)
+        if resp.get("retCode") != 0:
+            raise InvalidRequestError(
+                request=f"paper {func.__name__}: {params}", message=resp.get("retMsg"),
+                status_code=resp.get("retCode"), time=time.strftime("%H:%M:%S"),
+                resp_headers={})
+        return resp
+
+    # ---------- ордера ----------
+
+    def place_order(self, **params) -> dict:
+        self._ensure_market(params["symbol"])
+        return self._call(self.exchange.place_order, params, write=True)
+
+    def amend_order(self, **params) -> dict:
+        return self._call(self.exchange.amend_order, params, write=True)
+
+    def cancel_order(self, **params) -> dict:
+        return self._call(self.exchange.cancel_order, params, write=True)
+
+    def cancel_all_orders(self, **params) -> dict:
+        return self._call(self.exchange.cancel_all, params, write=True)
+
+    def get_open_orders(self, **params) -> dict:
+        return self.exchange.query_orders(params, True)
+
+    def get_order_history(self, **params) -> dict:
+        return self.exchange.query_orders(params, False)
+
+    # ---------- счёт ----------
+
+    def get_positions(self, **params) -> dict:
+        return self.exchange.positions_list(params)
+
+    def set_leverage(self, **params) -> dict:
+        return self._call(self.exchange.set_leverage, params, write=True)
+
+    def get_wallet_balance(self, **params) -> dict:
+        return self.exchange.wallet_balance(params)
+
+    def get_executions(self, **params) -> dict:
+        return self.exchange.execution_list(params)
+
+    def get_closed_pnl(self, **params) -> dict:
+        return self.exchange.closed_pnl_list(params)
+
+    # ---------- рынок ----------
+
+    def get_tickers(self, **params) -> dict:
+        if params.get("symbol") not in self.exchange.prices:
+            self._ensure_market(params["symbol"])
+        return self.exchange.tickers(params)
+
+    def get_instruments_info(self, **params) -> dict:
+        return ok({"category": "linear", "list": [self._instrument(params["symbol"])]})
+
+    def get_kline(self, **params) -> dict:
+        return self.market.get_kline(**params)
+
+    def _instrument(self, symbol: str) -> dict:
+        info = _instruments.get(symbol)
+        if info is None:
+            resp = self.market.get_instruments_info(category="linear", symbol=symbol)
+            info = _instruments[symbol] = resp["result"]["list"][0]
+        if symbol not in self.exchange.instruments:
+            self.exchange.instruments[symbol] = {
+                "tickSize": info["priceFilter"]["tickSize"],
+                "qtyStep": info["lotSizeFilter"]["qtyStep"],
+                "minOrderQty": info["lotSizeFilter"]["minOrderQty"],
+            }
+        return info
+
+    def _ensure_market(self, symbol: str) -> None:
+        """До первой цены из потока берём тикер один раз."""
+        self._instrument(symbol)
+        if symbol not in self.exchange.prices:
+            ticker = self.market.get_tickers(category="linear", symbol=symbol)
+            self.exchange.set_price(symbol, float(ticker["result"]["list"][0]["lastPrice"]))
+
+
+class PaperClient(BybitClient):
+    """BybitClient, у которого биржа — локальный FakeExchange."""
+
+    def __init__(self, name: str = "paper", balance: float = PAPER_BALANCE,
+                 latency_ms: float = PAPER_LATENCY_MS, jitter_ms: float = PAPER_JITTER_MS,
+                 taker_fee: float = TAKER_FEE, maker_fee: float = MAKER_FEE,
+                 journal_path: str = data_storage.TRADE_JOURNAL_FILENAME, market=None):
+        self.journal_path = journal_path
+        self.exchange = FakeExchange(balance=balance, taker_fee=taker_fee, maker_fee=maker_fee)
+        # лимитов у локальной биржи нет; приватного WS тоже — события шлёт FakeExchange
+        super().__init__(name=name, order_rate=0, http_client=PaperHttp(
+            self.exchange, market or _public_market(), latency_ms, jitter_ms))
+        self.exchange.listeners.append(self._on_exchange_event)
+
+    def _on_exchange_event(self, topic: str, data: list) -> None:
+        # вызывается под локом FakeExchange: только кладём в мост
+        self.ws_bridge.submit({"topic": topic, "creationTime": int(time.time() * 1000),
+                               "data": [dict(d) for d in data]})
+
+    def on_price(self, symbol: str, price: float) -> None:
+        """Цена из публичного потока: по ней срабатывают лимитные и условные ордера."""
+        self.exchange.set_price(symbol, float(price))
+
+    def handle_ws_message(self, message):
+        if message.get("topic") == "execution":
+            for e in message.get("data", []):
+                self._record(e)
+        super().handle_ws_message(message)
+
+    def _record(self, e: dict) -> None:
+        try:
+            data_storage.save_trade_to_journal({
+                "time": e.get("execTime"), "account": self.name,
+                "symbol": e.get("symbol"), "side": e.get("side"),
+                "order_type": e.get("orderType"), "price": e.get("execPrice"),
+                "qty": e.get("execQty"), "fee": e.get("execFee"),
+                "pnl": e.get("execPnl"), "order_link_id": e.get("orderLinkId"),
+            }, self.journal_path)
+        except OSError as err:
+            logging.error(f"Журнал сделок {self.name}: {err}")
+
+    def stats(self) -> dict:
+        wallet = self.exchange.wallet_balance({})["result"]["list"][0]
+        return {"account": self.name, "equity": float(wallet["totalEquity"]),
+                "balance": float(wallet["totalWalletBalance"]),
+                "executions": len(self.exchange.executions),
+                "closed_trades": len(self.exchange.closed_pnl)}
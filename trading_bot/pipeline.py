@@ -0,0 +1,238 @@
+# pipeline.py
+import asyncio
+import logging
+import time
+
+from . import data_storage
+from .candle_sequencer import interval_to_ms
+from .latency_monitor import RollingWindow
+
+CANDLE_QUEUE_SIZE = 64    # закрытых свечей на символ в очереди анализа
+SIGNAL_QUEUE_SIZE = 8     # сигналов в очереди исполнения
+MAX_SIGNAL_AGE = 30.0     # секунд после закрытия свечи, дальше вход не делаем
+LAG_WINDOW = 200          # сколько последних задержек держим для метрик
+STOP_CHECK_INTERVAL = 1.0 # сек. между проверками should_run без новых свечей
+
+
+class Stage:
+    """
+    Ограниченная очередь между стадиями конвейера с метриками:
+    текущая/максимальная глубина, задержка от постановки до выборки,
+    сколько элементов прошло и сколько отброшено.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.lags = RollingWindow(LAG_WINDOW)
+        self.max_depth = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def put_drop_oldest(self, item) -> None:
+        """Для синхронных производителей: при переполнении вытесняет самый старый."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait((time.monotonic(), item))
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def put(self, item) -> None:
+        """Для асинхронных производителей: ждёт места в очереди (backpressure)."""
+        await self.queue.put((time.monotonic(), item))
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def get(self):
+        enqueued_at, item = await self.queue.get()
+        self.lags.add(time.monotonic() - enqueued_at)
+        self.processed += 1
+        return item
+
+    def stats(self) -> dict:
+        lags = self.lags.values
+        return {
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "lag_avg": sum(lags) / len(lags) if lags else 0.0,
+            "lag_p95": self.lags.percentile(0.95) or 0.0,
+            "lag_max": max(lags) if lags else 0.0,
+        }
+
+
+class SignalPipeline:
+    """
+    Конвейер WS -> анализ -> исполнение.
+
+    Чтение сокета (обработчик PublicWsManager) только кладёт свечи в очередь
+    символа и никогда не ждёт. Если анализ отстал и очередь полна, самая
+    старая свеча вытесняется: секвенсор увидит разрыв и догрузит её через
+    REST, а сигнал по догруженной свече не исполняется.
+
+    Анализ идёт отдельной задачей на каждый символ; сигналы уходят в общую
+    очередь исполнения. Если исполнение занято, анализ ждёт (backpressure),
+    чтение сокета при этом продолжается. Сигнал, простоявший в очереди
+    дольше max_signal_age после закрытия свечи, отбрасывается.
+
+    Если задан prewarm, незакрытые свечи оцениваются прямо в обработчике
+    чтения через analyzer.preview_signal (O(1), с ограничением частоты), и
+    предварительный сигнал один раз на свечу передаётся в prewarm(symbol,
+    signal) — чтобы подготовить исполнение до закрытия. Оценка пропускается,
+    пока в очереди символа есть необработанные закрытые свечи.
+
+    execute(symbol, signal) — корутина, открывающая позицию;
+    should_run() — флаг торговли и авто-стоп: проверяется перед каждой
+    свечой и раз в stop_check_interval, так что остановка срабатывает,
+    не дожидаясь следующего закрытия свечи;
+    on_processed(candle) — вызывается, когда живая свеча полностью обработана;
+    save_candles — писать ли свечи в CSV (бумажным вариантам не нужно).
+    """
+
+    def __init__(self, execute, should_run=lambda: True, prewarm=None,
+                 on_processed=None, save_candles: bool = True,
+                 candle_queue_size: int = CANDLE_QUEUE_SIZE,
+                 signal_queue_size: int = SIGNAL_QUEUE_SIZE,
+                 max_signal_age: float = MAX_SIGNAL_AGE,
+                 stop_check_interval: float = STOP_CHECK_INTERVAL):
+        self.execute = execute
+        self.should_run = should_run
+        self.prewarm = prewarm
+        self.on_processed = on_processed
+        self.save_candles = save_candles
+        self.candle_queue_size = candle_queue_size
+        self.max_signal_age = max_signal_age
+        self.stop_check_interval = stop_check_interval
+        self.symbols: dict[str, dict] = {}
+        self.signals = Stage("execution", signal_queue_size)
+        self.stale_signals = 0
+        self.previews = 0
+        self.provisional_signals = 0
+        self.stopped = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def add_symbol(self, symbol: str, interval: str, analyzer, sequencer):
+        """Регистрирует символ; возвращает обработчик для PublicWsManager."""
+        stage = Stage(f"analysis:{symbol}", self.candle_queue_size)
+        self.symbols[symbol] = {
+            "interval_ms": interval_to_ms(interval),
+            "analyzer": analyzer,
+            "sequencer": sequencer,
+            "stage": stage,
+            "prewarmed": None,
+        }
+        if self._tasks:
+            self._tasks.append(asyncio.create_task(self._analyze(symbol)))
+
+        def on_candles(_topic, candles):
+            for c in candles:
+                if c["confirm"]:
+                    stage.put_drop_oldest(c)
+                elif self.prewarm is not None:
+                    self._preview(symbol, c)
+        return on_candles
+
+    def _preview(self, symbol: str, candle: dict) -> None:
+        entry = self.symbols[symbol]
+        if not entry["stage"].queue.empty() or \
+                candle["timestamp"] != entry["sequencer"].next_open:
+            return  # состояние индикаторов ещё не догнало эту свечу
+        try:
+            signal = entry["analyzer"].preview_signal(candle)
+        except Exception as e:
+            logging.error(f"Ошибка предварительной оценки {symbol}: {e}")
+            return
+        self.previews += 1
+        if not signal.get("direction"):
+            return
+        key = (candle["timestamp"], signal["direction"])
+        if entry["prewarmed"] == key:
+            return
+        entry["prewarmed"] = key
+        self.provisional_signals += 1
+        logging.info(f"Предварительный сигнал {symbol}: {signal}")
+        self.prewarm(symbol, signal)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self.stopped.clear()
+        self._tasks = [asyncio.create_task(self._analyze(s)) for s in self.symbols]
+        self._tasks.append(asyncio.create_task(self._execute()))
+        self._tasks.append(asyncio.create_task(self._watch()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.stopped.set()
+
+    async def _watch(self):
+        # стоп из Telegram или авто-стоп не должен ждать следующей свечи
+        while self.should_run():
+            await asyncio.sleep(self.stop_check_interval)
+        self.stopped.set()
+
+    async def _analyze(self, symbol: str):
+        entry = self.symbols[symbol]
+        stage, sequencer = entry["stage"], entry["sequencer"]
+        analyzer = entry["analyzer"]
+        while True:
+            live_candle = await stage.get()
+            if not self.should_run():
+                self.stopped.set()
+                return
+            try:
+                if sequencer.classify(live_candle) == "gap":
+                    # после реконнекта или вытеснения: догружаем через REST
+                    batch = await asyncio.to_thread(sequencer.accept, live_candle)
+                    logging.info(f"Секвенсор: {sequencer.stats()}")
+                else:
+                    batch = sequencer.accept(live_candle)
+
+                for candle in batch:
+                    logging.info(f"Получена новая свеча: {candle}")
+                    if self.save_candles:
+                        data_storage.save_candle_to_csv(candle)
+                    signal = analyzer.generate_signal(candle)
+                    if not signal.get("direction"):
+                        logging.info("Позиция не открывается – сигнал отсутствует.")
+                    elif candle is not live_candle:
+                        # догруженная свеча: индикаторы обновлены,
+                        # но входить по устаревшему сигналу нельзя
+                        logging.info(
+                            f"Сигнал по догруженной свече {candle['timestamp']} пропущен.")
+                    else:
+                        closed_at = (candle["timestamp"] + entry["interval_ms"]) / 1000
+                        # опорная цена и время сигнала — для статистики исполнения
+                        signal = {**signal, "signal_price": candle["close"],
+                                  "signal_time": int(time.time() * 1000)}
+                        await self.signals.put((symbol, signal, closed_at))
+                if self.on_processed is not None:
+                    self.on_processed(live_candle)
+            except Exception as e:
+                logging.error(f"Ошибка анализа {symbol}: {e}")
+
+    async def _execute(self):
+        while True:
+            symbol, signal, closed_at = await self.signals.get()
+            age = time.time() - closed_at
+            if age > self.max_signal_age:
+                self.stale_signals += 1
+                logging.warning(
+                    f"Сигнал {symbol} устарел ({age:.1f} с после закрытия свечи), пропущен.")
+                continue
+            try:
+                logging.info("Открытие позиции, т.к. сигнал сгенерирован.")
+                await self.execute(symbol, signal)
+            except Exception as e:
+                logging.error(f"Ошибка исполнения сигнала {symbol}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "analysis": {s: e["stage"].stats() for s, e in self.symbols.items()},
+            "execution": {**self.signals.stats(), "stale": self.stale_signals},
+            "provisional": {"previews": self.previews,
+                            "signals": self.provisional_signals},
+        }
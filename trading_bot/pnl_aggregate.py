@@ -0,0 +1,121 @@
+# pnl_aggregate.py
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from .closed_pnl import OVERLAP_MS, RecentIds, record_time, sync_closed_pnl
+
+PNL_STATE_FILE = "pnl_state.json"
+SEEN_LIMIT = 1000            # сколько последних orderId помним для дедупликации
+
+
+def month_key(ts_ms: int) -> str:
+    return datetime.datetime.fromtimestamp(
+        ts_ms / 1000, datetime.timezone.utc).strftime("%Y-%m")
+
+
+def month_start_ms(ts_ms: int) -> int:
+    dt = datetime.datetime.fromtimestamp(ts_ms / 1000, datetime.timezone.utc)
+    start = dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return int(start.timestamp() * 1000)
+
+
+class PnlAggregate:
+    """
+    PnL закрытых сделок по (symbol, месяц) с сохранением на диск.
+
+    Для каждого символа помнится, до какого endTime уже выбраны записи
+    closed-pnl; sync() запрашивает только новое (с небольшим перекрытием,
+    повторы отсекаются по orderId). sync вызывается при первом обращении
+    к символу, при закрытии позиции выборка общая с TradeStore (см.
+    sync_closed_pnl); меню читает готовые суммы из памяти.
+    Курсор с диска не считается свежим: пока бот был остановлен, сделки
+    могли закрыться, поэтому в каждом процессе символ один раз догружается.
+    """
+
+    def __init__(self, http_client, path: str = PNL_STATE_FILE):
+        self.http_client = http_client
+        self.path = path
+        self.buckets: dict[str, dict] = {}    # "SYMBOL:YYYY-MM" -> суммы
+        self.cursors: dict[str, int] = {}     # symbol -> последний endTime
+        self.seen: dict[str, RecentIds] = {}  # symbol -> последние orderId
+        self.synced: set[str] = set()         # символы, догруженные в этом процессе
+        self._lock = threading.Lock()
+        self._load()
+
+    # ---------- чтение ----------
+
+    def month_to_date(self, symbol: str, now_ms: int | None = None) -> tuple[float, int]:
+        bucket = self.buckets.get(
+            f"{symbol}:{month_key(now_ms or int(time.time() * 1000))}")
+        if not bucket:
+            return 0.0, 0
+        return bucket["pnl"], bucket["trades"]
+
+    def is_synced(self, symbol: str) -> bool:
+        return symbol in self.synced
+
+    # ---------- инкрементальная выборка ----------
+
+    def sync(self, symbol: str) -> int:
+        """Догружает новые записи closed-pnl; возвращает число добавленных."""
+        return sync_closed_pnl(self.http_client, symbol, [self])[0]
+
+    def pnl_start(self, symbol: str, now_ms: int) -> int:
+        with self._lock:
+            cursor = self.cursors.get(symbol)
+        return month_start_ms(now_ms) if cursor is None else cursor - OVERLAP_MS
+
+    def apply_closed_pnl(self, symbol: str, records: list[dict], start: int,
+                         now_ms: int) -> int:
+        with self._lock:
+            added = sum(self._add(symbol, record) for record in records)
+            self.cursors[symbol] = max(self.cursors.get(symbol, 0), now_ms)
+            self.synced.add(symbol)
+            self._save()
+        if added:
+            logging.info(f"PnL {symbol}: добавлено закрытых сделок {added}")
+        return added
+
+    def _add(self, symbol: str, record: dict) -> int:
+        seen = self.seen.setdefault(symbol, RecentIds(SEEN_LIMIT))
+        if not seen.add(record.get("orderId")):
+            return 0
+        ts = record_time(record)
+        pnl = float(record.get("closedPnl") or 0)
+        key = f"{symbol}:{month_key(ts)}"
+        bucket = self.buckets.get(key) or {"pnl": 0.0, "trades": 0, "wins": 0}
+        self.buckets[key] = {
+            "pnl": bucket["pnl"] + pnl,
+            "trades": bucket["trades"] + 1,
+            "wins": bucket["wins"] + (pnl > 0),
+        }
+        return 1
+
+    # ---------- хранение ----------
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            self.buckets = state.get("buckets", {})
+            self.cursors = state.get("cursors", {})
+            self.seen = {s: RecentIds(SEEN_LIMIT, ids)
+                         for s, ids in state.get("seen", {}).items()}
+        except (OSError, ValueError) as e:
+            logging.error(f"Не удалось прочитать {self.path}: {e}")
+
+    def _save(self) -> None:
+        state = {
+            "buckets": self.buckets,
+            "cursors": self.cursors,
+            "seen": {s: list(ids) for s, ids in self.seen.items()},
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
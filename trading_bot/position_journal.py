@@ -0,0 +1,101 @@
+# position_journal.py
+import json
+import logging
+import os
+import threading
+
+POSITIONS_LOG = "positions.log"
+COMPACT_EVERY = 200     # записей с прошлого снимка, после которых журнал переписывается
+
+
+class PositionJournal:
+    """
+    Журнал открытых позиций: каждая правка позиции (открытие, новый
+    ордер, снятый ордер, перенос SL) дописывается строкой JSON
+    {"op": "put", "position": ...}, закрытие — {"op": "del", "key": ...}.
+    Строка пишется с fsync, поэтому после падения теряется максимум
+    недописанная последняя. Раз в COMPACT_EVERY записей журнал
+    переписывается снимком текущих позиций (tmp + os.replace).
+    """
+
+    def __init__(self, path: str = POSITIONS_LOG, compact_every: int = COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every
+        self.positions: dict[str, dict] = {}
+        self._records = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self) -> dict[str, dict]:
+        """Проигрывает журнал; возвращает позиции по ключу (id входного ордера)."""
+        positions, records = {}, 0
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line_no, line in enumerate(f, 1):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # оборванная при падении последняя строка
+                        logging.warning(f"{self.path}:{line_no}: запись повреждена, пропуск")
+                        continue
+                    records += 1
+                    if record.get("op") == "put":
+                        position = record["position"]
+                        positions[position["order_id"]] = position
+                    elif record.get("op") == "del":
+                        positions.pop(record.get("key"), None)
+        with self._lock:
+            self.positions = {k: _snapshot(p) for k, p in positions.items()}
+            self._records = records
+        return positions
+
+    def put(self, position: dict) -> None:
+        with self._lock:
+            snapshot = _snapshot(position)
+            self.positions[position["order_id"]] = snapshot
+            self._append({"op": "put", "position": snapshot})
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if self.positions.pop(key, None) is None:
+                return
+            self._append({"op": "del", "key": key})
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ---------- запись ----------
+
+    def _append(self, record: dict) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._records += 1
+        if self._records >= self.compact_every:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            for position in self.positions.values():
+                f.write(json.dumps({"op": "put", "position": position}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.replace(tmp, self.path)
+        self._records = len(self.positions)
+
+
+def _snapshot(position: dict) -> dict:
+    return {**position, "active_orders": list(position.get("active_orders", []))}
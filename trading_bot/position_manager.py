@@ -1,19 +1,118 @@
 import logging
 import time
-from .bybit_client import BybitClient
+from concurrent.futures import ThreadPoolExecutor
+from .bybit_client import BybitClient, make_order_link_id, LINK_ID_PREFIX
+from .position_journal import PositionJournal
+from .trade_context import TradeContext
+from .execution_stats import ExecutionStats
 from .utils import send_telegram_message
 import math
 
+MAX_POSITIONS_PER_SYMBOL = 1   # one-way режим (positionIdx=0): позиции по символу неттятся
+MAX_ACTIVE_POSITIONS = 10
+RECOVER_TIMEOUT = 20.0     # сек.: сверка с биржей при старте не дольше этого
+CANCEL_WORKERS = 4         # параллельные отмены, когда cancel-all по символу нельзя
+FILL_WAIT_TIMEOUT = 5.0    # сек.: ждём пуш исполнения входа, дальше — опрос REST
+ORDER_GONE = ("110001", "Order does not exist", "Order not exists",
+              "Order already cancelled")   # ордер уже исполнен или снят
+
 
 class PositionManager:
-    def __init__(self):
-        self.client = BybitClient()
-        self.active_positions = []
+    """
+    Открытые позиции хранятся в active_positions (ключ — id входного
+    ордера). order_index связывает id любого ордера позиции (вход, SL,
+    TP1, TP2, переставленный SL) с самой позицией, symbol_positions —
+    символ с ключами его позиций; всё обновляется за O(1) при постановке,
+    отмене и закрытии.
+
+    Каждая правка позиции пишется в PositionJournal; после рестарта
+    recover() поднимает позиции из журнала и сверяет их с биржей.
+
+    Цены входа и выходов — средние цены исполнения из execution-отчётов
+    (position["entry"], position["exits"]), прибыль считается по ним за
+    вычетом комиссий; каждый ордер пишется в ExecutionStats.
+    """
+
+    def __init__(self, journal: PositionJournal | None = None, client=None):
+        # client — BybitClient или PaperClient с тем же интерфейсом
+        self.client = client or BybitClient()
+        self.active_positions: dict[str, dict] = {}
+        self.order_index: dict[str, dict] = {}
+        self.symbol_positions: dict[str, set[str]] = {}
         self.closed_positions = []
+        self.journal = journal or PositionJournal()
+        self.recovered = False
+        self.stops = None          # StopEngine, подключается в bot.py
+        self._cancel_pool = ThreadPoolExecutor(
+            max_workers=CANCEL_WORKERS, thread_name_prefix="cancel")
+        # cancel_orders при ручном закрытии: сам раскладывает отмены по
+        # _cancel_pool, поэтому в тот же пул его класть нельзя
+        self._close_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="close")
 
         self.client.track_order_status(self.handle_order_status)
+        self.bridge = self.client.ws_bridge
+        self.account_state = self.client.account_state
+        self.context = TradeContext(self.client, self.account_state)
+        self.executions = ExecutionStats(account=getattr(self.client, "name", "main"))
         self.tp_mode = "dual"      # по умолчанию SL+TP1+TP2
 
+    def _notify(self, message) -> None:
+        """Уведомление в Telegram без блокировки потока обработки ордеров."""
+        send_telegram_message(message)
+
+    # ---------- индекс позиций ----------
+
+    def _register(self, position: dict) -> None:
+        key = position["order_id"]
+        self.active_positions[key] = position
+        self.symbol_positions.setdefault(position["symbol"], set()).add(key)
+        self.order_index[key] = position
+        self.journal.put(position)
+
+    def _track_order(self, position: dict, role_key: str, order_id: str) -> None:
+        """Запоминает ордер позиции (sl_order_id, tp1_order_id, ...) в индексе."""
+        position[role_key] = order_id
+        position["active_orders"].append(order_id)
+        self.order_index[order_id] = position
+        self.journal.put(position)
+
+    def _untrack_order(self, position: dict, order_id: str) -> None:
+        self.order_index.pop(order_id, None)
+        if order_id in position["active_orders"]:
+            position["active_orders"].remove(order_id)
+            self.journal.put(position)
+
+    def _unregister(self, position: dict) -> None:
+        key = position["order_id"]
+        self.active_positions.pop(key, None)
+        keys = self.symbol_positions.get(position["symbol"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.symbol_positions[position["symbol"]]
+        for oid in (key, position.get("sl_order_id"), position.get("tp1_order_id"),
+                    position.get("tp2_order_id"), *position.get("active_orders", [])):
+            if oid and self.order_index.get(oid) is position:
+                del self.order_index[oid]
+        self.journal.delete(key)
+        if self.stops is not None:
+            self.stops.forget(key)
+
+    def positions_for(self, symbol: str) -> list[dict]:
+        return [self.active_positions[k] for k in self.symbol_positions.get(symbol, ())]
+
+    def can_open(self, symbol: str, direction: str | None = None) -> bool:
+        """
+        Лимиты позиций; при известном direction ещё и запрет встречной
+        сделки: в one-way режиме она уменьшила бы уже открытую позицию, а
+        её SL/TP остались бы на прежний объём.
+        """
+        if (len(self.active_positions) >= MAX_ACTIVE_POSITIONS or
+                len(self.symbol_positions.get(symbol, ())) >= MAX_POSITIONS_PER_SYMBOL):
+            return False
+        return direction is None or all(
+            p["direction"] == direction for p in self.positions_for(symbol))
+
     def set_tp_mode(self, mode: str) -> None:
 
         if mode not in ("single", "dual"):
@@ -25,7 +124,7 @@ class PositionManager:
         try:
             side = "Sell" if position["direction"] == "long" else "Buy"
 
-            info = self.client.get_symbol_info(symbol)
+            info = self.context.spec(symbol)
             price_step = float(info["priceFilter"]["tickSize"])
             qty_step = float(info["lotSizeFilter"]["qtyStep"])
             min_qty = float(info["lotSizeFilter"]["minOrderQty"])
@@ -40,13 +139,13 @@ class PositionManager:
             sl_order = self.client.place_conditional_order(
                 symbol=symbol, side=side, qty=position["qty"],
                 stop_px=rounded_sl, orderType="Market",
-                reduce_only=True, triggerDirection=trigger_dir
+                reduce_only=True, triggerDirection=trigger_dir,
+                order_link_id=self._next_link_id(position, "sl")
             )
             if sl_order.get("retCode") != 0:
                 logging.error(f"SL не установлен: {sl_order.get('retMsg')}")
                 return
-            position["sl_order_id"] = sl_order["result"]["orderId"]
-            position["active_orders"].append(position["sl_order_id"])
+            self._track_order(position, "sl_order_id", sl_order["result"]["orderId"])
 
             # делим объём, если нужен второй ТР
             units_total = int(round(position["qty"] / qty_step))
@@ -67,29 +166,31 @@ class PositionManager:
             tp2_qty_s = f"{tp2_qty:.{dec}f}"
 
             # единственный TP
-            tp1_order = self.client.http_client.place_order(
-                category="linear", symbol=symbol, side=side, orderType="Limit",
+            tp1_order = self.client.submit_order(
+                self._link_id(position, "tp1"),
+                symbol=symbol, side=side, orderType="Limit",
                 qty=tp1_qty_s, price=str(rounded_tp1),
                 timeInForce="GTC", reduceOnly=True
             )
             if tp1_order.get("retCode") != 0:
                 logging.error(f"TP1 не создан: {tp1_order.get('retMsg')}")
                 return
-            position["tp1_order_id"] = tp1_order["result"]["orderId"]
-            position["active_orders"].append(position["tp1_order_id"])
+            position["tp1_qty"] = tp1_qty
+            self._track_order(position, "tp1_order_id", tp1_order["result"]["orderId"])
 
             # TP2
             if self.tp_mode == "dual" and create_tp2:
-                tp2_order = self.client.http_client.place_order(
-                    category="linear", symbol=symbol, side=side,
+                tp2_order = self.client.submit_order(
+                    self._link_id(position, "tp2"),
+                    symbol=symbol, side=side,
                     orderType="Limit", qty=tp2_qty_s, price=str(rounded_tp2),
                     timeInForce="GTC", reduceOnly=True
                 )
                 if tp2_order.get("retCode") != 0:
                     logging.error(f"TP2 не создан: {tp2_order.get('retMsg')}")
                 else:
-                    position["tp2_order_id"] = tp2_order["result"]["orderId"]
-                    position["active_orders"].append(position["tp2_order_id"])
+                    self._track_order(
+                        position, "tp2_order_id", tp2_order["result"]["orderId"])
 
             logging.info(
                 f"SL/TP‑ордер(а) установлены для {position['order_id']}")
@@ -97,36 +198,20 @@ class PositionManager:
         except Exception as e:
             logging.error(f"Ошибка в set_sl_tp: {e}")
 
-    def handle_tp1_filled(self, position):
+    def handle_tp1_filled(self, position, filled_qty: float | None = None):
         """
         Сработал TP1: половина позиции закрыта.
-        отменяем старый SL
         вычисляем новый объём (1/3 позиции) и новый SL
+        и переносим SL через amend (если не вышло — отмена и новый ордер)
         """
         try:
-            # актуальный объём позиции
-            pos_resp = self.client.http_client.get_positions(
-                category="linear", symbol=position["symbol"]
-            )
-            if pos_resp.get("retCode") != 0 or not pos_resp["result"]["list"]:
-                logging.error(
-                    f"Не удалось получить позицию: {pos_resp.get('retMsg')}")
-                return
-            current_qty = float(pos_resp["result"]["list"][0]["size"])
+            # остаток — по самой позиции и исполненному объёму TP1
+            # (cumExecQty из события ордера): пуш позиции может прийти позже
+            # события "Filled", а зеркало аккаунта знает только сумму по символу
+            filled_qty = filled_qty or position.get("tp1_qty", 0)
+            current_qty = position["qty"] - filled_qty
 
-            # отменяем старый SL
-            if position.get("sl_order_id"):
-                self.client.http_client.cancel_order(
-                    category="linear", symbol=position["symbol"],
-                    orderId=position["sl_order_id"]
-                )
-                logging.info(f"Старый SL отменён: {position['sl_order_id']}")
-                if position["sl_order_id"] in position["active_orders"]:
-                    position["active_orders"].remove(position["sl_order_id"])
-                else:
-                    logging.warning(
-                        f"SL ордер {position['sl_order_id']} не найден в active_orders")
-            symbol_info = self.client.get_symbol_info(position["symbol"])
+            symbol_info = self.context.spec(position["symbol"])
             tick_size = float(symbol_info["priceFilter"]["tickSize"])
             qty_step = float(symbol_info["lotSizeFilter"]["qtyStep"])
             min_qty = float(symbol_info["lotSizeFilter"]["minOrderQty"])
@@ -134,6 +219,10 @@ class PositionManager:
             # рассчитываем новый SL
             new_sl_raw = self.calculate_new_sl(position)
             new_sl = math.floor(new_sl_raw / tick_size) * tick_size
+            if position.get("sl"):
+                # трейлинг мог уже подтянуть стоп дальше безубытка — не откатываем
+                new_sl = max(new_sl, position["sl"]) if position["direction"] == "long" \
+                    else min(new_sl, position["sl"])
 
             def round_step(val, step):            # округление вниз
                 return math.floor(val / step) * step
@@ -145,23 +234,53 @@ class PositionManager:
             dec = len(str(qty_step).split(".")[1])
             qty_str = f"{remaining_qty:.{dec}f}"  # строка нужной точности
 
-            # размещаем новый SL
-            side = "Sell" if position["direction"] == "long" else "Buy"
-            trigger_dir = 2 if position["direction"] == "long" else 1
-            new_sl_order = self.client.place_conditional_order(
-                symbol=position["symbol"], side=side, qty=qty_str,
-                stop_px=new_sl, orderType="Market", reduce_only=True,
-                triggerDirection=trigger_dir
-            )
+            # переносим SL одним amend: цена и объём, позиция всё время под стопом
+            new_sl_order = None
+            if position.get("sl_order_id"):
+                try:
+                    new_sl_order = self.client.http_client.amend_order(
+                        category="linear", symbol=position["symbol"],
+                        orderId=position["sl_order_id"],
+                        triggerPrice=_price_str(new_sl, tick_size), qty=qty_str)
+                    new_sl_order["result"]["orderId"] = position["sl_order_id"]
+                except Exception as e:
+                    logging.warning(f"amend SL не удался, переставляем: {e}")
+                    new_sl_order = None
+
+            if new_sl_order is None:
+                # отменяем старый SL
+                if position.get("sl_order_id"):
+                    self.client.http_client.cancel_order(
+                        category="linear", symbol=position["symbol"],
+                        orderId=position["sl_order_id"]
+                    )
+                    logging.info(f"Старый SL отменён: {position['sl_order_id']}")
+                    if position["sl_order_id"] not in position["active_orders"]:
+                        logging.warning(
+                            f"SL ордер {position['sl_order_id']} не найден в active_orders")
+                    self._untrack_order(position, position["sl_order_id"])
+
+                # размещаем новый SL
+                side = "Sell" if position["direction"] == "long" else "Buy"
+                trigger_dir = 2 if position["direction"] == "long" else 1
+                new_sl_order = self.client.place_conditional_order(
+                    symbol=position["symbol"], side=side, qty=qty_str,
+                    stop_px=new_sl, orderType="Market", reduce_only=True,
+                    triggerDirection=trigger_dir,
+                    order_link_id=self._next_link_id(position, "sl2")
+                )
 
             if new_sl_order.get("retCode") == 0:
-                position["sl_order_id"] = new_sl_order["result"]["orderId"]
-                position["active_orders"].append(position["sl_order_id"])
                 position["sl"] = new_sl
                 position["qty"] = remaining_qty
                 position["tp1_hit"] = True
+                new_id = new_sl_order["result"]["orderId"]
+                if new_id == position.get("sl_order_id"):
+                    self.journal.put(position)
+                else:
+                    self._track_order(position, "sl_order_id", new_id)
                 logging.info(f"New SL {new_sl} qty {qty_str} поставлен")
-                send_telegram_message({
+                self._notify({
                     "position_partially_closed": True,
                     "position": {
                         "symbol": position["symbol"],
@@ -175,11 +294,34 @@ class PositionManager:
             else:
                 err = new_sl_order.get("retMsg")
                 logging.error(f"Не удалось поставить новый SL: {err}")
-                send_telegram_message(f"⚠️ Ошибка установки нового SL: {err}")
+                self._notify(f"⚠️ Ошибка установки нового SL: {err}")
 
         except Exception as e:
             logging.error(f"Ошибка обработки TP1: {e}")
-            send_telegram_message(f"⚠️ Ошибка при обработке TP1: {e}")
+            self._notify(f"⚠️ Ошибка при обработке TP1: {e}")
+
+    @staticmethod
+    def _link_id(position: dict, role: str) -> str:
+        """
+        orderLinkId ордера позиции: entry, sl, tp1, tp2, sl2, close. Основа —
+        signal_ts, как у входа; у записей журнала без него — ключ позиции
+        целиком (make_order_link_id сам хэширует длинный ID), а не его
+        префикс: у двух позиций префиксы могут совпасть.
+        """
+        seed = position.get("signal_ts") or position["order_id"]
+        return make_order_link_id(position["symbol"], seed, role)
+
+    def _next_link_id(self, position: dict, role: str) -> str:
+        """
+        Для ролей, которые можно отправить заново (sl, sl2, close): каждая
+        новая попытка получает свой суффикс — close, close_2, close_3... Повторы
+        внутри submit_order идут с тем же ID и не задваивают ордер.
+        """
+        attempts = position.setdefault("link_attempts", {})
+        attempts[role] = attempts.get(role, 0) + 1
+        self.journal.put(position)
+        n = attempts[role]
+        return self._link_id(position, role if n == 1 else f"{role}_{n}")
 
     def calculate_new_sl(self, position):
         entry_price = position["entry"]
@@ -191,136 +333,437 @@ class PositionManager:
             new_sl = entry_price * (1 - commission_rate)
         return round(new_sl, 2)
 
-    def close_position(self, position, qty=None, reason=""):
+    def close_position(self, position, qty=None, reason="", report=None):
         qty = qty or position["qty"]
-        current_price = self.client.get_current_price(position['symbol'])
 
-        # Отмена всех активных ордеров
-        for oid in position.get("active_orders", []):
-            for attempt in range(3):  # 3 попытки
-                try:
-                    cancel_resp = self.client.http_client.cancel_order(
-                        category="linear",
-                        symbol=position["symbol"],
-                        orderId=oid
-                    )
-                    if cancel_resp.get("retCode") == 0:
-                        logging.info(f"Отменён ордер {oid}")
-                    elif cancel_resp.get("retMsg") in ("Order already cancelled",
-                                                       "Order not exists"):
-                        logging.info(
-                            f"Ордер {oid} уже отсутствует (retMsg={cancel_resp.get('retMsg')})")
-                    else:
-                        logging.warning(
-                            f"Не удалось отменить ордер {oid}: {cancel_resp.get('retMsg')}")
-                except Exception as e:
-                    logging.error(f"Ошибка при отмене ордера {oid}: {e}")
-                    time.sleep(1)
-
-        # Расчет прибыли
-        if position['direction'] == 'long':
-            profit = (current_price - position['entry']) * position['qty']
+        # Отмена всех активных ордеров (если их ещё не сняли при закрытии рынком)
+        if report is None:
+            report = self.cancel_orders(position)
+
+        # Прибыль — по исполнениям входа и выходов; к закрытию execution-отчёт
+        # входа уже в зеркале, даже если при входе цену брали из истории ордеров
+        entry_fill = self.account_state.fills.get(position["order_id"])
+        if entry_fill and entry_fill["qty"]:
+            position["entry"] = self.account_state.avg_fill_price(position["order_id"])
+            position["entry_fee"] = entry_fill["fee"]
+        exits = position.get("exits") or []
+        if exits:
+            close_price = exits[-1]["price"]
         else:
-            profit = (position['entry'] - current_price) * position['qty']
+            # выход не записан (позиция поднята из старого журнала)
+            close_price = self.context.price(position['symbol'])
+        profit = self.realized_profit(position, close_price)
 
         closed_position = {
             **position,
-            "close_price": current_price,
+            "close_price": close_price,
             "close_time": int(time.time() * 1000),
             "close_reason": reason,
-            "profit": profit
+            "profit": profit,
+            "cancel_report": report
         }
         self.closed_positions.append(closed_position)
-        if position in self.active_positions:
-            self.active_positions.remove(position)
+        self._unregister(position)
 
         logging.info(
             f"Position {position['order_id']} closed by {reason}. Profit = {profit:.2f}")
         # уведомление о полном закрытии (SL или TP2)
         if not (reason == "TP" and self.tp_mode == "single"):
-            send_telegram_message({
+            self._notify({
                 "position_closed": True,
                 "position": closed_position,
             })
         position["active_orders"].clear()
         return closed_position
 
-    def market_close_active_position(self) -> dict | None:
+    def cancel_orders(self, position: dict) -> dict:
+        """
+        Снимает все ордера позиции за один раунд: cancel-all по символу,
+        если на символе только эта позиция, иначе параллельные отмены по id.
+        Возвращает отчёт: cancelled — сняты, gone — их уже не было
+        (исполнены или сняты раньше), failed — ошибка.
+        """
+        order_ids = list(position.get("active_orders", []))
+        report = {"cancelled": [], "gone": [], "failed": []}
+        if not order_ids:
+            return report
+        symbol = position["symbol"]
+        if len(self.symbol_positions.get(symbol, ())) <= 1:
+            try:
+                resp = self.client.http_client.cancel_all_orders(
+                    category="linear", symbol=symbol)
+                cancelled = {o.get("orderId") for o in resp.get("result", {}).get("list", [])}
+                for oid in order_ids:
+                    report["cancelled" if oid in cancelled else "gone"].append(oid)
+                order_ids = []
+            except Exception as e:
+                logging.warning(f"cancel-all {symbol} не удался, снимаем по одному: {e}")
+
+        for oid, outcome in zip(order_ids, self._cancel_pool.map(
+                lambda oid: self._cancel_one(symbol, oid), order_ids)):
+            report[outcome].append(oid)
+
+        position["active_orders"].clear()
+        logging.info(
+            f"Ордера {symbol} {position['order_id']}: сняты {report['cancelled']}, "
+            f"уже не было {report['gone']}, ошибки {report['failed']}")
+        return report
+
+    def _cancel_one(self, symbol: str, order_id: str) -> str:
+        try:
+            self.client.http_client.cancel_order(
+                category="linear", symbol=symbol, orderId=order_id)
+            return "cancelled"
+        except Exception as e:
+            if any(marker in str(e) for marker in ORDER_GONE):
+                return "gone"
+            logging.error(f"Ошибка при отмене ордера {order_id}: {e}")
+            return "failed"
+
+    def market_close_active_position(self, position_key: str | None = None,
+                                     reason: str = "ManualClose") -> dict | None:
         """
-        Принудительно закрывает текущую позицию MARKET‑ордером и
-        снимает все отложенные ордера.
+        Принудительно закрывает позицию MARKET‑ордером и снимает все
+        отложенные ордера. Без position_key — последнюю открытую.
+
+        Можно вызывать и вне order-state (тайм-стоп идёт в io_executor):
+        ожидание исполнения тогда не держит WS-события, а правки позиции
+        уходят в order-state через bridge.call_serial.
         """
         if not self.active_positions:
             logging.info("Нет активной позиции для закрытия")
             return None
 
-        position = self.active_positions[0]
-
-        for oid in position.get("active_orders", []):
-            try:
-                self.client.http_client.cancel_order(
-                    category="linear",
-                    symbol=position["symbol"],
-                    orderId=oid
-                )
-            except Exception as e:
-                logging.warning(f"Не снят ордер {oid}: {e}")
-        position["active_orders"].clear()
+        if position_key is None:
+            position_key = next(reversed(self.active_positions))
+        position = self.active_positions.get(position_key)
+        if position is None:
+            logging.info(f"Позиция {position_key} не найдена")
+            return None
 
+        # снятие ордеров и закрывающий ордер уходят одновременно:
+        # закрытие reduceOnly, с оставшимися SL/TP оно не конфликтует
+        cancelling = self._close_pool.submit(self.cancel_orders, position)
         side = "Sell" if position["direction"] == "long" else "Buy"
-        resp = self.client.http_client.place_order(
-            category="linear",
+        reference = self.context.prices.get(position["symbol"], (0, None))[1]
+        send_time = int(time.time() * 1000)
+        resp = self.client.submit_order(
+            self._next_link_id(position, "close"),
             symbol=position["symbol"],
             side=side,
             orderType="Market",
             qty=str(position["qty"]),
             reduceOnly=True
         )
+        ack_time = int(time.time() * 1000)
+        report = cancelling.result()
         if resp.get("retCode") != 0:
             logging.error(
                 f"Не удалось закрыть MARKET‑ордером: {resp.get('retMsg')}")
+            self.bridge.call_serial(self._close_failed, position, report,
+                                    f"ордер не принят: {resp.get('retMsg')}")
             return None
         order_id = resp["result"]["orderId"]
 
         # ждём, пока ордер исполнится
         if not self.wait_for_order_filled(order_id, position["symbol"]):
             logging.error("MARKET‑ордер не исполнился")
+            self._cancel_one(position["symbol"], order_id)
+            self.bridge.call_serial(self._close_failed, position, report,
+                                    "MARKET‑ордер не исполнился")
             return None
 
-        # фиксируем закрытие
-        closed = self.close_position(position, reason="ManualClose")
-        return closed
+        return self.bridge.call_serial(self._finish_close, position, order_id, reference,
+                                       send_time, ack_time, report, reason)
+
+    def _finish_close(self, position: dict, order_id: str, reference, send_time: int,
+                      ack_time: int, report: dict, reason: str) -> dict | None:
+        if position["order_id"] not in self.active_positions:
+            return None   # пока ждали исполнения, позицию уже закрыл SL/TP
+        # фиксируем закрытие по цене исполнения
+        self._record_exit(position, "close", order_id, reference,
+                          send_time=send_time, ack_time=ack_time)
+        return self.close_position(position, reason=reason, report=report)
+
+    def _close_failed(self, position: dict, report: dict, reason: str) -> None:
+        """
+        Закрытие не прошло, а ордера позиции уже сняты: позиция открыта без
+        стопа. Ставим SL заново (если старый не остался на бирже) и сообщаем.
+        """
+        sl_id = position.get("sl_order_id")
+        restored = sl_id in report["failed"] or self._restore_sl(position)
+        self._notify(f"⚠️ Позиция {position['symbol']} не закрыта: {reason}. "
+                     + ("SL на месте" if restored else "SL поставить не удалось!"))
+
+    def _restore_sl(self, position: dict) -> bool:
+        if position.get("sl_order_id"):
+            self._untrack_order(position, position["sl_order_id"])
+            position.pop("sl_order_id")
+        if not position.get("sl"):
+            return False
+        tick = float(self.context.spec(position["symbol"])["priceFilter"]["tickSize"])
+        long = position["direction"] == "long"
+        role = "sl2" if position.get("tp1_hit") else "sl"
+        # стоп уже ставился (возможно, до счётчика попыток): ID первой попытки занят
+        position.setdefault("link_attempts", {}).setdefault(role, 1)
+        try:
+            sl_order = self.client.place_conditional_order(
+                symbol=position["symbol"], side="Sell" if long else "Buy",
+                qty=position["qty"], stop_px=_price_str(position["sl"], tick),
+                orderType="Market", reduce_only=True, triggerDirection=2 if long else 1,
+                order_link_id=self._next_link_id(position, role))
+        except Exception as e:
+            logging.error(f"SL {position['symbol']} не восстановлен: {e}")
+            return False
+        if sl_order.get("retCode") != 0:
+            logging.error(f"SL {position['symbol']} не восстановлен: {sl_order.get('retMsg')}")
+            return False
+        self._track_order(position, "sl_order_id", sl_order["result"]["orderId"])
+        return True
+
+    def on_price(self, symbol: str, price: float) -> None:
+        """Последняя цена из потока свечей (event loop)."""
+        self.client.on_price(symbol, price)
+        self.context.on_price(symbol, price)
+        if self.stops is not None:
+            self.stops.on_price(symbol, price)
+
+    def amend_stop(self, position: dict, new_sl: float) -> bool:
+        """Переносит триггер SL-ордера одним amend; в потоке order-state."""
+        oid = position.get("sl_order_id")
+        if not oid or position["order_id"] not in self.active_positions:
+            return False
+        tick = float(self.context.spec(position["symbol"])["priceFilter"]["tickSize"])
+        try:
+            self.client.http_client.amend_order(
+                category="linear", symbol=position["symbol"], orderId=oid,
+                triggerPrice=_price_str(new_sl, tick))
+        except Exception as e:
+            logging.warning(f"Стоп {position['symbol']} не перенесён: {e}")
+            return False
+        logging.info(f"Стоп {position['symbol']} {position['sl']} -> {new_sl}")
+        position["sl"] = new_sl
+        self.journal.put(position)
+        return True
+
+    def prewarm(self, symbol: str, leverage) -> None:
+        """
+        Прогрев контекста входа: параметры инструмента, цена, эквити и
+        плечо на бирже. Вызывается из io-потока при старте торговли,
+        периодически, на предварительном сигнале и при смене плеча.
+        """
+        if not self.can_open(symbol):
+            return
+        self.context.refresh(symbol, leverage)
+
+    # ---------- восстановление после рестарта ----------
+
+    def recover(self, timeout: float = RECOVER_TIMEOUT) -> dict:
+        """
+        Сверка журнала с биржей при старте (один раз, в потоке order-state):
+        позиции из журнала, которых на бирже уже нет, удаляются, у живых
+        отбрасываются исполненные/снятые ордера; позиция на бирже без записи
+        в журнале подхватывается вместе с нашими ордерами по символу;
+        остальные наши ордера (orderLinkId с префиксом бота) снимаются.
+        Всё укладывается в timeout: по истечении оставшиеся отмены
+        пропускаются, чтобы бот успел к первой свече. Если timeout оборвал
+        выборку открытых ордеров, ордера из журнала, которых не видно на
+        прочитанных страницах, считаются живыми — их просто не успели
+        прочитать; не дочитанные позиции — то же, что ошибка выборки.
+        """
+        if self.recovered:
+            return {}
+        deadline = time.monotonic() + timeout
+        summary = {"restored": 0, "adopted": 0, "dropped": 0,
+                   "cancelled": 0, "skipped": 0}
+        saved = self.journal.load()
+        try:
+            exchange_positions = self._fetch_exchange_positions(deadline)
+            open_orders, orders_complete = self._fetch_open_orders(deadline)
+        except Exception as e:
+            # без картины с биржи позиции из журнала берём как есть
+            logging.error(f"Сверка с биржей не удалась: {e}")
+            for position in saved.values():
+                self._register(position)
+            summary["restored"] = len(saved)
+            self.recovered = True
+            return summary
+
+        claimed = set()
+        for position in saved.values():
+            symbol = position["symbol"]
+            if symbol not in exchange_positions:
+                logging.info(f"Позиция {position['order_id']} ({symbol}) закрыта, пока бот был остановлен")
+                self.journal.delete(position["order_id"])
+                summary["dropped"] += 1
+                continue
+            live = [oid for oid in position.get("active_orders", [])
+                    if oid in open_orders or not orders_complete]
+            position["active_orders"] = live
+            for role_key in ("sl_order_id", "tp1_order_id", "tp2_order_id"):
+                if orders_complete and position.get(role_key) not in open_orders:
+                    position.pop(role_key, None)
+            claimed.update(live)
+            self._register(position)
+            for oid in live:
+                self.order_index[oid] = position
+            summary["restored"] += 1
+            if not position.get("sl_order_id"):
+                self._notify(f"⚠️ Позиция {symbol} восстановлена без SL")
+
+        for symbol, exchange_position in exchange_positions.items():
+            direction = "long" if exchange_position["side"] == "Buy" else "short"
+            stale = [p for p in self.positions_for(symbol) if p["direction"] != direction]
+            for position in stale:
+                # позиция развернулась, пока бот стоял: запись журнала уже не про неё
+                logging.warning(f"{symbol}: в журнале {position['direction']}, "
+                                f"на бирже {direction} — запись удалена")
+                claimed.difference_update(position["active_orders"])
+                self._unregister(position)
+                summary["restored"] -= 1
+                summary["dropped"] += 1
+            if symbol in self.symbol_positions:
+                known = sum(p["qty"] for p in self.positions_for(symbol))
+                if abs(known - exchange_position["size"]) > 1e-12:
+                    logging.warning(
+                        f"{symbol}: объём в журнале {known}, на бирже {exchange_position['size']}")
+                continue
+            position = self._adopt(symbol, exchange_position, open_orders, claimed)
+            summary["adopted"] += 1
+            self._notify(f"♻️ Подхвачена позиция {symbol} {position['direction'].upper()} "
+                         f"{position['qty']} @ {position['entry']}")
+
+        for oid, order in open_orders.items():
+            if oid in claimed or not order.get("orderLinkId", "").startswith(f"{LINK_ID_PREFIX}-"):
+                continue
+            if time.monotonic() > deadline:
+                summary["skipped"] += 1
+                continue
+            try:
+                self.client.http_client.cancel_order(
+                    category="linear", symbol=order["symbol"], orderId=oid)
+                summary["cancelled"] += 1
+            except Exception as e:
+                logging.warning(f"Не снят устаревший ордер {oid}: {e}")
+
+        if not orders_complete:
+            logging.warning("Сверка: открытые ордера прочитаны не полностью (timeout), "
+                            "ордера из журнала оставлены как есть")
+        self.journal.compact()
+        self.recovered = True
+        logging.info(f"Восстановление позиций: {summary}")
+        return summary
+
+    def _fetch_exchange_positions(self, deadline: float) -> dict[str, dict]:
+        """Все открытые позиции; TimeoutError, если не дочитали до deadline."""
+        result, cursor = {}, None
+        while True:
+            if time.monotonic() >= deadline:
+                raise TimeoutError("позиции прочитаны не полностью")
+            params = {"category": "linear", "settleCoin": "USDT", "limit": 200}
+            if cursor:
+                params["cursor"] = cursor
+            page = self.client.http_client.get_positions(**params).get("result", {})
+            for p in page.get("list", []):
+                size = float(p.get("size") or 0)
+                if size:
+                    result[p["symbol"]] = {
+                        "size": size,
+                        "side": p.get("side"),
+                        "entry": float(p.get("avgPrice") or 0),
+                        "sl": float(p.get("stopLoss") or 0),
+                        "tp": float(p.get("takeProfit") or 0),
+                    }
+            cursor = page.get("nextPageCursor")
+            if not cursor or not page.get("list"):
+                return result
+
+    def _fetch_open_orders(self, deadline: float) -> tuple[dict[str, dict], bool]:
+        """Открытые ордера и признак, что прочитаны все страницы."""
+        orders, cursor = {}, None
+        while time.monotonic() < deadline:
+            params = {"category": "linear", "settleCoin": "USDT", "limit": 50}
+            if cursor:
+                params["cursor"] = cursor
+            result = self.client.http_client.get_open_orders(**params).get("result", {})
+            for order in result.get("list", []):
+                orders[order["orderId"]] = order
+            cursor = result.get("nextPageCursor")
+            if not cursor or not result.get("list"):
+                return orders, True
+        return orders, False
+
+    def _adopt(self, symbol: str, exchange_position: dict,
+               open_orders: dict, claimed: set) -> dict:
+        """Позиция с биржи без записи в журнале: собираем её из наших ордеров по символу."""
+        position = {
+            "order_id": f"adopted-{symbol}-{int(time.time() * 1000)}",
+            "signal_ts": int(time.time() * 1000),
+            "direction": "long" if exchange_position["side"] == "Buy" else "short",
+            "entry": exchange_position["entry"],
+            "sl": exchange_position["sl"] or None,
+            "tp1": exchange_position["tp"] or None,
+            "tp2": None,
+            "qty": exchange_position["size"],
+            "tp1_hit": False,
+            "symbol": symbol,
+            "notified_open": True,
+            "closed": False,
+            "active_orders": [],
+        }
+        self._register(position)
+        for oid, order in open_orders.items():
+            link_id = order.get("orderLinkId", "")
+            if (oid in claimed or order["symbol"] != symbol
+                    or not link_id.startswith(f"{LINK_ID_PREFIX}-")):
+                continue
+            role = link_id.rsplit("-", 1)[-1].split("_")[0]   # sl2_3 — повторная sl2
+            if role in ("sl", "sl2"):
+                position["sl"] = float(order.get("triggerPrice") or 0) or position["sl"]
+                position["tp1_hit"] = role == "sl2"
+                self._track_order(position, "sl_order_id", oid)
+            elif role in ("tp1", "tp2"):
+                position[role] = float(order.get("price") or 0) or position[role]
+                self._track_order(position, f"{role}_order_id", oid)
+            else:
+                continue
+            claimed.add(oid)
+        return position
 
     def open_position(self, signal, leverage, position_notional, symbol):
-        if self.active_positions:
-            logging.info("Позиция уже открыта, новая сделка не открывается.")
+        if not self.can_open(symbol, signal["direction"]):
+            logging.info(
+                f"Достигнут лимит позиций или есть встречная позиция ({symbol}), "
+                f"новая сделка не открывается.")
             return None
 
         try:
-            balance_resp = self.client.get_unified_wallet_balance()
-            if not balance_resp or balance_resp.get("retCode") != 0:
-                logging.error("Не удалось получить баланс для проверки маржи")
-                return None
-
-            total_equity = float(
-                balance_resp["result"]["list"][0]["totalEquity"])
+            total_equity = self.account_state.equity
+            if total_equity is None:
+                balance_resp = self.client.get_unified_wallet_balance()
+                if not balance_resp or balance_resp.get("retCode") != 0:
+                    logging.error("Не удалось получить баланс для проверки маржи")
+                    return None
+
+                total_equity = float(
+                    balance_resp["result"]["list"][0]["totalEquity"])
             if total_equity < position_notional:
                 logging.error(
                     f"Недостаточно средств. Баланс: {total_equity}, требуется: {position_notional}"
                 )
                 return None
 
-            symbol_info = self.client.get_symbol_info(symbol)
+            symbol_info = self.context.spec(symbol)
             if not symbol_info:
                 logging.error(f"Данные символа {symbol} не получены")
-                send_telegram_message(
+                self._notify(
                     f"❌ Ошибка: не удалось получить данные для {symbol}")
                 return None
 
             min_qty = float(symbol_info["lotSizeFilter"]["minOrderQty"])
             logging.info(f"Мин. объём для {symbol}: {min_qty}")
 
-            last_price = self.client.get_current_price(symbol)
+            last_price = self.context.price(symbol)
             if not last_price:
                 raise Exception("Цена не получена")
 
@@ -333,51 +776,49 @@ class PositionManager:
             if qty < min_qty:
                 error_msg = f"Объём {qty} < мин. {min_qty} {symbol}"
                 logging.error(error_msg)
-                send_telegram_message(f"❌ {error_msg}")
+                self._notify(f"❌ {error_msg}")
                 return None
 
-            positions = self.client.http_client.get_positions(
-                category="linear",
-                symbol=symbol
-            )
-            current_leverage = (
-                float(positions["result"]["list"][0]["leverage"])
-                if positions["result"]["list"]
-                else None
-            )
-            if current_leverage != leverage:
-                self.client.http_client.set_leverage(
-                    category="linear",
-                    symbol=symbol,
-                    buyLeverage=str(leverage),
-                    sellLeverage=str(leverage),
-                )
-                logging.info(f"Плечо обновлено: {leverage}x")
+            self.context.ensure_leverage(symbol, leverage)
 
             side = "Buy" if signal["direction"] == "long" else "Sell"
-            order_response = None
-            for attempt in range(3):
+            # link ID от сигнала: повторы внутри submit_order не задвоят вход
+            signal_ts = signal.get("timestamp") or int(time.time() * 1000)
+            link_id = make_order_link_id(symbol, signal_ts, "entry")
+            fill_wait = self.bridge.expect_order(link_id)
+            try:
+                send_time = int(time.time() * 1000)
                 order_response = self.client.place_active_order(
-                    symbol, side, qty)
-                if order_response and order_response.get("retCode") == 0:
-                    break
-                time.sleep(2 ** attempt)
-            else:
-                raise Exception("Все попытки открытия ордера не удались")
-
-            order_id = order_response["result"]["orderId"]
-            logging.info(f"Размещён рыночный ордер {side}: {order_id}")
-
-            if not self.wait_for_order_filled(order_id, symbol):
+                    symbol, side, qty, order_link_id=link_id)
+                ack_time = int(time.time() * 1000)
+                if not order_response:
+                    raise Exception("Все попытки открытия ордера не удались")
+
+                order_id = order_response["result"]["orderId"]
+                logging.info(f"Размещён рыночный ордер {side}: {order_id}")
+                order = self._await_fill(fill_wait, order_id, symbol)
+            finally:
+                self.bridge.forget_order(link_id)
+
+            if order is None:
                 logging.error(
                     f"Ордер {order_id} не был исполнен, пропускаем установку SL/TP")
                 return None
 
+            # цена входа — средняя цена исполнения, а не тикер до ордера
+            fill = self._fill_report(order_id, symbol, order)
+            signal_price = signal.get("signal_price") or signal.get("entry") or last_price
             position = {
                 "order_id": order_id,
+                "signal_ts": signal_ts,
                 "direction": signal["direction"],
-                "entry": last_price,
+                "entry": fill.get("price") or last_price,
+                "signal_price": signal_price,
+                "entry_fee": fill.get("fee") or 0.0,
+                "exits": [],
                 "sl": signal["sl"],
+                "initial_sl": signal["sl"],
+                "opened_at": int(time.time() * 1000),
                 "tp1": signal["tp1"],
                 "tp2": signal["tp2"],
                 "qty": qty,
@@ -387,12 +828,16 @@ class PositionManager:
                 "closed": False,
                 "active_orders": []
             }
-            self.active_positions.append(position)
-            time.sleep(1)
+            self._register(position)
+            self.executions.record(
+                position, "entry", side, fill.get("qty") or qty, signal_price,
+                fill.get("price"), fill_time=fill.get("time"), fee=fill.get("fee"),
+                signal_time=signal.get("signal_time"), send_time=send_time,
+                ack_time=ack_time)
             self.set_sl_tp(position, symbol)
 
             if self.tp_mode == "single":
-                send_telegram_message({
+                self._notify({
                     "position_single": {
                         "symbol": position["symbol"],
                         "direction": position["direction"].upper(),
@@ -403,7 +848,7 @@ class PositionManager:
                     }
                 })
             else:
-                send_telegram_message({
+                self._notify({
                     "position": {
                         "symbol": position["symbol"],
                         "direction": position["direction"].upper(),
@@ -421,23 +866,99 @@ class PositionManager:
         except Exception as e:
             error_msg = f"Ошибка открытия позиции ({symbol}): {str(e)}"
             logging.error(error_msg)
-            send_telegram_message(f"🔥 {error_msg}")
+            self._notify(f"🔥 {error_msg}")
             return None
 
+    # ---------- исполнения ----------
+
+    def _await_fill(self, fill_wait, order_id: str, symbol: str) -> dict | None:
+        """
+        Исполнение ордера из приватного потока order (через мост); опрос
+        REST — только если пуш не пришёл за FILL_WAIT_TIMEOUT. Возвращает
+        данные ордера из пуша ({} — исполнен, но узнали из REST) или None,
+        если ордер не исполнен.
+        """
+        order = fill_wait.wait(FILL_WAIT_TIMEOUT)
+        if order is not None:
+            return order if order.get("orderStatus") == "Filled" else None
+        logging.warning(f"Пуш исполнения {order_id} не пришёл, опрашиваем REST")
+        return {} if self.wait_for_order_filled(order_id, symbol) else None
+
+    def _fill_report(self, order_id: str, symbol: str, order_data: dict | None = None) -> dict:
+        """
+        Средняя цена, объём, комиссия и время исполнения ордера: из зеркала
+        execution-отчётов, иначе avgPrice из WS-сообщения ордера или из
+        истории ордеров (один REST-запрос). {} — если данных нет.
+        """
+        fill = self.account_state.fills.get(order_id)
+        if fill and fill["qty"]:
+            return {"price": self.account_state.avg_fill_price(order_id),
+                    "qty": fill["qty"], "fee": fill["fee"], "time": fill["last_time"]}
+        order = order_data
+        if not order or not _float(order.get("avgPrice")):
+            try:
+                resp = self.client.http_client.get_order_history(
+                    category="linear", symbol=symbol, orderId=order_id)
+                rows = resp.get("result", {}).get("list", [])
+                order = rows[0] if rows else None
+            except Exception as e:
+                logging.warning(f"Исполнение ордера {order_id} не получено: {e}")
+                order = None
+        if not order or not _float(order.get("avgPrice")):
+            return {}
+        return {"price": _float(order["avgPrice"]),
+                "qty": _float(order.get("cumExecQty")) or None,
+                "fee": _float(order.get("cumExecFee")) if order.get("cumExecFee") else None,
+                "time": int(order["updatedTime"]) if order.get("updatedTime") else None}
+
+    def _record_exit(self, position: dict, role: str, order_id: str, reference,
+                     order_data: dict | None = None, send_time: int | None = None,
+                     ack_time: int | None = None) -> dict:
+        """Выход (tp1, tp2, sl, close): цена исполнения в position["exits"] и в статистику."""
+        fill = self._fill_report(order_id, position["symbol"], order_data)
+        if order_data:
+            # опорная цена — из самого ордера: лимит TP или триггер SL
+            reference = _float(order_data.get("triggerPrice")) or \
+                _float(order_data.get("price")) or reference
+        default_qty = position.get("tp1_qty") if role == "tp1" else position["qty"]
+        leg = {
+            "role": role,
+            "order_id": order_id,
+            "price": fill.get("price") or reference,
+            "qty": fill.get("qty") or default_qty,
+            "fee": fill.get("fee") or 0.0,
+            "time": fill.get("time"),
+        }
+        position.setdefault("exits", []).append(leg)
+        self.journal.put(position)
+        side = "Sell" if position["direction"] == "long" else "Buy"
+        self.executions.record(
+            position, role, side, leg["qty"], reference, fill.get("price"),
+            fill_time=fill.get("time"), fee=fill.get("fee"),
+            send_time=send_time, ack_time=ack_time)
+        return leg
+
+    @staticmethod
+    def realized_profit(position: dict, close_price: float | None = None) -> float:
+        """
+        Прибыль по исполнениям выходов за вычетом известных комиссий.
+        close_price — для объёма, выход которого не записан.
+        """
+        sign = 1 if position["direction"] == "long" else -1
+        exits = position.get("exits") or []
+        profit = sum(sign * (leg["price"] - position["entry"]) * leg["qty"] for leg in exits)
+        if not exits and close_price:
+            profit = sign * (close_price - position["entry"]) * position["qty"]
+        fees = position.get("entry_fee") or 0.0
+        fees += sum(leg.get("fee") or 0.0 for leg in exits)
+        return profit - fees
+
     def handle_order_status(self, order_id, status, order_data=None):
         """
         Вызывается из BybitClient, когда меняется статус ордера (WS-сообщение).
         Проверяем, как это влияет на нашу позицию.
         """
-        position = None
-        for p in self.active_positions:
-            if order_id in [p.get("order_id"),
-                            p.get("sl_order_id"),
-                            p.get("tp1_order_id"),
-                            p.get("tp2_order_id")]:
-                position = p
-                break
-
+        position = self.order_index.get(order_id)
         if not position:
             return
 
@@ -450,7 +971,7 @@ class PositionManager:
         if status == "Filled":
             # уведомление об открытии
             if order_id == position.get("order_id") and not position.get("notified_open"):
-                send_telegram_message({
+                self._notify({
                     "position": {
                         "symbol": position["symbol"],
                         "direction": position["direction"].upper(),
@@ -464,17 +985,13 @@ class PositionManager:
                 position["notified_open"] = True
 
             elif order_id == position.get("tp1_order_id"):
+                leg = self._record_exit(position, "tp1", order_id, position["tp1"],
+                                        order_data)
                 if self.tp_mode == "single":
-                    # вычисляем текущую цену и профит
-                    close_price = self.client.get_current_price(
-                        position['symbol'])
-                    profit = (
-                        (close_price - position['entry']) * position['qty']
-                        if position['direction'] == 'long'
-                        else (position['entry'] - close_price) * position['qty']
-                    )
+                    close_price = leg["price"]
+                    profit = self.realized_profit(position)
                     # отправляем отдельное TP‐уведомление
-                    send_telegram_message({
+                    self._notify({
                         "position_tp": True,
                         "position": {
                             **position,
@@ -486,13 +1003,16 @@ class PositionManager:
                     self.close_position(position, reason="TP")
                 else:
                     # dual-режим — частичное закрытие и перестановка SL
-                    self.handle_tp1_filled(position)
+                    self.handle_tp1_filled(
+                        position, _float((order_data or {}).get("cumExecQty")) or None)
 
             elif order_id == position.get("tp2_order_id"):
+                self._record_exit(position, "tp2", order_id, position["tp2"], order_data)
                 self.close_position(position, reason="TP2")
 
             elif order_id == position.get("sl_order_id"):
                 # стоп-лосс сработал — полностью закрываем позицию
+                self._record_exit(position, "sl", order_id, position["sl"], order_data)
                 self.close_position(position, reason="SL")
 
         elif status == "PartiallyFilled":
@@ -526,7 +1046,7 @@ class PositionManager:
                         if status == "Filled":
                             logging.info(f"Ордер {order_id} исполнен")
                             return True
-                        elif status in ["Rejected", "Cancelled"]:
+                        elif status in ["Rejected", "Cancelled", "Deactivated"]:
                             logging.error(f"Ордер {order_id} был {status}")
                             return False
                     logging.warning(
@@ -541,7 +1061,7 @@ class PositionManager:
                     logging.info(
                         f"Ордер {order_id} частично исполнен, продолжаем ожидание…")
                     continue
-                elif status in ["Rejected", "Cancelled"]:
+                elif status in ["Rejected", "Cancelled", "Deactivated"]:
                     logging.error(f"Ордер {order_id} был {status}")
                     return False
 
@@ -553,3 +1073,17 @@ class PositionManager:
         logging.warning(
             f"Ордер {order_id} не исполнен после {max_attempts} попыток")
         return False
+
+
+def _price_str(price: float, tick: float) -> str:
+    """Цена строкой с точностью шага цены (без хвостов float)."""
+    text = f"{tick:f}".rstrip("0")
+    dec = len(text.split(".")[1]) if "." in text else 0
+    return f"{price:.{dec}f}"
+
+
+def _float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
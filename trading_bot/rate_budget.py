@@ -0,0 +1,48 @@
+# rate_budget.py
+import threading
+import time
+
+ORDER_RATE_LIMIT = 10.0   # запросов/сек. на создание ордеров: лимит Bybit на UID
+RATE_LIMIT_CODE = 10006   # "Too many visits" — бюджет биржи исчерпан
+
+
+class RateBudget:
+    """
+    Token bucket на запросы одного аккаунта. acquire() ждёт токен в потоке
+    вызывающего, поэтому аккаунты не делят бюджет и не тормозят друг друга.
+    После 10006 hold() закрывает бюджет до X-Bapi-Limit-Reset-Timestamp.
+    """
+
+    def __init__(self, per_second: float = ORDER_RATE_LIMIT):
+        self.rate = per_second
+        self.tokens = per_second
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.waited = 0.0   # сек. ожидания токенов за всё время
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+                self.waited += delay
+            time.sleep(delay)
+
+    def hold(self, resp_headers=None) -> None:
+        """Биржа ответила 10006: ждём сброса лимита (или секунду)."""
+        reset_ms = (resp_headers or {}).get("X-Bapi-Limit-Reset-Timestamp")
+        delay = max(0.0, int(reset_ms) / 1000 - time.time()) if reset_ms else 1.0
+        with self._lock:
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + min(delay, 5.0))
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "waited": round(self.waited, 3)}
@@ -0,0 +1,177 @@
+# stop_engine.py
+import logging
+import math
+import threading
+import time
+
+TRAILING_ATR_MULTIPLIER = 0.0   # стоп тянется на k·ATR за лучшей ценой; 0 — выключено
+BREAKEVEN_R = 0.0               # после движения на X·R стоп в безубыток; 0 — выключено
+BREAKEVEN_OFFSET = 0.0020       # безубыток с запасом на комиссию, как calculate_new_sl
+TIME_STOP_MINUTES = 0           # закрыть позицию, если TP1 не взят за N минут; 0 — выключено
+STOP_AMEND_INTERVAL = 2.0       # сек. между изменениями стопа одной позиции
+TIME_STOP_ATTEMPTS = 3          # неудачных закрытий по тайм-стопу, дальше — только алерт
+
+
+class StopEngine:
+    """
+    Ведение стопов по ценам из публичного потока, без запросов к бирже.
+    Все правила по умолчанию выключены и включаются в TRADING_CONFIG.
+
+    on_price() вызывается в event loop на каждое обновление цены и только
+    передаёт её в поток order-state, где меняются позиции; цены, пришедшие,
+    пока проверка ждёт очереди, сливаются в одну (последняя и экстремумы).
+    Для каждой позиции символа считается желаемый стоп: безубыток после
+    движения на breakeven_r·R (R — расстояние от входа до начального SL),
+    трейлинг на k·ATR за лучшей ценой. Стоп только подтягивается; к бирже
+    уходит amend SL-ордера (один запрос, позиция всё время под стопом) и
+    лишь если стоп сдвинулся хотя бы на тик и с прошлого изменения прошло
+    не меньше amend_interval. Сам amend выполняется в потоке order-state.
+
+    Тайм-стоп закрывает позицию рынком в io_executor: ожидание исполнения
+    не держит order-state. Позиция помечается closing и закрывается один
+    раз; после неудачи повтор через amend_interval·2^n, после
+    TIME_STOP_ATTEMPTS неудач — алерт и отказ от тайм-стопа.
+    """
+
+    def __init__(self, position_manager, config: dict | None = None,
+                 atr_for=None, clock=time.time):
+        # clock — секунды эпохи: с ним сравнивается opened_at позиции
+        config = config or {}
+        self.pm = position_manager
+        self.atr_for = atr_for or (lambda symbol: None)
+        self.clock = clock
+        self.trailing_mult = config.get('trailing_atr_multiplier', TRAILING_ATR_MULTIPLIER)
+        self.breakeven_r = config.get('breakeven_r', BREAKEVEN_R)
+        self.time_stop = config.get('time_stop_minutes', TIME_STOP_MINUTES) * 60
+        self.amend_interval = config.get('stop_amend_interval', STOP_AMEND_INTERVAL)
+        self.time_stop_attempts = config.get('time_stop_attempts', TIME_STOP_ATTEMPTS)
+        # ключ позиции -> best, risk, last_amend, pending, closing, close_failures, retry_at
+        self.state: dict[str, dict] = {}
+        # символ -> (последняя, максимум, минимум) с прошлой проверки
+        self._prices: dict[str, tuple[float, float, float]] = {}
+        self._prices_lock = threading.Lock()
+        self.amends = 0
+        self.skipped = 0
+
+    def on_price(self, symbol: str, price: float) -> None:
+        if symbol not in self.pm.symbol_positions:
+            return
+        with self._prices_lock:
+            queued = self._prices.get(symbol)
+            if queued is None:
+                self._prices[symbol] = (price, price, price)
+            else:
+                self._prices[symbol] = (price, max(queued[1], price), min(queued[2], price))
+        if queued is None:
+            self.pm.bridge.order_executor.submit(self._check_symbol, symbol)
+
+    def _check_symbol(self, symbol: str) -> None:
+        """Проверка стопов символа; в потоке order-state."""
+        with self._prices_lock:
+            price, high, low = self._prices.pop(symbol)
+        positions = self.pm.positions_for(symbol)
+        if not positions:
+            return
+        spec = self.pm.context.specs.get(symbol)
+        if spec is None:
+            return  # контекст ещё не прогрет — шаг цены неизвестен
+        tick = float(spec[1]["priceFilter"]["tickSize"])
+        now = self.clock()
+        for position in positions:
+            self._check(position, price, tick, now, high, low)
+
+    def _check(self, position: dict, price: float, tick: float, now: float,
+               high: float | None = None, low: float | None = None) -> None:
+        key = position["order_id"]
+        long = position["direction"] == "long"
+        extreme = (high if long else low) or price
+        st = self.state.get(key)
+        if st is None:
+            risk = abs(position["entry"] - (position.get("initial_sl") or position["sl"] or 0))
+            st = self.state[key] = {"best": extreme, "risk": risk,
+                                    "last_amend": 0.0, "pending": False, "closing": False,
+                                    "close_failures": 0, "retry_at": 0.0}
+        st["best"] = max(st["best"], extreme) if long else min(st["best"], extreme)
+        if st["pending"] or st["closing"]:
+            return
+
+        opened = position.get("opened_at")
+        if self.time_stop and opened and not position.get("tp1_hit") and \
+                now - opened / 1000 >= self.time_stop and \
+                st["close_failures"] < self.time_stop_attempts:
+            if now < st["retry_at"]:
+                return
+            st["closing"] = True
+            logging.info(f"Тайм-стоп {position['symbol']} {key}")
+            bridge = self.pm.bridge
+            bridge.io_executor.submit(
+                self.pm.market_close_active_position, key, "TimeStop"
+            ).add_done_callback(lambda future: bridge.order_executor.submit(
+                self._time_stop_done, position, st, future))
+            return
+
+        if not position.get("sl_order_id") or not position.get("sl"):
+            return
+        target = self._target(position, st, long)
+        if target is None:
+            return
+        target = math.floor(target / tick) * tick if long else math.ceil(target / tick) * tick
+        moved = target - position["sl"] if long else position["sl"] - target
+        # не ближе тика к цене: такой стоп сработал бы сразу
+        beyond = price - target < tick if long else target - price < tick
+        if moved < tick or beyond:
+            return
+        if now - st["last_amend"] < self.amend_interval:
+            self.skipped += 1
+            return
+        st["pending"] = True
+        st["last_amend"] = now
+        self._submit(st, self.pm.amend_stop, position, round(target, 10))
+
+    def _target(self, position: dict, st: dict, long: bool) -> float | None:
+        entry, best, risk = position["entry"], st["best"], st["risk"]
+        sign = 1 if long else -1
+        targets = []
+        if self.breakeven_r and risk and sign * (best - entry) >= self.breakeven_r * risk:
+            targets.append(entry * (1 + sign * BREAKEVEN_OFFSET))
+        atr = self.atr_for(position["symbol"])
+        if self.trailing_mult and atr:
+            targets.append(best - sign * self.trailing_mult * atr)
+        if not targets:
+            return None
+        return max(targets) if long else min(targets)
+
+    def _time_stop_done(self, position: dict, st: dict, future) -> None:
+        """Итог закрытия по тайм-стопу; в потоке order-state."""
+        st["closing"] = False
+        error = future.exception()
+        if error is None and future.result() is not None:
+            return
+        if position["order_id"] not in self.pm.active_positions:
+            return   # позицию закрыл SL/TP, пока шло закрытие
+        if error is not None:
+            logging.error(f"Ошибка тайм-стопа {position['symbol']}: {error}")
+        st["close_failures"] += 1
+        if st["close_failures"] >= self.time_stop_attempts:
+            logging.error(f"Тайм-стоп {position['symbol']}: позиция не закрыта "
+                          f"за {st['close_failures']} попыток, больше не пробуем")
+            self.pm._notify(f"⚠️ Тайм-стоп {position['symbol']}: позиция не закрыта "
+                            f"за {st['close_failures']} попыток, закройте вручную")
+            return
+        st["retry_at"] = self.clock() + self.amend_interval * 2 ** st["close_failures"]
+
+    def _submit(self, st: dict, func, *args) -> None:
+        def done(future):
+            st["pending"] = False
+            if future.exception() is not None:
+                logging.error(f"Ошибка ведения стопа: {future.exception()}")
+            elif func == self.pm.amend_stop and future.result():
+                self.amends += 1
+        self.pm.bridge.order_executor.submit(func, *args).add_done_callback(done)
+
+    def forget(self, key: str) -> None:
+        self.state.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"tracked": len(self.state), "amends": self.amends,
+                "throttled": self.skipped}
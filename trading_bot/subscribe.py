@@ -4,7 +4,8 @@ import json
 from datetime import datetime
 
 from .market_analyzer import MarketAnalyzer
-from .config import TRADING_CONFIG
+from .kline_decoder import KlineDecoder
+from .config import TRADING_CONFIG, BYBIT_WS_PUBLIC_URL
 import os
 from dotenv import load_dotenv
 
@@ -39,17 +40,15 @@ async def subscribe(ws):
     await ws.send(json.dumps(subscribe_msg))
 
 analyzer = MarketAnalyzer(config=TRADING_CONFIG)
+decoder = KlineDecoder(closed_only=True)
 
 
 async def handle_data(ws):
     while True:
         try:
             raw_data = await ws.recv()
-            print(f"Получены данные: {raw_data}")
-            data = json.loads(raw_data)
 
-            if data.get("data") and data["data"][0].get("confirm"):
-                candle = data["data"][0]
+            for candle in decoder.decode(raw_data):
                 if candle.get("interval") == "15":
                     analyzer.update_15m_candle(candle)
                     print(f"15‑минутная свеча обновлена для зон: {candle}")
@@ -73,7 +72,7 @@ async def handle_data(ws):
 async def main():
     while True:
         try:
-            async with websockets.connect("wss://stream.bybit.com/v5/public/linear") as ws:
+            async with websockets.connect(BYBIT_WS_PUBLIC_URL) as ws:
                 print("Connected!")
                 await subscribe(ws)
                 heartbeat_task = asyncio.create_task(send_heartbeat(ws))
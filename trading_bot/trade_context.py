@@ -0,0 +1,121 @@
+# trade_context.py
+import logging
+import threading
+import time
+
+SPEC_TTL = 3600.0         # сек.: шаг цены/объёма меняется редко
+PRICE_TTL = 10.0          # сек.: цена старше — перед входом берём тикер
+REFRESH_INTERVAL = 30.0   # сек.: фоновое обновление контекста символа
+LEVERAGE_NOT_MODIFIED = "110043"
+
+
+class TradeContext:
+    """
+    Всё, что нужно для входа, заранее в памяти, по символу: параметры
+    инструмента, последняя цена (из потока свечей), текущее плечо на
+    бирже. Эквити — из зеркала AccountState. open_position читает
+    контекст и обращается к REST только за тем, чего в нём нет или что
+    устарело; при тёплом контексте остаётся один запрос — сам ордер.
+
+    refresh() вызывается в фоне (io-поток): при старте торговли, раз в
+    REFRESH_INTERVAL, на предварительном сигнале и при смене плеча
+    в настройках.
+    """
+
+    def __init__(self, client, account_state):
+        self.client = client
+        self.account_state = account_state
+        self.specs: dict[str, tuple[float, dict]] = {}     # symbol -> (время, instrument)
+        self.prices: dict[str, tuple[float, float]] = {}   # symbol -> (время, цена)
+        self.leverages: dict[str, float] = {}              # symbol -> плечо на бирже
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- обновление ----------
+
+    def on_price(self, symbol: str, price: float) -> None:
+        """Из event loop на каждое сообщение kline; O(1)."""
+        self.prices[symbol] = (time.monotonic(), float(price))
+
+    def refresh(self, symbol: str, leverage=None) -> None:
+        """Блокирующее обновление устаревших частей; ошибки только в лог."""
+        try:
+            cached = self.specs.get(symbol)
+            if cached is None or time.monotonic() - cached[0] > SPEC_TTL:
+                self._fetch_spec(symbol)
+            cached = self.prices.get(symbol)
+            if cached is None or time.monotonic() - cached[0] > PRICE_TTL:
+                self._fetch_price(symbol)
+            if leverage is not None:
+                self.apply_leverage(symbol, leverage)
+            if self.account_state.equity is None:
+                self.account_state.refresh_wallet()
+        except Exception as e:
+            logging.warning(f"Обновление контекста {symbol} не удалось: {e}")
+
+    def apply_leverage(self, symbol: str, leverage) -> None:
+        """Выставляет плечо на бирже, если оно отличается от известного."""
+        with self._lock:
+            current = self.account_state.leverage(symbol)
+            if current is None:
+                current = self.leverages.get(symbol)
+            if current is None:
+                positions = self.client.http_client.get_positions(
+                    category="linear", symbol=symbol)
+                rows = positions["result"]["list"]
+                current = float(rows[0]["leverage"]) if rows else None
+            if current != float(leverage):
+                try:
+                    self.client.http_client.set_leverage(
+                        category="linear", symbol=symbol,
+                        buyLeverage=str(leverage), sellLeverage=str(leverage))
+                    logging.info(f"Плечо обновлено: {leverage}x")
+                except Exception as e:
+                    if LEVERAGE_NOT_MODIFIED not in str(e):
+                        raise
+            self.leverages[symbol] = float(leverage)
+
+    def _fetch_spec(self, symbol: str) -> dict:
+        info = self.client.get_symbol_info(symbol)
+        if info:
+            self.specs[symbol] = (time.monotonic(), info)
+        return info
+
+    def _fetch_price(self, symbol: str) -> float | None:
+        price = self.client.get_current_price(symbol)
+        if price:
+            self.on_price(symbol, price)
+        return price
+
+    # ---------- чтение ----------
+
+    def spec(self, symbol: str) -> dict:
+        cached = self.specs.get(symbol)
+        if cached is not None and time.monotonic() - cached[0] <= SPEC_TTL:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        return self._fetch_spec(symbol)
+
+    def price(self, symbol: str) -> float | None:
+        cached = self.prices.get(symbol)
+        if cached is not None and time.monotonic() - cached[0] <= PRICE_TTL:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        return self._fetch_price(symbol)
+
+    def ensure_leverage(self, symbol: str, leverage) -> None:
+        current = self.account_state.leverage(symbol)
+        if current is None:
+            current = self.leverages.get(symbol)
+        if current == float(leverage):
+            self.hits += 1
+            return
+        self.misses += 1
+        self.apply_leverage(symbol, leverage)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses,
+                "symbols": sorted(self.specs)}
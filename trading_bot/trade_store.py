@@ -0,0 +1,147 @@
+# trade_store.py
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .closed_pnl import (OVERLAP_MS, WINDOW_MS, RecentIds, fetch_paged, record_time,
+                         sync_closed_pnl)
+
+EXECUTIONS_LIMIT = 1000        # сколько последних исполнений держим
+RECENT_LIMIT = 50              # сколько последних закрытых сделок отдаём в статистике
+FIRST_SYNC_MS = WINDOW_MS      # исполнения за неделю при первом запуске
+
+
+class TradeStore:
+    """
+    Локальная копия исполнений и закрытых сделок (closed-pnl) по символу.
+
+    sync() догружает только новое: от последнего увиденного времени
+    (с перекрытием), постранично через nextPageCursor. Closed-pnl берётся
+    через sync_closed_pnl: при закрытии сделки одна выборка идёт и сюда,
+    и в PnlAggregate. Статистика по
+    закрытым сделкам (прибыль, убыток, число, прибыльные) пересчитывается
+    на каждой новой записи, поэтому отчёты строятся из памяти за O(1)
+    плюс форматирование не более RECENT_LIMIT строк.
+
+    sync() работает в фоновом потоке и собирает новые коллекции на копиях,
+    подменяя ссылки в конце, — читатели в event loop блокировок не ждут.
+    Состояние closed-pnl под отдельной короткой блокировкой: reset_pnl()
+    зовётся из event loop и не ждёт REST-запросов sync(); выборка, начатая
+    до сброса, применяется, только если покрывает новый интервал.
+    """
+
+    def __init__(self, http_client, symbol: str):
+        self.http_client = http_client
+        self.symbol = symbol
+        self.executions: OrderedDict[str, dict] = OrderedDict()
+        self.exec_cursor: int | None = None
+        self.pnl_since: int | None = None
+        self.pnl_cursor: int | None = None
+        self.pnl_seen = RecentIds(EXECUTIONS_LIMIT)
+        self.recent_trades: deque = deque(maxlen=RECENT_LIMIT)
+        self.stats = _empty_stats()
+        self.last_sync = 0.0
+        self._lock = threading.Lock()       # одна выборка исполнений за раз
+        self._pnl_lock = threading.Lock()   # поля closed-pnl, без сетевых вызовов
+
+    def reset_pnl(self, since_ms: int | None) -> None:
+        """Статистика закрытых сделок с момента since_ms (начало торговли)."""
+        with self._pnl_lock:
+            self.pnl_since = since_ms
+            self.pnl_cursor = since_ms
+            self.pnl_seen.clear()
+            self.recent_trades = deque(maxlen=RECENT_LIMIT)
+            self.stats = _empty_stats()
+
+    # ---------- синхронизация ----------
+
+    def sync(self) -> None:
+        """Блокирующая догрузка новых исполнений и закрытых сделок."""
+        self.sync_executions()
+        sync_closed_pnl(self.http_client, self.symbol, [self])
+
+    def sync_executions(self) -> None:
+        with self._lock:
+            now_ms = int(time.time() * 1000)
+            start = self.exec_cursor - OVERLAP_MS if self.exec_cursor \
+                else now_ms - FIRST_SYNC_MS
+            fetched = fetch_paged(self.http_client.get_executions, self.symbol, start, now_ms)
+            executions = OrderedDict(self.executions)
+            for e in sorted(fetched, key=lambda e: int(e.get("execTime") or 0)):
+                self._add_execution(executions, e)
+            self.executions = executions
+            self.exec_cursor = now_ms
+            self.last_sync = time.time()
+
+    def pnl_start(self, symbol: str, now_ms: int) -> int | None:
+        """С какого времени нужны записи closed-pnl; None — торговля не идёт."""
+        with self._pnl_lock:
+            if self.pnl_cursor is None:
+                return None
+            return max(self.pnl_cursor - OVERLAP_MS, self.pnl_since)
+
+    def apply_closed_pnl(self, symbol: str, records: list[dict], start: int,
+                         now_ms: int) -> int:
+        with self._pnl_lock:
+            if self.pnl_cursor is None or \
+                    start > max(self.pnl_cursor - OVERLAP_MS, self.pnl_since):
+                return 0   # выборка начата до сброса и новый интервал не покрывает
+            recent = deque(self.recent_trades, maxlen=RECENT_LIMIT)
+            added = 0
+            for r in records:
+                if record_time(r) >= self.pnl_since:
+                    added += self._add_closed_pnl(recent, r)
+            self.recent_trades = recent
+            self.pnl_cursor = max(self.pnl_cursor, now_ms)
+            self.last_sync = time.time()
+            return added
+
+    @staticmethod
+    def _add_execution(executions: OrderedDict, e: dict) -> None:
+        exec_id = e.get("execId")
+        if not exec_id or exec_id in executions:
+            return
+        executions[exec_id] = {
+            "symbol": e.get("symbol", ""),
+            "side": e.get("side", ""),
+            "price": float(e.get("execPrice") or 0),
+            "qty": float(e.get("execQty") or 0),
+            "time": int(e.get("execTime") or 0),
+        }
+        while len(executions) > EXECUTIONS_LIMIT:
+            executions.popitem(last=False)
+
+    def _add_closed_pnl(self, recent: deque, r: dict) -> int:
+        if not self.pnl_seen.add(r.get("orderId")):
+            return 0
+        pnl = float(r.get("closedPnl") or 0)
+        s = self.stats
+        self.stats = {
+            "total_profit": s["total_profit"] + (pnl if pnl > 0 else 0.0),
+            "total_loss": s["total_loss"] + (pnl if pnl < 0 else 0.0),
+            "total_pnl": s["total_pnl"] + pnl,
+            "total_trades": s["total_trades"] + 1,
+            "profitable_trades": s["profitable_trades"] + (pnl > 0),
+        }
+        recent.appendleft(r)
+        return 1
+
+    # ---------- чтение ----------
+
+    def last_executions(self, limit: int = 50) -> list[dict]:
+        """Последние исполнения, от новых к старым."""
+        result = []
+        for record in reversed(self.executions.values()):
+            if len(result) >= limit:
+                break
+            result.append(record)
+        return result
+
+    def trade_statistics(self) -> dict:
+        return {**self.stats, "recent_trades": list(self.recent_trades)}
+
+
+def _empty_stats() -> dict:
+    return {"total_profit": 0.0, "total_loss": 0.0, "total_pnl": 0.0,
+            "total_trades": 0, "profitable_trades": 0}
+
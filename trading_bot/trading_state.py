@@ -1,21 +1,35 @@
 # trading_state.py
 import datetime
-from pybit.unified_trading import HTTP
+from .trade_store import TradeStore
 
 
 class TradingState:
-    def __init__(self, api_key, api_secret, symbol="BTCUSDT"):
-        self.client = HTTP(api_key=api_key, api_secret=api_secret)
+    def __init__(self, http_client, symbol="BTCUSDT", account_state=None):
+        # HTTP-клиент основного счёта (pybit или PaperHttp в бумажном режиме)
+        self.client = http_client
+        self.account_state = account_state
         self.symbol = symbol
         self.trading_start_time = None
+        self.trade_stores: dict[str, TradeStore] = {}
+
+    def trade_store(self, symbol: str | None = None) -> TradeStore:
+        """Локальный кэш исполнений и закрытых сделок по символу."""
+        symbol = symbol or self.symbol
+        if symbol not in self.trade_stores:
+            self.trade_stores[symbol] = TradeStore(self.client, symbol)
+        return self.trade_stores[symbol]
 
     def start_trading(self):
         """Устанавливает время начала торговли."""
         self.trading_start_time = datetime.datetime.utcnow()
+        self.trade_store().reset_pnl(
+            int(self.trading_start_time.replace(
+                tzinfo=datetime.timezone.utc).timestamp() * 1000))
 
     def reset_trading_stats(self):
         """Сбрасывает время начала торговли."""
         self.trading_start_time = None
+        self.trade_store().reset_pnl(None)
 
     def get_closed_pnl(self, limit=50):
         """Получает последние закрытые позиции и их PnL с биржи, начиная с trading_start_time."""
@@ -40,25 +54,11 @@ class TradingState:
             return []
 
     def get_trade_statistics(self):
-        """Формирует статистику по закрытым сделкам."""
-        trades = self.get_closed_pnl()
-        total_profit = sum(float(t["closedPnl"])
-                           for t in trades if float(t["closedPnl"]) > 0)
-        total_loss = sum(float(t["closedPnl"])
-                         for t in trades if float(t["closedPnl"]) < 0)
-        total_pnl = total_profit + total_loss
-        profitable_trades = len(
-            [t for t in trades if float(t["closedPnl"]) > 0])
-        total_trades = len(trades)
-
-        return {
-            "total_profit": total_profit,
-            "total_loss": total_loss,
-            "total_pnl": total_pnl,
-            "total_trades": total_trades,
-            "profitable_trades": profitable_trades,
-            "recent_trades": trades[:50]  # последние 5 сделок
-        }
+        """
+        Статистика по закрытым сделкам с начала торговли — из TradeStore,
+        суммы уже посчитаны при догрузке (см. TradeStore.sync).
+        """
+        return self.trade_store().trade_statistics()
 
     def get_trading_duration(self):
         """Возвращает время с начала торговли."""
@@ -70,7 +70,9 @@ class TradingState:
         return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
 
     def get_current_positions(self):
-        """Получает текущие позиции с биржи через REST API."""
+        """Текущие позиции: из локального зеркала аккаунта, иначе через REST API."""
+        if self.account_state is not None and self.account_state.synced:
+            return self._format_local_positions()
         try:
             response = self.client.get_positions(
                 category="linear",
@@ -99,3 +101,18 @@ class TradingState:
         except Exception as e:
             print(f"Ошибка: {e}")
             return "Ошибка при получении позиций."
+
+    def _format_local_positions(self):
+        pos = self.account_state.get_position(self.symbol)
+        if not pos or not pos["size"]:
+            return "Нет открытых позиций."
+        info = (
+            "Текущие позиции:\n"
+            f"Символ: {pos['symbol']}\n"
+            f"Направление: {pos['side']}\n"
+            f"Цена входа: {pos['avg_price']}\n"
+            f"Размер: {pos['size']}\n"
+            f"Нереализованный PnL: {pos['unrealised_pnl']}\n"
+            "----------------"
+        )
+        return info
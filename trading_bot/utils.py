@@ -1,8 +1,9 @@
 import logging
-import requests
 import random
 
 from .config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, LOG_FILE
+from .config import TELEGRAM_API_URL
+from .notifier import TelegramNotifier
 
 
 logging.basicConfig(
@@ -12,9 +13,22 @@ logging.basicConfig(
 )
 
 
+# общий отправитель: одна очередь, один поток, один HTTP-пул
+notifier = TelegramNotifier(
+    TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, api_url=TELEGRAM_API_URL)
+
+
 def send_telegram_message(message):
     """
-    Формирует текст и отправляет его в Telegram.
+    Ставит уведомление в очередь Telegram и сразу возвращается.
+    Текст формируется здесь же, пока позиция ещё не изменилась.
+    """
+    notifier.notify(format_telegram_message(message))
+
+
+def format_telegram_message(message) -> str:
+    """
+    Формирует текст уведомления.
     Порядок проверок важен: сначала закрытия / частичные закрытия,
     затем новые позиции — чтобы не путать сообщения.
     """
@@ -86,15 +100,6 @@ def send_telegram_message(message):
                 f"Прибыль: {pos['profit']:.2f} USDT\n"
                 f"{outro}"
             )
-            try:
-                url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-                payload = {"chat_id": TELEGRAM_CHAT_ID,
-                           "text": text, "parse_mode": "HTML"}
-                requests.post(url, json=payload).raise_for_status()
-                logging.info(f"Telegram TP message sent: {text}")
-            except Exception as e:
-                logging.error(f"Ошибка при отправке TP-уведомления: {e}")
-            return
 
         # single-TPновое открытие
         elif 'position_single' in message:
@@ -119,16 +124,6 @@ def send_telegram_message(message):
                 f"TP: {pos['tp']:.2f}\n"
                 f"{outro}"
             )
-            try:
-                url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-                payload = {"chat_id": TELEGRAM_CHAT_ID,
-                           "text": text, "parse_mode": "HTML"}
-                requests.post(url, json=payload).raise_for_status()
-                logging.info(f"Telegram single‐TP message sent: {text}")
-            except Exception as e:
-                logging.error(
-                    f"Ошибка при отправке уведомления single‐TP: {e}")
-            return
 
         # новая позиция
         elif 'position' in message:
@@ -158,19 +153,4 @@ def send_telegram_message(message):
     else:
         text = message
 
-    response = None
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-        payload = {
-            "chat_id": TELEGRAM_CHAT_ID,
-            "text": text,
-            "parse_mode": "HTML"
-        }
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        logging.info(f"Telegram message sent: {text}")
-    except requests.exceptions.RequestException as e:
-        status = response.status_code if response is not None else 'N/A'
-        body = response.text if response is not None else 'N/A'
-        logging.error(
-            f"Telegram error: {e}, HTTP status: {status}, Response: {body}")
+    return text
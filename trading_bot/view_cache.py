@@ -0,0 +1,59 @@
+# view_cache.py
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+EXCHANGE_READ_WORKERS = 4   # потоки для REST-чтений из обработчиков Telegram
+VIEW_TTL = 5.0              # сек.: повторные "Обновить" в этом окне не ходят на биржу
+
+
+class ViewCache:
+    """
+    Данные для экранов бота: блокирующие чтения с биржи уходят в
+    отдельный ограниченный пул потоков, результат кэшируется на ttl
+    секунд по ключу экрана, а одновременные запросы одного ключа
+    ждут один и тот же запрос (single-flight), а не запускают новые.
+    """
+
+    def __init__(self, ttl: float = VIEW_TTL, workers: int = EXCHANGE_READ_WORKERS):
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="exchange-read")
+        self._values: dict = {}      # key -> (время получения, значение)
+        self._in_flight: dict = {}   # key -> asyncio.Future
+        self.hits = 0
+        self.joined = 0
+        self.fetches = 0
+
+    async def get(self, key, func, *args, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        cached = self._values.get(key)
+        if cached and time.monotonic() - cached[0] < ttl:
+            self.hits += 1
+            return cached[1]
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.joined += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, lambda: func(*args))
+        self._in_flight[key] = future
+        self.fetches += 1
+        try:
+            value = await asyncio.shield(future)
+        finally:
+            self._in_flight.pop(key, None)
+        self._values[key] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self, key=None) -> None:
+        if key is None:
+            self._values.clear()
+        else:
+            self._values.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "joined": self.joined, "fetches": self.fetches,
+                "cached": len(self._values), "in_flight": len(self._in_flight)}
+
@@ -0,0 +1,168 @@
+# ws_bridge.py
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+PENDING_WARN = 1000    # столько событий до запуска event loop — повод для предупреждения
+IO_WORKERS = 4         # потоки для уведомлений и прочего блокирующего I/O
+FINAL_ORDER_STATUSES = ("Filled", "Rejected", "Cancelled", "Deactivated")
+
+
+class OrderWait:
+    """Ожидание финального статуса одного ордера; заполняется из потока WS."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.order: dict | None = None
+
+    def set(self, order: dict) -> None:
+        self.order = order
+        self._event.set()
+
+    def wait(self, timeout: float) -> dict | None:
+        """Данные ордера из пуша order; None — не дождались."""
+        return self.order if self._event.wait(timeout) else None
+
+
+class WsEventBridge:
+    """
+    Мост между потоком pybit WebSocket и asyncio.
+
+    Поток WS только кладёт сообщение в очередь через
+    loop.call_soon_threadsafe и сразу возвращается. Единственная
+    задача-потребитель по очереди передаёт события в handler, который
+    выполняется в однопоточном executor'е "order-state": все изменения
+    состояния позиций происходят только в этом потоке. Прочая блокирующая
+    работа (Telegram и т.п.) уходит в ограниченный io_executor.
+
+    expect_order() позволяет потоку order-state дождаться исполнения своего
+    ордера, не дожидаясь очереди: пуш order с нужным orderLinkId
+    сопоставляется прямо в submit() (поиск в словаре), само событие
+    всё равно идёт в очередь как обычно.
+    """
+
+    def __init__(self, handler, io_workers: int = IO_WORKERS):
+        self.handler = handler
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.queue: asyncio.Queue | None = None
+        self._consumer_task: asyncio.Task | None = None
+        # без ограничения: до start() ордерные события тоже терять нельзя
+        self._pending = deque()
+        self._pending_lock = threading.Lock()   # буфер и публикация loop/queue
+        self._order_waits: dict[str, OrderWait] = {}   # orderLinkId -> ожидание
+        self._order_thread: int | None = None
+        self.order_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="order-state",
+            initializer=self._mark_order_thread)
+        self.io_executor = ThreadPoolExecutor(
+            max_workers=io_workers, thread_name_prefix="ws-io")
+        self.received = 0
+        self.processed = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Привязывает мост к работающему loop и запускает потребителя."""
+        if self.loop is loop and self._consumer_task and not self._consumer_task.done():
+            return
+        # очередь без ограничения: ордерные события редкие, и терять их нельзя
+        queue = asyncio.Queue()
+        with self._pending_lock:
+            while self._pending:
+                queue.put_nowait(self._pending.popleft())
+            self.queue = queue
+            # loop публикуется последним: submit() видит его только с готовой очередью
+            self.loop = loop
+        self._consumer_task = loop.create_task(self._consume())
+
+    def stop(self) -> None:
+        if self._consumer_task:
+            self._consumer_task.cancel()
+            self._consumer_task = None
+        self.loop = None
+
+    def submit(self, message) -> None:
+        """Колбэк для pybit: вызывается в потоке WebSocket, не блокирует."""
+        self.received += 1
+        if self._order_waits and message.get("topic") == "order":
+            self._match_orders(message)
+        with self._pending_lock:
+            loop, queue = self.loop, self.queue
+            if loop is None or loop.is_closed():
+                # loop ещё не запущен — копим, отдадим при start()
+                self._pending.append(message)
+                if len(self._pending) % PENDING_WARN == 0:
+                    logging.warning(
+                        f"WS-мост не запущен, в буфере {len(self._pending)} событий")
+                return
+        loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    def expect_order(self, order_link_id: str) -> OrderWait:
+        """
+        Ждать финальный статус ордера по orderLinkId. Регистрируется до
+        отправки ордера: пуш может обогнать ответ REST.
+        """
+        wait = self._order_waits[order_link_id] = OrderWait()
+        return wait
+
+    def forget_order(self, order_link_id: str) -> None:
+        self._order_waits.pop(order_link_id, None)
+
+    def _match_orders(self, message: dict) -> None:
+        for order in message.get("data", []):
+            wait = self._order_waits.get(order.get("orderLinkId"))
+            if wait is not None and order.get("orderStatus") in FINAL_ORDER_STATUSES:
+                wait.set(order)
+
+    async def _consume(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await self.loop.run_in_executor(
+                    self.order_executor, self.handler, message)
+                self.processed += 1
+            except Exception as e:
+                logging.error(f"Ошибка обработки WS-события: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def run_serial(self, func, *args, **kwargs):
+        """
+        Выполняет func в потоке order-state — там же, где обрабатываются
+        WS-события, поэтому открытие/закрытие позиций не гоняется с ними.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.order_executor, lambda: func(*args, **kwargs))
+
+    def _mark_order_thread(self) -> None:
+        self._order_thread = threading.get_ident()
+
+    def call_serial(self, func, *args):
+        """
+        Синхронный run_serial для фоновых потоков: правка позиции уходит в
+        order-state, вызывающий ждёт результата. Из самого order-state
+        выполняется сразу, иначе поток ждал бы сам себя.
+        """
+        if threading.get_ident() == self._order_thread:
+            return func(*args)
+        return self.order_executor.submit(func, *args).result()
+
+    def run_blocking(self, func, *args, **kwargs):
+        """Отправляет блокирующую задачу в io_executor, не дожидаясь её."""
+        future = self.io_executor.submit(func, *args, **kwargs)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        exc = future.exception()
+        if exc:
+            logging.error(f"Ошибка фоновой задачи: {exc}")
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "queued": self.queue.qsize() if self.queue else len(self._pending),
+        }
@@ -0,0 +1,270 @@
+# ws_manager.py
+import asyncio
+import json
+import logging
+import time
+
+import websockets
+
+from .config import BYBIT_WS_PUBLIC_URL
+from .kline_decoder import KlineDecoder, loads
+from .latency_monitor import LatencyMonitor
+
+MAX_TOPICS_PER_CONNECTION = 200   # с запасом до лимита Bybit на длину args
+ARGS_PER_REQUEST = 10             # топиков в одном запросе subscribe
+MAX_CONNECTIONS = 8
+PING_INTERVAL = 20                # секунд
+RECONNECT_DELAY = 5               # секунд
+HEALTH_CHECK_INTERVAL = 5         # секунд между проверками порогов задержки
+PROCESSING_ALERT_INTERVAL = 300   # секунд между алертами об отставании обработки
+
+
+def _is_pong(raw) -> bool:
+    if isinstance(raw, (bytes, bytearray)):
+        return b'"pong"' in raw
+    return '"pong"' in raw
+
+
+def extract_topic(raw) -> str | None:
+    """Топик из сырого кадра без полного разбора JSON."""
+    if isinstance(raw, (bytes, bytearray)):
+        raw = raw.decode()
+    start = raw.find('"topic":')
+    if start < 0:
+        return None
+    start = raw.find('"', start + 8) + 1
+    end = raw.find('"', start)
+    return raw[start:end] if start > 0 and end > start else None
+
+
+class PublicConnection:
+    """
+    Одно публичное WS-подключение со своим набором топиков и heartbeat.
+    Ping несут req_id и сопоставляются с pong; если pong пропадают или
+    задержки выходят за пороги LatencyMonitor, соединение рвётся и
+    восстанавливается, а on_alert получает текст с цифрами. Отставание
+    обработки только сообщается (не чаще PROCESSING_ALERT_INTERVAL).
+    """
+
+    def __init__(self, name: str, url: str, on_message, on_alert=None):
+        self.name = name
+        self.url = url
+        self.on_message = on_message
+        self.on_alert = on_alert
+        self.topics: set[str] = set()
+        self.ws = None
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self.forced_reconnects = 0
+        self.monitor = LatencyMonitor(name)
+        self._processing_alert_at: float | None = None
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            heartbeat = None
+            try:
+                async with websockets.connect(self.url) as ws:
+                    self.ws = ws
+                    self.monitor.reset()
+                    await self._send_op("subscribe", sorted(self.topics))
+                    self.connected.set()
+                    logging.info(f"{self.name}: подключено, топиков {len(self.topics)}")
+                    heartbeat = asyncio.create_task(self._heartbeat(ws))
+                    async for raw in ws:
+                        received_at = time.time()
+                        if _is_pong(raw):
+                            self.monitor.on_pong(loads(raw).get("req_id", ""))
+                            continue
+                        self.on_message(raw, self, received_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"{self.name}: соединение потеряно: {e}")
+            finally:
+                self.connected.clear()
+                self.ws = None
+                if heartbeat:
+                    heartbeat.cancel()
+            self.reconnects += 1
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _heartbeat(self, ws):
+        loop = asyncio.get_running_loop()
+        next_ping = loop.time() + PING_INTERVAL
+        while True:
+            await asyncio.sleep(min(HEALTH_CHECK_INTERVAL, PING_INTERVAL))
+            reason = self.monitor.check()
+            if reason:
+                await self._force_reconnect(ws, reason)
+                return
+            self._check_processing(loop.time())
+            if loop.time() >= next_ping:
+                next_ping = loop.time() + PING_INTERVAL
+                await ws.send(json.dumps(
+                    {"op": "ping", "req_id": self.monitor.next_ping()}))
+
+    async def _force_reconnect(self, ws, reason: str):
+        self.forced_reconnects += 1
+        logging.warning(f"{self.name}: переподключение — {reason}")
+        if self.on_alert is not None:
+            self.on_alert(
+                f"⚠️ {self.name}: переподключение WS\n"
+                f"Причина: {reason}\n{self.monitor.summary()}")
+        await ws.close()
+
+    def _check_processing(self, now: float):
+        reason = self.monitor.check_processing()
+        if not reason or (self._processing_alert_at is not None and
+                           now - self._processing_alert_at < PROCESSING_ALERT_INTERVAL):
+            return
+        self._processing_alert_at = now
+        logging.warning(f"{self.name}: {reason}")
+        if self.on_alert is not None:
+            self.on_alert(
+                f"⚠️ {self.name}: обработка отстаёт\n"
+                f"Причина: {reason}\n{self.monitor.summary()}")
+
+    async def _send_op(self, op: str, topics: list[str]):
+        if self.ws is None:
+            return  # топики уйдут при (пере)подключении
+        for i in range(0, len(topics), ARGS_PER_REQUEST):
+            await self.ws.send(json.dumps(
+                {"op": op, "args": topics[i:i + ARGS_PER_REQUEST]}))
+
+    async def subscribe(self, topics: list[str]):
+        self.topics.update(topics)
+        await self._send_op("subscribe", topics)
+
+    async def unsubscribe(self, topics: list[str]):
+        self.topics.difference_update(topics)
+        await self._send_op("unsubscribe", topics)
+
+    async def close(self):
+        self._task.cancel()
+        if self.ws is not None:
+            await self.ws.close()
+
+
+class PublicWsManager:
+    """
+    Пул публичных WS-подключений. Топики раскладываются по подключениям в
+    пределах лимита на подключение, подписка/отписка — без переподключения.
+    Входящие кадры маршрутизируются по топику через словарь обработчиков:
+    kline-топики сразу декодируются в свечи, остальные — в dict.
+
+    Обработчик: handler(topic, payload), где payload — список свечей для
+    kline.* или разобранное сообщение для прочих топиков. Обработчики
+    вызываются в event loop и должны быть быстрыми (обычно — положить в очередь).
+    """
+
+    def __init__(self, url: str = BYBIT_WS_PUBLIC_URL,
+                 max_topics_per_connection: int = MAX_TOPICS_PER_CONNECTION,
+                 max_connections: int = MAX_CONNECTIONS, on_alert=None):
+        self.url = url
+        self.on_alert = on_alert
+        self.max_topics = max_topics_per_connection
+        self.max_connections = max_connections
+        self.connections: list[PublicConnection] = []
+        self.topic_connection: dict[str, PublicConnection] = {}
+        self.handlers: dict[str, tuple] = {}
+        self.closed_decoder = KlineDecoder(closed_only=True)
+        self.all_decoder = KlineDecoder(closed_only=False)
+        self.unrouted = 0
+
+    async def subscribe(self, topic: str, handler, closed_only: bool = True):
+        """Регистрирует обработчик и подписывается на топик."""
+        self.handlers[topic] = (handler, closed_only)
+        if topic in self.topic_connection:
+            return
+        conn = self._pick_connection()
+        self.topic_connection[topic] = conn
+        await conn.subscribe([topic])
+
+    async def subscribe_many(self, topics: list[str], handler, closed_only: bool = True):
+        """Пакетная подписка: топики уходят пачками по ARGS_PER_REQUEST."""
+        by_conn: dict[PublicConnection, list[str]] = {}
+        for topic in topics:
+            self.handlers[topic] = (handler, closed_only)
+            if topic in self.topic_connection:
+                continue
+            conn = self._pick_connection()
+            conn.topics.add(topic)       # резервируем место до отправки
+            self.topic_connection[topic] = conn
+            by_conn.setdefault(conn, []).append(topic)
+        for conn, batch in by_conn.items():
+            await conn.subscribe(batch)
+
+    async def unsubscribe(self, topic: str):
+        self.handlers.pop(topic, None)
+        conn = self.topic_connection.pop(topic, None)
+        if conn is None:
+            return
+        await conn.unsubscribe([topic])
+        if not conn.topics:
+            self.connections.remove(conn)
+            await conn.close()
+
+    def _pick_connection(self) -> PublicConnection:
+        for conn in self.connections:
+            if len(conn.topics) < self.max_topics:
+                return conn
+        if len(self.connections) >= self.max_connections:
+            raise RuntimeError(
+                f"Превышен лимит: {self.max_connections} подключений "
+                f"по {self.max_topics} топиков")
+        conn = PublicConnection(
+            f"public-ws-{len(self.connections) + 1}", self.url, self._route,
+            on_alert=lambda text: self.on_alert and self.on_alert(text))
+        self.connections.append(conn)
+        return conn
+
+    def _route(self, raw, conn: PublicConnection, received_at: float):
+        topic = extract_topic(raw)
+        entry = self.handlers.get(topic) if topic else None
+        if entry is None:
+            if topic:
+                self.unrouted += 1
+            return
+        handler, closed_only = entry
+        try:
+            if topic.startswith("kline."):
+                decoder = self.closed_decoder if closed_only else self.all_decoder
+                payload = decoder.decode(raw)
+                if not payload:
+                    return
+                conn.monitor.on_message(payload[-1]["ts"], received_at)
+                for candle in payload:
+                    candle["received_at"] = received_at
+            else:
+                payload = loads(raw)
+                conn.monitor.on_message(payload.get("ts", 0), received_at)
+            handler(topic, payload)
+        except Exception as e:
+            logging.error(f"Ошибка обработки {topic}: {e}")
+
+    def record_processed(self, candle: dict) -> None:
+        """Отметка, что свеча из kline-топика полностью обработана."""
+        topic = f"kline.{candle.get('interval')}.{candle.get('symbol')}"
+        conn = self.topic_connection.get(topic)
+        if conn is not None and "received_at" in candle:
+            conn.monitor.on_processed(candle["received_at"])
+
+    async def close(self):
+        for conn in self.connections:
+            await conn.close()
+        self.connections.clear()
+        self.topic_connection.clear()
+
+    def stats(self) -> dict:
+        return {
+            "connections": [
+                {"name": c.name, "topics": len(c.topics),
+                 "connected": c.connected.is_set(), "reconnects": c.reconnects,
+                 "forced_reconnects": c.forced_reconnects,
+                 "latency": c.monitor.stats()}
+                for c in self.connections],
+            "topics": len(self.topic_connection),
+            "unrouted": self.unrouted,
+            "kline_closed": self.closed_decoder.stats(),
+        }